@@ -4,294 +4,224 @@ import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 import os
-import urllib.request
-import csv
-import io
-import re
-import ipaddress
 from datetime import datetime, timedelta
 import time
 import calendar
-import joblib
-import hashlib
-import chardet
-from maxminddb import open_database
+from ssh_sentinel.detection import SEVERITIES
+from ssh_sentinel.downsample import MAX_SERIES_POINTS, bin_points, lttb
+from ssh_sentinel.export import EXPORT_FORMATS, export_bytes
+from ssh_sentinel.geo import (
+    ASN_COLUMN, ASN_PATH, GEOIP_PATH, database_version, geoip_updates, geoip_updating, start_geoip_updates
+)
+from ssh_sentinel.live import LiveWindow, LogTailer, parse_live_lines
+from ssh_sentinel.metrics import NULL_METRICS, Metrics
+from ssh_sentinel.parallel import default_workers
+from ssh_sentinel.pipeline import (
+    analyze_file, cache_params, expand_paths, leased_paths, merge_stores, source_id, source_labels
+)
+from ssh_sentinel.registry import REGISTRY_MAX_MB, DatasetRegistry
+from ssh_sentinel.store import (
+    CACHE_DIR, CACHE_MAX_MB, SOURCE_COLUMN, cache_entries, cached_entry, clear_cache as clear_cache_dir,
+    cube_counts, cube_mask, last_rows, row_count, spread
+)
+from ssh_sentinel.templates import TEMPLATE_COLUMN
 
-# =====================================
-# CONFIGURATION DU CACHE
-# =====================================
-CACHE_DIR = "cache"
-os.makedirs(CACHE_DIR, exist_ok=True)
-
-def get_cache_key(file_content, params):
-    hash_obj = hashlib.sha256()
-    hash_obj.update(file_content)
-    hash_obj.update(str(params).encode('utf-8'))
-    return hash_obj.hexdigest()
-
-def cached_load(content, params):
-    cache_key = get_cache_key(content, params)
-    cache_path = os.path.join(CACHE_DIR, f"{cache_key}.joblib")
-
-    if os.path.exists(cache_path):
-        st.info("📦 Chargement des données depuis le cache...")
-        return joblib.load(cache_path)
-    return None
-
-def save_to_cache(content, params, data):
-    cache_key = get_cache_key(content, params)
-    cache_path = os.path.join(CACHE_DIR, f"{cache_key}.joblib")
-    joblib.dump(data, cache_path)
-    return cache_path
 
 # =====================================
-# TÉLÉCHARGEMENT BASE GÉOLOCALISATION
+# CONFIGURATION DU CACHE
 # =====================================
-GEOIP_URL = "https://github.com/P3TERX/GeoLite.mmdb/raw/download/GeoLite2-City.mmdb"
-GEOIP_PATH = "GeoLite2-City.mmdb"
-
-def download_geoip():
-    if not os.path.exists(GEOIP_PATH):
-        try:
-            with st.spinner('📡 Téléchargement de la base de géolocalisation...'):
-                urllib.request.urlretrieve(GEOIP_URL, GEOIP_PATH)
-            st.success('✅ Base géolocalisation téléchargée!')
-            time.sleep(1)
-            return True
-        except Exception as e:
-            st.error(f"Échec du téléchargement : {e}")
-            return False
-    return True
-
-download_success = download_geoip()
+def cache_stats():
+    return st.session_state.setdefault('cache_stats', {'hits': 0, 'misses': 0, 'load_time': None})
+
+@st.cache_resource(show_spinner=False)
+def dataset_registry():
+    # Un registre par processus: descripteurs et chargements partagés par toutes les sessions
+    return DatasetRegistry()
+
+def open_store(path):
+    return dataset_registry().open(path)
+
+def cached_load(cache_key):
+    start = time.perf_counter()
+    store = cached_entry(cache_key, open_store,
+                         on_discard=lambda: dataset_registry().forget(os.path.join(CACHE_DIR, cache_key)))
+    stats = cache_stats()
+    if store is None:
+        stats['misses'] += 1
+        return None
+    stats['hits'] += 1
+    stats['load_time'] = time.perf_counter() - start
+    return store
+
+def clear_cache():
+    # Les jeux affichés par une session (celle-ci ou une autre) sont conservés
+    registry = dataset_registry()
+    kept = clear_cache_dir(keep=leased_paths(registry))
+    registry.clear()
+    return kept
 
 # =====================================
-# FONCTIONS UTILITAIRES
+# BASES DE GÉOLOCALISATION
 # =====================================
-def categorize_event(message):
-    msg = str(message).lower()
-    if "failed password" in msg:
-        return "Tentative Échouée"
-    elif "accepted password" in msg:
-        return "Connexion Réussie"
-    elif "invalid user" in msg:
-        return "Utilisateur Invalide"
-    elif "break-in" in msg or "intrusion" in msg:
-        return "Tentative d'Intrusion"
-    elif "disconnected" in msg:
-        return "Déconnexion"
-    elif "session opened" in msg:
-        return "Session Ouverte"
-    elif "session closed" in msg:
-        return "Session Fermée"
-    else:
-        return "Autre Événement"
-
-def clean_ip(ip_str):
-    if not ip_str or pd.isna(ip_str) or ip_str in ['', 'unknown']:
-        return "IP Inconnue"
-
-    # Extraction de l'IP avec regex
-    match = re.search(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}', str(ip_str))
-    if match:
-        ip = match.group(0)
-        try:
-            ipaddress.ip_address(ip)
-            return ip
-        except ValueError:
-            return "IP Invalide"
-    return "IP Inconnue"
-
-# Cache pour la géolocalisation
-ip_location_cache = {}
-geo_reader = None
-
-def init_geo_reader():
-    global geo_reader
-    if geo_reader is None and os.path.exists(GEOIP_PATH):
-        try:
-            geo_reader = open_database(GEOIP_PATH)
-        except Exception as e:
-            st.error(f"Erreur d'initialisation GeoLite2: {e}")
-    return geo_reader
-
-def get_location(ip):
-    global geo_reader
-
-    if ip in ["IP Inconnue", "IP Invalide", "localhost", "127.0.0.1"] or not download_success:
-        return ("Localisation Inconnue", None, None)
-
-    if ip in ip_location_cache:
-        return ip_location_cache[ip]
-
-    try:
-        if geo_reader is None:
-            init_geo_reader()
-
-        if geo_reader:
-            match = geo_reader.get(ip)
-            if match:
-                city = match.get('city', {}).get('names', {}).get('fr', '')
-                country = match.get('country', {}).get('names', {}).get('fr', match.get('country', {}).get('iso_code', ''))
-                latitude = match.get('location', {}).get('latitude')
-                longitude = match.get('location', {}).get('longitude')
-
-                location_text = ""
-                if city:
-                    location_text += city
-                if country:
-                    if location_text:
-                        location_text += ", "
-                    location_text += country
-
-                if not location_text:
-                    location_text = "Localisation Inconnue"
-
-                location = (location_text, latitude, longitude)
-            else:
-                location = ("Localisation Inconnue", None, None)
-        else:
-            location = ("Base GeoLite absente", None, None)
-
-        ip_location_cache[ip] = location
-        return location
-    except Exception as e:
-        st.error(f"Erreur de géolocalisation pour {ip}: {str(e)}")
-        return ("Erreur de Géolocalisation", None, None)
+# Téléchargement et mises à jour en arrière-plan: la page s'affiche sans
+# attendre le réseau, et une base sert dès qu'elle est sur le disque
+start_geoip_updates()
+
+def geoip_caption():
+    # État des bases pour la barre latérale
+    version = database_version(GEOIP_PATH)
+    if version is not None:
+        built = datetime.fromtimestamp(version).strftime('%d/%m/%Y')
+        asn = " + ASN" if database_version(ASN_PATH) is not None else ""
+        return f"Base GeoLite2{asn} du {built}" + (" · mise à jour en cours" if geoip_updating() else "")
+    if geoip_updating():
+        return "📡 Téléchargement de la base GeoLite2 en arrière-plan..."
+    error = geoip_updates['errors'].get('geoip')
+    return f"Base GeoLite2 absente ({error})" if error else "Base GeoLite2 absente"
 
 # =====================================
 # CHARGEMENT DES DONNÉES
 # =====================================
-def load_data(file, enable_geo=True, sample_size=None):
+def notify(level, message):
+    # Messages du chargement affichés dans la page (st.info, st.warning...)
+    getattr(st, level)(message)
+
+def load_data(file, enable_geo=True, sample_size=None, cache_max_mb=CACHE_MAX_MB, workers=1, metrics=NULL_METRICS,
+              keep=()):
     try:
-        content = file.getvalue()
-        cache_params = {
-            'enable_geo': enable_geo,
-            'sample_size': sample_size,
-            'file_size': len(content)
-        }
-
-        # Vérification du cache
-        cached_data = cached_load(content, cache_params)
-        if cached_data is not None:
-            return cached_data
+        # Vérification du cache (une seule passe de hachage par fichier
+        # téléversé: les réexécutions réutilisent la clé de la session)
+        session_keys = st.session_state.setdefault('cache_keys', {})
+        file_key = (source_id(file), str(cache_params(enable_geo, sample_size)))
+        cache_key = session_keys.get(file_key) if file_key[0] else None
+        if cache_key is not None:
+            cached_data = cached_load(cache_key)
+            if cached_data is not None:
+                return cached_data
 
         with st.spinner('🔍 Analyse du fichier en cours...'):
-            # Détection de l'encodage
-            raw_content = file.getvalue()
-            encoding = chardet.detect(raw_content)['encoding'] or 'utf-8'
-
-            # Diagnostic: nombre de lignes
-            raw_lines = raw_content.decode(encoding, errors='replace').splitlines()
-            line_count = len(raw_lines)
-            st.info(f"⚙️ Fichier brut: {line_count} lignes détectées")
-
-            # Lecture CSV robuste
-            df = pd.DataFrame()
-            try:
-                # Lecture avec csv.reader pour une meilleure gestion
-                reader = csv.reader(io.StringIO(raw_content.decode(encoding, errors='replace')), 
-                                   delimiter=';',
-                                   quoting=csv.QUOTE_NONE)
-
-                data = []
-                for row in reader:
-                    # Ajouter des colonnes manquantes si nécessaire
-                    if len(row) < 8:
-                        row += [''] * (8 - len(row))
-                    # Fusionner les colonnes supplémentaires dans le message
-                    elif len(row) > 8:
-                        row[7] = ';'.join(row[7:])
-                        row = row[:8]
-                    data.append(row)
-
-                # Création du DataFrame
-                columns = ['Timestamp', 'Lab', 'Service', 'PID', 'IP', 'User', 'EventCode', 'Message']
-                df = pd.DataFrame(data, columns=columns)
-
-            except Exception as e:
-                st.error(f"Erreur de lecture CSV: {e}")
-                return pd.DataFrame()
-
-            st.info(f"📥 {len(df)} lignes chargées après traitement CSV")
-
-            # Conversion des timestamps (sans supprimer les invalides)
-            df['Timestamp'] = pd.to_datetime(
-                df['Timestamp'], 
-                errors='coerce',
-                format='mixed'
+            store, session_keys[file_key] = analyze_file(
+                file, enable_geo, sample_size, cache_max_mb, workers,
+                notify=notify, lookup=cached_load, open_store=open_store, metrics=metrics,
+                registry=dataset_registry(), keep=keep
             )
-
-            # Marquer les timestamps invalides mais conserver les lignes
-            invalid_ts = df['Timestamp'].isna().sum()
-            if invalid_ts > 0:
-                st.warning(f"⚠️ {invalid_ts} timestamps invalides - conservation des lignes")
-                # Remplacer par la date actuelle
-                df.loc[df['Timestamp'].isna(), 'Timestamp'] = pd.Timestamp.now()
-
-            # Nettoyage des IPs
-            df['IP'] = df['IP'].apply(clean_ip)
-
-            # Extraction d'IP depuis les messages
-            missing_ip_mask = df['IP'].isin(['IP Inconnue', 'IP Invalide'])
-            if missing_ip_mask.any():
-                extracted = df.loc[missing_ip_mask, 'Message'].str.extract(
-                    r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})', 
-                    expand=False
-                )
-                df.loc[missing_ip_mask, 'IP'] = extracted.fillna('IP Inconnue')
-
-            # Catégorisation des événements
-            df['EventCategory'] = df['Message'].apply(categorize_event)
-
-            # Colonnes temporelles
-            df['Hour'] = df['Timestamp'].dt.hour
-            df['DayOfWeek'] = df['Timestamp'].dt.dayofweek
-            df['Date'] = df['Timestamp'].dt.date
-
-            # Échantillonnage optionnel
-            if sample_size and len(df) > sample_size:
-                original_count = len(df)
-                df = df.sample(sample_size)
-                st.warning(f"⚠️ Échantillonnage: {sample_size}/{original_count} lignes")
-            else:
-                st.info(f"📊 {len(df)} lignes conservées")
-
-            # Géolocalisation
-            if enable_geo and download_success:
-                st.info("🌍 Début de la géolocalisation...")
-                progress_bar = st.progress(0)
-
-                # Optimisation: traitement des IPs uniques
-                unique_ips = df['IP'].unique()
-                location_map = {}
-
-                for i, ip in enumerate(unique_ips):
-                    location_map[ip] = get_location(ip)
-                    progress_bar.progress((i + 1) / len(unique_ips))
-
-                # Application des localisations
-                df['Location'] = df['IP'].map(lambda ip: location_map[ip][0])
-                df['lat'] = df['IP'].map(lambda ip: location_map[ip][1])
-                df['lon'] = df['IP'].map(lambda ip: location_map[ip][2])
-
-                progress_bar.empty()
-                st.success(f"✅ Géolocalisation de {len(unique_ips)} IPs terminée")
-            else:
-                df['Location'] = "Géolocalisation désactivée"
-                df['lat'] = None
-                df['lon'] = None
-
-            # Sauvegarde dans le cache
-            save_to_cache(content, cache_params, df)
-            st.success(f"✅ Chargement final: {len(df)} lignes")
-            return df
+        if metrics.enabled:
+            # Relevés du dernier chargement complet, conservés entre réexécutions
+            st.session_state['load_metrics'] = metrics
+        return store
 
     except Exception as e:
         st.error(f"ERREUR CRITIQUE: {str(e)}")
         import traceback
         st.error(traceback.format_exc())
-        return pd.DataFrame()
+        return None
+
+def load_sources(sources, enable_geo=True, sample_size=None, cache_max_mb=CACHE_MAX_MB, workers=1,
+                 metrics=NULL_METRICS):
+    # Fichiers téléversés ou chemins locaux: une entrée par fichier, puis
+    # fusion en une seule entrée datée (colonne Source) s'il y en a plusieurs.
+    # Les entrées déjà prêtes sont épargnées par l'éviction jusqu'à la fusion
+    stores, names = [], []
+    for source in sources:
+        keep = [store.path for store in stores]
+        if isinstance(source, str):
+            if not os.path.exists(source):
+                st.error(f"Fichier introuvable: {source}")
+                return None
+            with open(source, 'rb') as f:
+                store = load_data(f, enable_geo, sample_size, cache_max_mb, workers, metrics, keep)
+        else:
+            store = load_data(source, enable_geo, sample_size, cache_max_mb, workers, metrics, keep)
+        if store is None:
+            return None
+        stores.append(store)
+        names.append(source if isinstance(source, str) else source.name)
+
+    if not stores:
+        st.error("Aucun fichier à analyser")
+        return None
+    if len(stores) == 1:
+        return stores[0]
+    try:
+        with st.spinner(f'🔗 Fusion de {len(stores)} fichiers...'):
+            store, _ = merge_stores(stores, source_labels(names), cache_max_mb, notify,
+                                    lookup=cached_load, open_store=open_store, metrics=metrics,
+                                    registry=dataset_registry())
+        return store
+    except Exception as e:
+        st.error(f"Erreur lors de la fusion: {e}")
+        return None
+
+def render_diagnostics(metrics):
+    # Détail par étape du dernier chargement, avec exports JSON et Prometheus
+    with st.expander("🩺 Diagnostics du chargement"):
+        data = metrics.to_dict()
+        col1, col2, col3 = st.columns(3)
+        total = sum(record['seconds'] for record in data['stages'].values())
+        col1.metric("Durée mesurée", f"{total:.2f} s")
+        for col, (name, label) in zip([col2, col3], [('cache_hit_ratio', "Cache (succès)"),
+                                                     ('geo_cache_hit_ratio', "Plages GeoIP (succès)")]):
+            ratio = data['ratios'].get(name)
+            col.metric(label, f"{ratio:.0%}" if ratio is not None else "-")
+
+        stages = pd.DataFrame([
+            {
+                'Étape': name,
+                'Durée (s)': round(record['seconds'], 3),
+                'Lignes': record['rows'] or None,
+                'Lignes/s': round(record['rows_per_second']) if record['rows_per_second'] else None,
+                'Pic mémoire (Mo)': round(record['peak_bytes'] / 1024 / 1024, 1) if record['peak_bytes'] is not None else None,
+            }
+            for name, record in data['stages'].items()
+        ])
+        st.dataframe(stages, width='stretch', hide_index=True)
+        if data['counters']:
+            st.caption(" · ".join(f"{name}: {value}" for name, value in data['counters'].items()))
+
+        col1, col2 = st.columns(2)
+        col1.download_button("Exporter (JSON)", metrics.to_json(), file_name="ssh_sentinel_metrics.json",
+                             mime="application/json")
+        col2.download_button("Exporter (Prometheus)", metrics.to_prometheus(), file_name="ssh_sentinel_metrics.prom",
+                             mime="text/plain")
+
+# =====================================
+# SURVEILLANCE EN DIRECT
+# =====================================
+def render_live_monitor(path, from_start, refresh_seconds):
+    state_key = f"live_monitor::{path}::{from_start}"
+    if state_key not in st.session_state:
+        st.session_state[state_key] = (LogTailer(path, from_start), LiveWindow())
+
+    @st.fragment(run_every=refresh_seconds)
+    def live_panel():
+        tailer, window = st.session_state[state_key]
+        lines = tailer.poll()
+        if lines:
+            window.add(parse_live_lines(lines))
+
+        hourly = window.hourly()
+        col1, col2, col3 = st.columns(3)
+        col1.metric(f"Événements ({window.hours} h)", int(hourly['Événements'].sum()))
+        col2.metric("IPs distinctes (approx.)", len(window.top('ips', None)))
+        col3.metric("Tentatives Échouées", int(hourly['Échecs'].sum()))
+
+        if hourly.empty:
+            st.info(f"⏳ En attente de nouvelles lignes dans {path}...")
+            return
+
+        fig = px.line(hourly, x='Heure', y=['Événements', 'Échecs'], title='Activité par Heure')
+        st.plotly_chart(fig, width='stretch')
+
+        col1, col2 = st.columns(2)
+        with col1:
+            st.subheader("🔝 Top 10 IPs")
+            st.dataframe(pd.DataFrame(window.top('ips'), columns=['IP', 'Événements']), width='stretch')
+        with col2:
+            st.subheader("👤 Échecs par Utilisateur")
+            st.dataframe(pd.DataFrame(window.top('users'), columns=['Utilisateur', 'Échecs']), width='stretch')
+        st.caption(f"Position de lecture: octet {tailer.offset} · rafraîchissement toutes les {refresh_seconds} s")
+
+    live_panel()
 
 # =====================================
 # INTERFACE UTILISATEUR
@@ -306,15 +236,59 @@ st.set_page_config(
 st.title("🔒 SSH Sentinel Pro - Analyse de Sécurité")
 st.caption("Analyse avancée des journaux d'authentification SSH")
 
+# Fichiers locaux surveillés: liste fermée fixée par l'administrateur
+WATCHED_PATHS = [path for path in os.environ.get("SSH_SENTINEL_WATCH_PATHS", "").split(os.pathsep) if path]
+EXPORT_LABELS = {'csv': "CSV", 'csv.gz': "CSV compressé (gzip)", 'parquet': "Parquet"}
+
+mode = st.sidebar.radio("Mode", ["Analyse de fichier", "Surveillance en direct"], horizontal=True)
+if mode == "Surveillance en direct":
+    st.sidebar.header("📡 Surveillance en Direct")
+    if not WATCHED_PATHS:
+        st.info("Définissez SSH_SENTINEL_WATCH_PATHS (chemins séparés par ':') pour surveiller un journal local, "
+                "par exemple /var/log/auth.log.")
+    else:
+        live_path = st.sidebar.selectbox("Journal surveillé", WATCHED_PATHS)
+        live_from_start = st.sidebar.checkbox("Inclure le contenu existant", value=False)
+        live_refresh = st.sidebar.number_input("Rafraîchissement (s)", min_value=1, max_value=300, value=5)
+        render_live_monitor(live_path, live_from_start, live_refresh)
+    st.stop()
+
 st.sidebar.header("📤 Téléversement de Fichier")
-uploaded_file = st.sidebar.file_uploader(
-    "Choisissez un fichier CSV de logs SSH",
-    type=["csv"],
-    help="Format: Timestamp;Lab;Service;PID;IP;User;EventCode;Message"
+uploaded_files = st.sidebar.file_uploader(
+    "Choisissez un ou plusieurs fichiers de logs SSH",
+    type=["csv", "log"],
+    accept_multiple_files=True,
+    help="Format: Timestamp;Lab;Service;PID;IP;User;EventCode;Message, ou syslog (/var/log/auth.log). "
+         "Plusieurs fichiers (un par bastion) sont fusionnés par date."
 )
 
+watched_path = None
+if WATCHED_PATHS:
+    watched_choice = st.sidebar.selectbox("Ou fichier/dossier local surveillé", ["Aucun"] + WATCHED_PATHS)
+    if watched_choice != "Aucun":
+        watched_path = watched_choice
+        # Une réexécution suffit: seule la partie ajoutée au fichier est analysée
+        st.sidebar.button("🔄 Actualiser")
+
 st.sidebar.header("⚙️ Options")
 enable_geo = st.sidebar.checkbox("Activer la géolocalisation", value=True)
+if enable_geo:
+    st.sidebar.caption(geoip_caption())
+cache_max_mb = st.sidebar.number_input(
+    "Taille maximale du cache (Mo)",
+    min_value=64,
+    value=CACHE_MAX_MB,
+    step=64
+)
+workers = st.sidebar.number_input(
+    "Processus d'analyse",
+    min_value=1,
+    value=default_workers(),
+    help="Lecture parallèle des fichiers volumineux"
+)
+diagnostics = st.sidebar.checkbox("Diagnostics du chargement", value=False,
+                                  help="Durée, débit et mémoire de chaque étape de l'analyse")
+trace_memory = diagnostics and st.sidebar.checkbox("Mesurer la mémoire (plus lent)", value=False)
 
 # Échantillonnage optionnel (désactivé par défaut)
 st.sidebar.markdown("**Échantillonnage**")
@@ -334,142 +308,211 @@ if sample_option == "Échantillon personnalisé":
         step=1000
     )
 
-if uploaded_file is not None:
+if uploaded_files or watched_path is not None:
+    metrics = Metrics(trace_memory) if diagnostics else NULL_METRICS
+    sources = uploaded_files or expand_paths([watched_path])
     with st.spinner('Chargement des données...'):
-        df = load_data(uploaded_file, enable_geo, sample_size)
+        store = load_sources(sources, enable_geo, sample_size, cache_max_mb, workers, metrics)
+    if store is not None:
+        # Jeu affiché par la session: tenu dans le registre tant qu'elle le garde
+        lease = st.session_state.get('dataset_lease')
+        if lease is None or lease.path != store.path:
+            st.session_state['dataset_lease'] = dataset_registry().acquire(store)
+
+    if store is not None and len(store) > 0:
+        if SOURCE_COLUMN in store.specs:
+            st.success(f"✅ {len(store.categories(SOURCE_COLUMN))} fichiers fusionnés: {len(store)} événements")
+        else:
+            st.success(f"✅ Fichier chargé: {len(store)} événements")
+        if diagnostics:
+            if 'load_metrics' in st.session_state:
+                render_diagnostics(st.session_state['load_metrics'])
+            else:
+                st.caption("🩺 Diagnostics: disponibles après la prochaine analyse (fichier déjà en cache)")
+
+        # Les filtres passent par les index de l'entrée (lignes triées par
+        # date, index inversés) et produisent des numéros de lignes
+        timestamps = store.values('Timestamp')
+        start = end = None
 
-    if not df.empty:
-        st.success(f"✅ Fichier chargé: {len(df)} événements")
+        # Les graphiques, eux, s'agrègent sur le cube avec le même masque
+        cube = store.cube()
+        selection = np.ones(len(cube['Count']), dtype=bool)
 
         # Filtres temporels
         st.sidebar.header("⏱ Filtres Temporels")
-        min_date = df['Timestamp'].min().to_pydatetime()
-        max_date = df['Timestamp'].max().to_pydatetime()
-
-        date_range = st.sidebar.date_input(
-            "Plage de dates",
-            [min_date, max_date],
-            min_value=min_date,
-            max_value=max_date
-        )
+        dated = store.valid_rows().stop
+        if dated < len(store):
+            st.sidebar.caption(f"{len(store) - dated} événements sans horodatage valide, hors filtre de dates")
+
+        date_range = ()
+        if dated:
+            min_date = pd.Timestamp(timestamps[0]).to_pydatetime()
+            max_date = pd.Timestamp(timestamps[dated - 1]).to_pydatetime()
+            date_range = st.sidebar.date_input(
+                "Plage de dates",
+                [min_date, max_date],
+                min_value=min_date,
+                max_value=max_date
+            )
 
         if len(date_range) == 2:
             start_date, end_date = date_range
             end_date += timedelta(days=1)  # Inclure toute la journée
-            filtered_df = df[(df['Timestamp'] >= pd.Timestamp(start_date)) & 
-                             (df['Timestamp'] <= pd.Timestamp(end_date))]
-            st.sidebar.info(f"Filtre: {len(filtered_df)} événements")
+            start, end = np.datetime64(pd.Timestamp(start_date)), np.datetime64(pd.Timestamp(end_date))
+            hours = cube['Hour']
+            selection = (hours >= start.astype('datetime64[h]').astype(np.int64)) & \
+                        (hours < end.astype('datetime64[h]').astype(np.int64))
+            st.sidebar.info(f"Filtre: {int(cube['Count'][selection].sum())} événements")
         else:
-            filtered_df = df
             st.sidebar.warning("Sélectionnez une plage valide")
 
         # Filtres supplémentaires
         st.sidebar.header("🔍 Filtres Avancés")
 
         # Par catégorie d'événement
-        event_types = filtered_df['EventCategory'].unique()
+        event_types = cube_counts(store, 'EventCategory', selection, sort=False)['EventCategory'].tolist()
         selected_events = st.sidebar.multiselect(
             "Types d'événements",
             options=event_types,
             default=event_types
         )
         if selected_events:
-            filtered_df = filtered_df[filtered_df['EventCategory'].isin(selected_events)]
+            selection = cube_mask(store, 'EventCategory', selected_events, selection)
 
         # Par IP (sans exclure "IP Inconnue")
-        top_ips = filtered_df['IP'].value_counts().index
+        top_ips = cube_counts(store, 'IP', selection)['IP'].tolist()
         selected_ips = st.sidebar.multiselect("Adresses IP", options=top_ips)
         if selected_ips:
-            filtered_df = filtered_df[filtered_df['IP'].isin(selected_ips)]
+            selection = cube_mask(store, 'IP', selected_ips, selection)
+
+        # Par réseau (CIDR, IPv4 ou IPv6), sur les adresses empaquetées de l'entrée
+        network = st.sidebar.text_input("Réseau (CIDR)", placeholder="203.0.113.0/24")
+        network_ips = None
+        if network.strip():
+            try:
+                network_ips = store.ips_in_network(network)
+            except ValueError:
+                st.sidebar.error("Réseau invalide")
+        if network_ips is not None:
+            inside = set(network_ips)
+            selected_ips = [ip for ip in selected_ips if ip in inside] if selected_ips else network_ips
+            selection = cube_mask(store, 'IP', selected_ips, selection)
 
         # Par utilisateur
-        users = filtered_df['User'].unique()
+        users = cube_counts(store, 'User', selection, sort=False)['User'].tolist()
         selected_users = st.sidebar.multiselect("Utilisateurs", options=users)
         if selected_users:
-            filtered_df = filtered_df[filtered_df['User'].isin(selected_users)]
-
-        st.sidebar.info(f"📊 {len(filtered_df)} événements filtrés")
+            selection = cube_mask(store, 'User', selected_users, selection)
+
+        # Par fichier d'origine (plusieurs fichiers fusionnés)
+        selected_sources = []
+        if SOURCE_COLUMN in store.specs:
+            source_names = cube_counts(store, SOURCE_COLUMN, selection, sort=False)[SOURCE_COLUMN].tolist()
+            selected_sources = st.sidebar.multiselect("Sources", options=source_names)
+            if selected_sources:
+                selection = cube_mask(store, SOURCE_COLUMN, selected_sources, selection)
+
+        rows = store.select(start, end, {
+            'EventCategory': selected_events,
+            'IP': selected_ips,
+            'User': selected_users,
+            SOURCE_COLUMN: selected_sources,
+        })
+        if network_ips is not None and not selected_ips:
+            # Aucune adresse dans le réseau (select ignore les listes vides)
+            rows = np.empty(0, dtype=np.int64)
+        st.sidebar.info(f"📊 {row_count(rows)} événements filtrés")
+        counts = cube['Count'][selection]
+        hours = cube['Hour'][selection]
 
         # Onglets
-        tab1, tab2, tab3, tab4 = st.tabs([
+        tab1, tab2, tab3, tab4, tab5 = st.tabs([
             "📊 Tableau de Bord", 
             "🗺 Carte", 
             "📈 Statistiques", 
-            "🔍 Détails"
+            "🔍 Détails",
+            "🚨 Alertes"
         ])
 
         with tab1:
             # KPI
             col1, col2, col3 = st.columns(3)
-            col1.metric("Événements", len(filtered_df))
-            col2.metric("IPs Uniques", filtered_df['IP'].nunique())
-            failed = len(filtered_df[filtered_df['EventCategory'] == "Tentative Échouée"])
+            # Cube: lignes datées seulement (voir valid_rows)
+            col1.metric("Événements horodatés", int(counts.sum()))
+            col2.metric("IPs Uniques", len(cube_counts(store, 'IP', selection, sort=False)))
+            failed_code = store.codes_for('EventCategory', ["Tentative Échouée"])[0]
+            failed = int(counts[cube['EventCategory'][selection] == failed_code].sum())
             col3.metric("Tentatives Échouées", failed)
 
             # Activité horaire
             st.subheader("⏱ Activité Horaire")
-            hourly = filtered_df.groupby('Hour').size().reset_index(name='Count')
+            hourly = np.bincount(hours % 24, weights=counts, minlength=24).astype(np.int64)
+            present = np.flatnonzero(hourly)
+            hourly = pd.DataFrame({'Hour': present, 'Count': hourly[present]})
             fig = px.line(hourly, x='Hour', y='Count', title='Activité par Heure')
             st.plotly_chart(fig, width='stretch')
 
             # CORRECTION FINALE : ACTIVITÉ JOURNALIÈRE
             st.subheader("📅 Activité Journalière")
-            
-            # 1. Grouper par jour (dates réelles)
-            daily_counts = filtered_df.groupby(
-                filtered_df['Timestamp'].dt.date
-            ).size().reset_index(name='Count')
-            
-            # 2. Convertir en datetime
-            daily_counts['Date'] = pd.to_datetime(daily_counts['Timestamp'])
-            
-            # 3. Déterminer les dates min et max des données
-            min_date_graph = daily_counts['Date'].min()
-            max_date_graph = daily_counts['Date'].max()
-            
-            # 4. Créer une plage complète de dates UNIQUEMENT entre min et max
-            full_date_range = pd.date_range(
-                start=min_date_graph,
-                end=max_date_graph,
-                freq='D'
-            )
-            
-            # 5. Réindexer pour avoir toutes les dates dans la plage
-            daily_counts = daily_counts.set_index('Date')
-            daily_counts = daily_counts.reindex(full_date_range, fill_value=0)
-            daily_counts = daily_counts.reset_index()
-            
-            # 6. Renommer les colonnes (seulement 2 colonnes)
-            daily_counts.columns = ['Date', 'Count']
-            
-            # 7. Créer le graphique avec les limites exactes
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=daily_counts['Date'], 
-                y=daily_counts['Count'],
-                mode='lines+markers',
-                line_shape='linear',
-                connectgaps=False
-            ))
-            
-            # 8. Limiter strictement l'axe X aux dates extrêmes
-            fig.update_xaxes(
-                range=[min_date_graph - timedelta(days=1), max_date_graph + timedelta(days=1)],
-                constrain='domain'
-            )
-            
-            fig.update_layout(
-                title='Activité par Jour',
-                xaxis_title='Date',
-                yaxis_title='Nombre d\'événements',
-                showlegend=False
-            )
-            
-            st.plotly_chart(fig, width='stretch')
+
+            if row_count(rows):
+                # 1. Grouper par jour (dates réelles)
+                days, day_index = np.unique(hours // 24, return_inverse=True)
+                daily_counts = pd.Series(
+                    np.bincount(day_index, weights=counts).astype(np.int64),
+                    index=pd.DatetimeIndex(days.astype('datetime64[D]'))
+                )
+
+                # 2. Déterminer les dates min et max des données
+                min_date_graph = daily_counts.index.min()
+                max_date_graph = daily_counts.index.max()
+
+                # 3. Créer une plage complète de dates UNIQUEMENT entre min et max
+                full_date_range = pd.date_range(
+                    start=min_date_graph,
+                    end=max_date_graph,
+                    freq='D'
+                )
+
+                # 4. Réindexer pour avoir toutes les dates dans la plage
+                daily_counts = daily_counts.reindex(full_date_range, fill_value=0)
+                daily_counts = daily_counts.rename_axis('Date').reset_index(name='Count')
+
+                # Série longue réduite côté serveur (LTTB: pics et creux conservés)
+                if len(daily_counts) > MAX_SERIES_POINTS:
+                    kept = lttb(np.arange(len(daily_counts)), daily_counts['Count'].to_numpy(), MAX_SERIES_POINTS)
+                    st.caption(f"{len(daily_counts)} jours affichés en {len(kept)} points (pics conservés)")
+                    daily_counts = daily_counts.iloc[kept]
+
+                # 5. Créer le graphique avec les limites exactes
+                fig = go.Figure()
+                fig.add_trace(go.Scatter(
+                    x=daily_counts['Date'], 
+                    y=daily_counts['Count'],
+                    mode='lines+markers',
+                    line_shape='linear',
+                    connectgaps=False
+                ))
+
+                # 6. Limiter strictement l'axe X aux dates extrêmes
+                fig.update_xaxes(
+                    range=[min_date_graph - timedelta(days=1), max_date_graph + timedelta(days=1)],
+                    constrain='domain'
+                )
+
+                fig.update_layout(
+                    title='Activité par Jour',
+                    xaxis_title='Date',
+                    yaxis_title='Nombre d\'événements',
+                    showlegend=False
+                )
+
+                st.plotly_chart(fig, width='stretch')
 
             # Top IPs (incluant "IP Inconnue")
             st.subheader("🔝 Top 10 IPs")
-            top_ips = filtered_df['IP'].value_counts().head(10).reset_index()
+            top_ips = cube_counts(store, 'IP', selection, top=10)
             top_ips.columns = ['IP', 'Tentatives']
             st.dataframe(top_ips, width='stretch')
 
@@ -477,13 +520,25 @@ if uploaded_file is not None:
             # Carte géographique
             st.subheader("🌍 Carte des Tentatives")
 
-            if enable_geo and download_success and not filtered_df.empty:
-                # Préparation des données
-                geo_data = filtered_df.dropna(subset=['lat', 'lon'])
+            if enable_geo and row_count(rows):
+                # Coordonnées portées par l'IP de chaque cellule du cube
+                ip_codes = cube['IP'][selection]
+                geo_data = pd.DataFrame({
+                    'lat': cube['ip_lat'][ip_codes],
+                    'lon': cube['ip_lon'][ip_codes],
+                    'Location': pd.Categorical.from_codes(cube['Location'][selection],
+                                                          categories=store.categories('Location')),
+                    'Count': counts,
+                }).dropna(subset=['lat', 'lon'])
 
                 if not geo_data.empty:
-                    # Agrégation par localisation
-                    agg_data = geo_data.groupby(['lat', 'lon', 'Location']).size().reset_index(name='Count')
+                    # Agrégation par localisation, regroupée sur une grille si
+                    # les lieux sont trop nombreux pour le navigateur
+                    agg_data = geo_data.groupby(['lat', 'lon', 'Location'], observed=True)['Count'].sum().reset_index()
+                    agg_data, cell = bin_points(agg_data['lat'], agg_data['lon'], agg_data['Count'],
+                                                agg_data['Location'].astype(str))
+                    if cell is not None:
+                        st.caption(f"Lieux regroupés par cases de {cell:g}° ({len(agg_data)} points)")
 
                     # Création de la carte
                     fig = px.scatter_mapbox(
@@ -509,8 +564,8 @@ if uploaded_file is not None:
 
             # Distribution géographique
             st.subheader("🗺 Distribution par Pays (Top 20)")
-            if not filtered_df.empty and 'Location' in filtered_df.columns:
-                loc_counts = filtered_df['Location'].value_counts().head(20).reset_index()
+            if row_count(rows) and 'Location' in store.columns:
+                loc_counts = cube_counts(store, 'Location', selection, top=20)
                 loc_counts.columns = ['Location', 'Count']
                 fig = px.bar(loc_counts, x='Location', y='Count', title="Top 20 des Localisations")
                 st.plotly_chart(fig, width='stretch')
@@ -518,48 +573,109 @@ if uploaded_file is not None:
         with tab3:
             # Répartition des événements
             st.subheader("📊 Types d'Événements")
-            if not filtered_df.empty:
-                event_counts = filtered_df['EventCategory'].value_counts().reset_index()
+            if row_count(rows):
+                event_counts = cube_counts(store, 'EventCategory', selection)
                 event_counts.columns = ['Category', 'Count']
                 fig = px.pie(event_counts, names='Category', values='Count')
                 st.plotly_chart(fig, width='stretch')
 
+            # Même IP sur plusieurs serveurs (colonne Lab, tous fichiers confondus)
+            st.subheader("🖧 IPs sur Plusieurs Serveurs")
+            if row_count(rows) and 'Lab' in store.specs:
+                multi_host = spread(store, 'IP', 'Lab', rows, top=20)
+                multi_host.columns = ['IP', 'Serveurs', 'Événements', 'Liste des serveurs']
+                if multi_host.empty:
+                    st.info("Aucune IP vue sur plus d'un serveur")
+                else:
+                    st.dataframe(multi_host, width='stretch', hide_index=True)
+
+            # Réseaux d'origine (base GeoLite2-ASN facultative)
+            if row_count(rows) and ASN_COLUMN in store.specs:
+                st.subheader("🏢 Réseaux les Plus Actifs (AS)")
+                asn_counts = store.counts(ASN_COLUMN, rows, top=20)
+                asn_counts.columns = ['Réseau', 'Count']
+                fig = px.bar(asn_counts, x='Réseau', y='Count', title="Top 20 des Systèmes Autonomes")
+                st.plotly_chart(fig, width='stretch')
+
         with tab4:
             # Détails
             st.subheader("📋 Détails des Événements")
-            if not filtered_df.empty:
-                st.dataframe(filtered_df.sort_values('Timestamp', ascending=False).head(100), width='stretch')
+            if row_count(rows):
+                latest = last_rows(rows, 100)
+                st.dataframe(store.frame(rows=latest), width='stretch')
 
-            # Messages fréquents
+            # Messages fréquents, regroupés par modèle (<*>: partie variable)
             st.subheader("💬 Messages Fréquents")
-            if not filtered_df.empty:
-                msg_counts = filtered_df['Message'].value_counts().head(10).reset_index()
-                msg_counts.columns = ['Message', 'Count']
+            if row_count(rows):
+                msg_counts = store.counts(TEMPLATE_COLUMN, rows, top=10)
+                msg_counts.columns = ['Modèle de message', 'Count']
                 st.dataframe(msg_counts, width='stretch')
 
-        # Export
+        with tab5:
+            # Alertes qui chevauchent la période et concernent les IPs/utilisateurs choisis
+            st.subheader("🚨 Attaques Détectées")
+            alerts = store.alerts()
+            if start is not None:
+                alerts = alerts[(alerts['Fin'] >= start) & (alerts['Début'] < end)]
+            if selected_ips or network_ips is not None:
+                alerts = alerts[alerts['IP'].isin(selected_ips)]
+            if selected_users:
+                alerts = alerts[alerts['Utilisateur'].isin(selected_users)]
+
+            for col, level in zip(st.columns(len(SEVERITIES)), SEVERITIES):
+                col.metric(level, int((alerts['Sévérité'] == level).sum()))
+
+            if not alerts.empty:
+                by_type = alerts.groupby(['Type', 'Sévérité'], observed=True).size().reset_index(name='Count')
+                fig = px.bar(by_type, x='Type', y='Count', color='Sévérité', title="Alertes par Type")
+                st.plotly_chart(fig, width='stretch')
+                st.dataframe(alerts, width='stretch', hide_index=True)
+            else:
+                st.info("Aucune attaque détectée sur la sélection")
+
+        # Export écrit par blocs au clic, hors de l'exécution de la page. Le
+        # fichier final passe en mémoire (Streamlit sert les téléchargements
+        # depuis la mémoire): CSV compressé par défaut, et ligne de commande
+        # pour les gros volumes, qui écrit directement sur disque
         st.sidebar.header("Export")
-        if st.sidebar.button("Exporter les données"):
-            if not filtered_df.empty:
-                csv_data = filtered_df.to_csv(index=False).encode('utf-8')
-                st.sidebar.download_button(
-                    label="Télécharger CSV",
-                    data=csv_data,
-                    file_name=f"ssh_export_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime='text/csv'
-                )
+        if row_count(rows):
+            export_columns = st.sidebar.multiselect("Colonnes exportées", store.columns, default=store.columns)
+            export_format = st.sidebar.selectbox("Format", list(EXPORT_FORMATS), index=list(EXPORT_FORMATS).index('csv.gz'),
+                                                 format_func=EXPORT_LABELS.get)
+            extension, mime = EXPORT_FORMATS[export_format]
+            st.sidebar.download_button(
+                label="Exporter les données",
+                data=lambda: export_bytes(store, export_format, rows, export_columns),
+                file_name=f"ssh_export_{datetime.now().strftime('%Y%m%d')}{extension}",
+                mime=mime,
+                on_click='ignore',
+                disabled=not export_columns,
+            )
+            st.sidebar.caption("Le fichier exporté est gardé en mémoire le temps du téléchargement; "
+                               "pour de gros volumes: `python -m ssh_sentinel FICHIER -o DOSSIER --format parquet`")
     else:
         st.error("Erreur lors du chargement des données")
 else:
-    st.warning("⚠️ Veuillez téléverser un fichier de logs SSH")
+    st.warning("⚠️ Veuillez téléverser un ou plusieurs fichiers de logs SSH")
 
 # Gestion du cache
 st.sidebar.header("Cache")
+stats = cache_stats()
+cache_used = sum(size for _, size, _ in cache_entries())
+st.sidebar.caption(
+    f"Succès: {stats['hits']} · Échecs: {stats['misses']} · "
+    f"Occupation: {cache_used / 1024 / 1024:.1f}/{cache_max_mb} Mo"
+)
+if stats['load_time'] is not None:
+    st.sidebar.caption(f"Dernier chargement depuis le cache: {stats['load_time'] * 1000:.0f} ms")
+shared = dataset_registry().stats()
+st.sidebar.caption(
+    f"En mémoire: {shared['datasets']} jeux ({shared['bytes'] / 1024 / 1024:.0f}/{REGISTRY_MAX_MB} Mo), "
+    f"{shared['sessions']} sessions · Chargements partagés: {shared['joined']}"
+)
 if st.sidebar.button("Vider le cache"):
-    for f in os.listdir(CACHE_DIR):
-        if f.endswith(".joblib"):
-            os.remove(os.path.join(CACHE_DIR, f))
-    st.sidebar.success("Cache vidé!")
+    kept = clear_cache()
+    st.sidebar.success(f"Cache vidé! ({kept} jeux affichés conservés)" if kept else "Cache vidé!")
 
 # Pied de page
 st.sidebar.markdown("---")
@@ -0,0 +1,78 @@
+"""Catégories d'événements: categorize_events face à Series.apply(categorize_event).
+
+    python benchmarks/categorize.py --rows 1M 10M
+
+Messages seuls, tirés des modèles de synthetic.py: sans les autres colonnes
+du journal, 10M lignes tiennent en mémoire (benchmarks/run.py lit le
+fichier entier). Deux colonnes d'entrée: texte (une valeur par ligne) et
+catégorielle (valeurs distinctes, comme après read_log_stream).
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from run import parse_rows
+from ssh_sentinel.enrich import EVENT_CATEGORIES, categorize_event, categorize_events
+from synthetic import TEMPLATES, add_generator_arguments, generator_params, ip_pool, user_pool, zipf_weights
+
+def messages(rows, ip_cardinality, ipv6_ratio, users, seed, chunk_rows=500_000, **_):
+    # Mêmes tirages que generate_lines (IP, utilisateur, modèle, port), sans
+    # horodatage ni lignes malformées; texte construit bloc par bloc
+    ips = ip_pool(ip_cardinality, ipv6_ratio, seed)
+    ip_weights = zipf_weights(len(ips))
+    names = user_pool(users)
+    user_weights = zipf_weights(len(names))
+    weights = np.array([weight for weight, _ in TEMPLATES], dtype=float)
+    templates = [text for _, text in TEMPLATES]
+
+    rng = np.random.default_rng([seed, 3])
+    chunks = []
+    for start in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - start)
+        ip = ips[rng.choice(len(ips), size, p=ip_weights)]
+        user = names[rng.choice(len(names), size, p=user_weights)]
+        template = rng.choice(len(templates), size, p=weights / weights.sum())
+        port = rng.integers(1024, 65536, size)
+        chunks.append(pd.Series([templates[template[i]].format(user=user[i], ip=ip[i], port=port[i])
+                                 for i in range(size)], dtype='str'))
+    return pd.concat(chunks, ignore_index=True)
+
+def best_of(repeat, function, *args):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", nargs='+', default=['1M', '10M'], help="Tailles (suffixes k et M)")
+    parser.add_argument("--repeat", type=int, default=3, help="Passages chronométrés (meilleur retenu)")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+    params = generator_params(args)
+
+    print(f"{'lignes':>10} {'colonne':<12} {'apply':>10} {'vectorisé':>10} {'gain':>6}")
+    for rows in map(parse_rows, args.rows):
+        column = messages(rows, **params)
+        for kind in ['texte', 'catégorie']:
+            if kind == 'catégorie':
+                column = column.astype('category')
+            baseline, expected = best_of(args.repeat, column.apply, categorize_event)
+            seconds, result = best_of(args.repeat, categorize_events, column)
+            # Mêmes catégories que la référence, ligne par ligne
+            assert np.array_equal(pd.Categorical(expected, categories=EVENT_CATEGORIES).codes, result.codes)
+            del expected, result
+            print(f"{rows:>10} {kind:<12} {baseline:>9.3f}s {seconds:>9.3f}s {baseline / seconds:>5.1f}x", flush=True)
+        del column
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Comparaison de deux résultats de benchmarks/run.py, étape par étape.
+
+    python benchmarks/compare.py avant.json apres.json --threshold 0.1
+
+Code de sortie 1 si une étape ralentit au-delà du seuil (utilisable en CI).
+"""
+import argparse
+import json
+import sys
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        report = json.load(f)
+    return report, {(result['rows'], result['stage']): result for result in report['results']}
+
+def label(report):
+    commit = (report.get('commit') or 'local')[:10]
+    return commit + ('-dirty' if report.get('dirty') else '')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before", help="Résultats de référence")
+    parser.add_argument("after", help="Résultats à comparer")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Ralentissement toléré (0.1: +10 %%)")
+    args = parser.parse_args()
+
+    before, old = load(args.before)
+    after, new = load(args.after)
+    if before['params'] != after['params']:
+        print(f"⚠️ Paramètres différents: {before['params']} / {after['params']}", file=sys.stderr)
+
+    print(f"{'lignes':>10} {'étape':<20} {label(before):>12} {label(after):>12} {'rapport':>8} {'mémoire':>16}")
+    regressions = 0
+    # Ordre des étapes du fichier comparé
+    for key in [key for key in new if key in old]:
+        rows, stage = key
+        ratio = new[key]['seconds'] / old[key]['seconds'] if old[key]['seconds'] else float('inf')
+        memory = ""
+        if old[key]['peak_mb'] is not None and new[key]['peak_mb'] is not None:
+            memory = f"{old[key]['peak_mb']:.0f} -> {new[key]['peak_mb']:.0f} Mo"
+        flag = ""
+        if ratio > 1 + args.threshold:
+            regressions += 1
+            flag = " ⚠️"
+        print(f"{rows:>10} {stage:<20} {old[key]['seconds']:>11.3f}s {new[key]['seconds']:>11.3f}s "
+              f"{ratio:>7.2f}x {memory:>16}{flag}")
+
+    missing = sorted(old.keys() ^ new.keys())
+    if missing:
+        print(f"Mesures présentes d'un seul côté: {missing}", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Base MaxMind DB minimale (format v2) pour tester la géolocalisation hors ligne.
+
+Écrit un arbre de recherche IPv6 (adresses IPv4 sous ::/96), enregistrements
+de 32 bits, et une section de données au format MaxMind: le fichier se lit
+avec maxminddb comme une vraie base GeoLite2-City.
+"""
+import ipaddress
+import struct
+import time
+
+# Types MaxMind DB utilisés
+TYPE_STRING = 2
+TYPE_DOUBLE = 3
+TYPE_UINT16 = 5
+TYPE_UINT32 = 6
+TYPE_MAP = 7
+TYPE_UINT64 = 9
+TYPE_ARRAY = 11
+DATA_SEPARATOR = b'\x00' * 16
+METADATA_MARKER = b'\xab\xcd\xefMaxMind.com'
+
+class Unsigned:
+    # Entier non signé d'un type MaxMind explicite (métadonnées)
+    def __init__(self, type_id, value):
+        self.type_id = type_id
+        self.value = value
+
+def _control(type_id, size):
+    # Octet de contrôle: type sur 3 bits (étendu au-delà de 7), taille sur 5 bits
+    if type_id > 7:
+        first, extended = 0, bytes([type_id - 7])
+    else:
+        first, extended = type_id << 5, b''
+    if size < 29:
+        return bytes([first | size]) + extended
+    if size < 29 + 256:
+        return bytes([first | 29]) + extended + bytes([size - 29])
+    if size < 285 + 65536:
+        return bytes([first | 30]) + extended + struct.pack('>H', size - 285)
+    return bytes([first | 31]) + extended + struct.pack('>I', size - 65821)[1:]
+
+def encode(value):
+    if isinstance(value, dict):
+        return _control(TYPE_MAP, len(value)) + b''.join(encode(str(key)) + encode(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return _control(TYPE_ARRAY, len(value)) + b''.join(encode(item) for item in value)
+    if isinstance(value, str):
+        raw = value.encode('utf-8')
+        return _control(TYPE_STRING, len(raw)) + raw
+    if isinstance(value, float):
+        return _control(TYPE_DOUBLE, 8) + struct.pack('>d', value)
+    if isinstance(value, Unsigned):
+        raw = value.value.to_bytes(8, 'big').lstrip(b'\x00')
+        return _control(value.type_id, len(raw)) + raw
+    if isinstance(value, int):
+        raw = value.to_bytes(8, 'big').lstrip(b'\x00')
+        return _control(TYPE_UINT64 if value >= 1 << 32 else TYPE_UINT32, len(raw)) + raw
+    raise TypeError(f"Type non pris en charge: {type(value).__name__}")
+
+def write_mmdb(path, networks, database_type='GeoLite2-City', build_epoch=None):
+    # networks: (réseau CIDR, enregistrement) en IPv4 ou IPv6; les
+    # enregistrements identiques sont écrits une seule fois
+    nodes = [[None, None]]
+    data = b''
+    offsets = {}
+    for cidr, record in networks:
+        network = ipaddress.ip_network(cidr)
+        bits = network.prefixlen + (96 if network.version == 4 else 0)
+        value = int(network.network_address)
+        key = repr(record)
+        if key not in offsets:
+            offsets[key] = len(data)
+            data += encode(record)
+        node = 0
+        for depth in range(bits):
+            bit = (value >> (127 - depth)) & 1
+            if depth == bits - 1:
+                nodes[node][bit] = ('data', offsets[key])
+            else:
+                child = nodes[node][bit]
+                if not isinstance(child, int):
+                    nodes.append([None, None])
+                    child = nodes[node][bit] = len(nodes) - 1
+                node = child
+
+    # Enregistrement vide: node_count; données: node_count + 16 + décalage
+    node_count = len(nodes)
+    tree = bytearray()
+    for pair in nodes:
+        for record in pair:
+            if record is None:
+                number = node_count
+            elif isinstance(record, tuple):
+                number = node_count + 16 + record[1]
+            else:
+                number = record
+            tree += struct.pack('>I', number)
+
+    metadata = {
+        'binary_format_major_version': Unsigned(TYPE_UINT16, 2),
+        'binary_format_minor_version': Unsigned(TYPE_UINT16, 0),
+        'build_epoch': Unsigned(TYPE_UINT64, int(time.time() if build_epoch is None else build_epoch)),
+        'database_type': database_type,
+        'description': {'fr': 'Base synthétique (benchmarks)'},
+        'ip_version': Unsigned(TYPE_UINT16, 6),
+        'languages': ['fr'],
+        'node_count': Unsigned(TYPE_UINT32, node_count),
+        'record_size': Unsigned(TYPE_UINT16, 32),
+    }
+    with open(path, 'wb') as f:
+        f.write(bytes(tree) + DATA_SEPARATOR + data + METADATA_MARKER + encode(metadata))
@@ -0,0 +1,280 @@
+"""Mesure des étapes du traitement sur des journaux synthétiques.
+
+    python benchmarks/run.py --rows 100k 1M
+    python benchmarks/compare.py benchmarks/results/avant.json benchmarks/results/apres.json
+
+Chaque étape est chronométrée séparément (meilleur de --repeat passages),
+puis rejouée une fois sous tracemalloc pour relever son pic de mémoire.
+Les résultats (JSON) portent le commit, les versions et les paramètres.
+La lecture garde tout le journal en mémoire: environ 1,6 Go au plus pour
+les tailles par défaut, plus de 6 Go pour 10M lignes (--rows 10M);
+benchmarks/categorize.py mesure les catégories à cette taille sur les
+messages seuls.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.environ.get("SSH_SENTINEL_BENCH_DIR", os.path.join(ROOT, "benchmarks", "data"))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Cache et bases GeoLite2 propres aux mesures: fixés avant l'import de
+# ssh_sentinel, qui lit ces chemins au chargement
+os.environ["SSH_SENTINEL_CACHE_DIR"] = os.path.join(BENCH_DIR, "cache")
+os.environ["SSH_SENTINEL_GEOIP_PATH"] = os.path.join(BENCH_DIR, "GeoLite2-City.mmdb")
+os.environ["SSH_SENTINEL_ASN_PATH"] = os.path.join(BENCH_DIR, "GeoLite2-ASN.mmdb")
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from ssh_sentinel import geo
+from ssh_sentinel.enrich import categorize_event, categorize_events, normalize_ips
+from ssh_sentinel.parsing import detect_encoding, read_log_stream
+from ssh_sentinel.pipeline import analyze_path
+from ssh_sentinel.store import (
+    CACHE_DIR, INDEXED_COLUMNS, ColumnStore, add_time_columns, build_cube,
+    cube_counts, cube_mask, save_cube, write_columns
+)
+from ssh_sentinel.templates import extract_templates, split_messages
+from synthetic import add_generator_arguments, generator_params, write_geo_database, write_log
+
+SIZE_SUFFIXES = {'k': 1_000, 'M': 1_000_000}
+
+def parse_rows(text):
+    if text[-1] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+def log_path(rows, params):
+    # Fichiers générés conservés d'une exécution à l'autre (mêmes paramètres)
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(BENCH_DIR, f"ssh_{rows}_{digest}.csv")
+
+def reset_geo_cache():
+    # Table des plages résolues vidée: chaque IP passe par la base
+    geo.range_tables.clear()
+    if os.path.isdir(CACHE_DIR):
+        for name in os.listdir(CACHE_DIR):
+            if name.startswith("geoip_"):
+                os.remove(os.path.join(CACHE_DIR, name))
+
+def fresh_dir(path):
+    shutil.rmtree(path, ignore_errors=True)
+    return path
+
+# =====================================
+# ÉTAPES
+# =====================================
+# Chaque étape lit et complète `ctx`; elle peut être rejouée à l'identique
+
+def stage_read(ctx):
+    with open(ctx['path'], 'rb') as f:
+        ctx['raw'] = read_log_stream(f, encoding=detect_encoding(f))
+
+def stage_normalize_ips(ctx):
+    ctx['ips'] = normalize_ips(ctx['raw']['IP'], ctx['raw']['Message'])
+
+def stage_categorize_apply(ctx):
+    # Référence: une règle évaluée message par message
+    ctx['categories'] = ctx['raw']['Message'].apply(categorize_event)
+
+def stage_categorize_events(ctx):
+    ctx['categories'] = categorize_events(ctx['raw']['Message'])
+
+def stage_templates(ctx):
+    # Masquage des messages (bloc par bloc à la lecture, ici d'un seul
+    # tenant) puis modèles sur le jeu complet
+    ctx['templated'] = extract_templates(split_messages(ctx['raw'].copy()))
+
+def stage_locate_ips_cold(ctx):
+    reset_geo_cache()
+    ctx['locations'] = geo.locate_ips(ctx['ips'].categories)
+
+def stage_locate_ips_warm(ctx):
+    # Table des plages relue depuis le disque, sans interroger la base
+    geo.range_tables.clear()
+    ctx['locations'] = geo.locate_ips(ctx['ips'].categories)
+
+def stage_write_columns(ctx):
+    df = ctx['templated'].copy()
+    df['IP'] = ctx['ips']
+    add_time_columns(df)
+    locations, lats, lons, _ = ctx['locations']
+    codes = df['IP'].cat.codes.to_numpy()
+    df['Location'] = pd.Categorical(locations)[codes]
+    df['lat'] = lats[codes]
+    df['lon'] = lons[codes]
+    path = fresh_dir(os.path.join(BENCH_DIR, "entry"))
+    write_columns(path, df)
+    ctx['entry'] = path
+
+def stage_build_cube(ctx):
+    store = ColumnStore(ctx['entry'])
+    save_cube(ctx['entry'], build_cube(store))
+
+def stage_postings(ctx):
+    for name in os.listdir(ctx['entry']):
+        if name.startswith("index."):
+            os.remove(os.path.join(ctx['entry'], name))
+    store = ColumnStore(ctx['entry'])
+    for name in INDEXED_COLUMNS:
+        store.postings(name)
+    ctx['store'] = store
+
+def stage_select(ctx):
+    # Filtres de la barre latérale: dates seules, IP la plus active,
+    # utilisateur et catégorie, plusieurs IPs
+    store = ctx['store']
+    timestamps = store.values('Timestamp')[store.valid_rows()]
+    start, end = timestamps[len(timestamps) // 4], timestamps[len(timestamps) * 3 // 4]
+    top_ips = store.counts('IP').head(3)['IP'].tolist()
+    top_user = store.counts('User').head(1)['User'].tolist()
+    for filters in [{}, {'IP': top_ips[:1]}, {'User': top_user, 'EventCategory': ["Tentative Échouée"]},
+                    {'IP': top_ips}]:
+        store.select(start, end, filters)
+
+def stage_dashboard(ctx):
+    # Agrégats des onglets sur le cube, avec et sans filtre
+    store = ctx['store']
+    cube = store.cube()
+    everything = np.ones(len(cube['Count']), dtype=bool)
+    failures = cube_mask(store, 'EventCategory', ["Tentative Échouée"], everything)
+    for mask in (everything, failures):
+        for name in ['EventCategory', 'IP', 'User', 'Location']:
+            cube_counts(store, name, mask)
+        np.bincount(cube['Hour'][mask] % 24, weights=cube['Count'][mask], minlength=24)
+
+def stage_detect_attacks(ctx):
+    ColumnStore(ctx['entry']).alerts()
+
+def stage_analyze_file(ctx):
+    # Chargement complet (cache et table des plages vides), comme l'application
+    fresh_dir(CACHE_DIR)
+    reset_geo_cache()
+    analyze_path(ctx['path'], workers=ctx['workers'])
+
+STAGES = [
+    ('read', stage_read),
+    ('normalize_ips', stage_normalize_ips),
+    ('categorize_apply', stage_categorize_apply),
+    ('categorize_events', stage_categorize_events),
+    ('templates', stage_templates),
+    ('locate_ips_cold', stage_locate_ips_cold),
+    ('locate_ips_warm', stage_locate_ips_warm),
+    ('write_columns', stage_write_columns),
+    ('build_cube', stage_build_cube),
+    ('postings', stage_postings),
+    ('select', stage_select),
+    ('dashboard', stage_dashboard),
+    ('detect_attacks', stage_detect_attacks),
+    ('analyze_file', stage_analyze_file),
+]
+
+# Étape de référence de chaque variante optimisée (gain rapporté dans les résultats)
+BASELINES = {'categorize_events': 'categorize_apply'}
+
+def measure(stage, ctx, repeat, memory):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage(ctx)
+        times.append(time.perf_counter() - start)
+
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        stage(ctx)
+        peak_mb = (tracemalloc.get_traced_memory()[1] - baseline) / 1024 / 1024
+        tracemalloc.stop()
+    return times, peak_mb
+
+def environment():
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", nargs='+', default=['100k', '1M'], help="Tailles (suffixes k et M)")
+    parser.add_argument("--stages", nargs='+', choices=[name for name, _ in STAGES], default=None,
+                        help="Étapes mesurées (défaut: toutes; les précédentes s'exécutent sans mesure)")
+    parser.add_argument("--repeat", type=int, default=1, help="Passages chronométrés par étape")
+    parser.add_argument("--no-memory", action='store_true', help="Sans passage sous tracemalloc")
+    parser.add_argument("--workers", type=int, default=1, help="Processus pour analyze_file")
+    parser.add_argument("--output", default=None, help="Fichier de résultats (défaut: benchmarks/results/)")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    params = generator_params(args)
+    write_geo_database(geo.GEOIP_PATH, args.seed)
+    selected = set(args.stages or [name for name, _ in STAGES])
+    last = max(i for i, (name, _) in enumerate(STAGES) if name in selected)
+
+    results = []
+    for rows in map(parse_rows, args.rows):
+        path = log_path(rows, params)
+        if not os.path.exists(path):
+            print(f"Génération de {rows} lignes -> {path}", file=sys.stderr)
+            write_log(path, rows, **params)
+
+        ctx = {'path': path, 'workers': args.workers}
+        for name, stage in STAGES[:last + 1]:
+            if name not in selected:
+                stage(ctx)
+                continue
+            times, peak_mb = measure(stage, ctx, args.repeat, not args.no_memory)
+            speedup = None
+            baseline = [result for result in results if result['rows'] == rows and result['stage'] == BASELINES.get(name)]
+            if baseline and min(times):
+                speedup = baseline[0]['seconds'] / min(times)
+            results.append({
+                'rows': rows,
+                'stage': name,
+                'seconds': min(times),
+                'runs': times,
+                'peak_mb': peak_mb,
+                'speedup': speedup,
+            })
+            memory = f"{peak_mb:9.1f} Mo" if peak_mb is not None else ""
+            gain = f" x{speedup:.1f}" if speedup is not None else ""
+            print(f"{rows:>10} {name:<20} {min(times):9.3f} s {memory}{gain}", file=sys.stderr)
+
+    report = dict(environment(), params=dict(params, repeat=args.repeat, workers=args.workers),
+                  max_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, results=results)
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        label = (report['commit'] or 'local')[:10] + ('-dirty' if report['dirty'] else '')
+        output = os.path.join(RESULTS_DIR, f"{label}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(output)
+
+if __name__ == "__main__":
+    main()
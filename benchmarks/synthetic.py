@@ -0,0 +1,173 @@
+"""Journaux SSH synthétiques et déterministes pour les benchmarks.
+
+Même graine, mêmes paramètres: même fichier, octet pour octet.
+
+    python benchmarks/synthetic.py /tmp/ssh_1m.csv --rows 1000000 --mmdb /tmp/geo.mmdb
+"""
+import argparse
+import os
+
+import numpy as np
+
+from fake_mmdb import write_mmdb
+
+LOG_START = np.datetime64('2024-01-01T00:00:00', 's')
+MEAN_GAP_SECONDS = 1.0   # Écart moyen entre deux événements
+IP_BLOCKS = 2048         # Réseaux /16 d'où sont tirées les IPv4
+UNMAPPED_BLOCKS = 0.1    # Part des /16 absents de la base (adresses non localisées)
+IP_SKEW = 1.1            # Exposant de la loi de Zipf: quelques IPs très actives
+LABS = [f"lab{i}" for i in range(8)]
+COMMON_USERS = ["root", "admin", "ubuntu", "test", "oracle", "postgres", "git", "deploy"]
+
+# (poids, modèle); l'IP ne figure parfois que dans le message
+TEMPLATES = [
+    (30, "Failed password for {user} from {ip} port {port} ssh2"),
+    (15, "Failed password for invalid user {user} from {ip} port {port} ssh2"),
+    (15, "Invalid user {user} from {ip} port {port}"),
+    (10, "Disconnected from authenticating user {user} {ip} port {port} [preauth]"),
+    (5, "Accepted password for {user} from {ip} port {port} ssh2"),
+    (5, "pam_unix(sshd:session): session opened for user {user}(uid=0) by (uid=0)"),
+    (5, "pam_unix(sshd:session): session closed for user {user}"),
+    (5, "reverse mapping checking getaddrinfo for host [{ip}] failed - POSSIBLE BREAK-IN ATTEMPT!"),
+    (10, "Connection closed by {ip} port {port} [preauth]"),
+]
+IP_ONLY_IN_MESSAGE = 0.2  # Lignes dont la colonne IP est vide
+
+# Lignes malformées: horodatage illisible, IP invalide, champs manquants
+MALFORMED_KINDS = ['timestamp', 'ip', 'fields']
+
+def ip_blocks(seed):
+    # Réseaux /16 publics (premier octet hors 0, 10, 127 et au-delà de 223)
+    rng = np.random.default_rng([seed, 1])
+    first = rng.choice(np.setdiff1d(np.arange(1, 224), [10, 127]), IP_BLOCKS)
+    second = rng.integers(0, 256, IP_BLOCKS)
+    return np.unique(first * 256 + second)
+
+def ip_pool(cardinality, ipv6_ratio, seed):
+    # Adresses distinctes, dont une part d'IPv6 (2001:db8::/32 localisé)
+    rng = np.random.default_rng([seed, 2])
+    blocks = ip_blocks(seed)
+    ipv6 = int(round(cardinality * ipv6_ratio))
+    pool = set()
+    while len(pool) < cardinality - ipv6:
+        block = blocks[rng.integers(len(blocks))]
+        pool.add(f"{block >> 8}.{block & 255}.{rng.integers(256)}.{rng.integers(1, 255)}")
+    v6 = set()
+    while len(v6) < ipv6:
+        words = rng.integers(0, 1 << 16, 3)
+        v6.add(f"2001:db8:{words[0]:x}:{words[1]:x}::{words[2]:x}")
+    # Ordre fixé: le rang dans le pool donne la fréquence d'apparition
+    values = np.array(sorted(pool) + sorted(v6), dtype=object)
+    return values[rng.permutation(len(values))]
+
+def user_pool(count):
+    return np.array(COMMON_USERS + [f"user{i}" for i in range(max(count - len(COMMON_USERS), 0))], dtype=object)
+
+def zipf_weights(count):
+    weights = 1.0 / np.arange(1, count + 1) ** IP_SKEW
+    return weights / weights.sum()
+
+def generate_lines(rows, ip_cardinality=50_000, ipv6_ratio=0.1, malformed_rate=0.01, users=500,
+                   seed=0, chunk_rows=500_000):
+    # Texte du journal par blocs de lignes (CSV ';', dates triées)
+    ips = ip_pool(ip_cardinality, ipv6_ratio, seed)
+    ip_weights = zipf_weights(len(ips))
+    names = user_pool(users)
+    user_weights = zipf_weights(len(names))
+    weights = np.array([weight for weight, _ in TEMPLATES], dtype=float)
+    templates = [text for _, text in TEMPLATES]
+
+    rng = np.random.default_rng([seed, 3])
+    clock = LOG_START
+    for start in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - start)
+        gaps = rng.exponential(MEAN_GAP_SECONDS, size).astype(np.int64)
+        times = clock + np.cumsum(gaps).astype('timedelta64[s]')
+        clock = times[-1]
+        stamps = np.char.replace(np.datetime_as_string(times, unit='s'), 'T', ' ')
+
+        ip = ips[rng.choice(len(ips), size, p=ip_weights)]
+        user = names[rng.choice(len(names), size, p=user_weights)]
+        template = rng.choice(len(templates), size, p=weights / weights.sum())
+        port = rng.integers(1024, 65536, size)
+        pid = rng.integers(1000, 65000, size)
+        lab = rng.integers(0, len(LABS), size)
+        ip_column = np.where(rng.random(size) < IP_ONLY_IN_MESSAGE, "", ip)
+        malformed = np.where(rng.random(size) < malformed_rate,
+                             rng.integers(0, len(MALFORMED_KINDS), size), -1)
+
+        lines = []
+        for i in range(size):
+            message = templates[template[i]].format(user=user[i], ip=ip[i], port=port[i])
+            kind = malformed[i]
+            if kind < 0:
+                lines.append(f"{stamps[i]};{LABS[lab[i]]};sshd;{pid[i]};{ip_column[i]};{user[i]};E;{message}\n")
+            elif kind == 0:
+                lines.append(f"??{stamps[i][2:]};{LABS[lab[i]]};sshd;{pid[i]};{ip_column[i]};{user[i]};E;{message}\n")
+            elif kind == 1:
+                lines.append(f"{stamps[i]};{LABS[lab[i]]};sshd;{pid[i]};999.{pid[i] % 256}.0.1;{user[i]};E;{message}\n")
+            else:
+                lines.append(f"{stamps[i]};{LABS[lab[i]]};sshd\n")
+        yield ''.join(lines)
+
+def write_log(path, rows, **params):
+    # Écriture atomique: un fichier présent est toujours complet
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        for text in generate_lines(rows, **params):
+            f.write(text)
+    os.replace(tmp_path, path)
+    return path
+
+def write_geo_database(path, seed=0):
+    # Une ville par /16 du générateur (sauf UNMAPPED_BLOCKS), plus le /32 IPv6
+    rng = np.random.default_rng([seed, 4])
+    networks = []
+    for block in ip_blocks(seed):
+        if rng.random() < UNMAPPED_BLOCKS:
+            continue
+        country = int(rng.integers(60))
+        networks.append((f"{block >> 8}.{block & 255}.0.0/16", {
+            'city': {'names': {'fr': f"Ville{block}"}},
+            'country': {'iso_code': f"P{country}", 'names': {'fr': f"Pays{country}"}},
+            'location': {'latitude': float(rng.uniform(-60, 70)), 'longitude': float(rng.uniform(-180, 180))},
+        }))
+    networks.append(("2001:db8::/32", {
+        'country': {'iso_code': 'ZZ', 'names': {'fr': "Documentation"}},
+        'location': {'latitude': 0.0, 'longitude': 0.0},
+    }))
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    write_mmdb(tmp_path, networks, build_epoch=1_700_000_000 + seed)
+    os.replace(tmp_path, path)
+    return path
+
+def add_generator_arguments(parser):
+    parser.add_argument("--ip-cardinality", type=int, default=50_000, help="IPs distinctes")
+    parser.add_argument("--ipv6-ratio", type=float, default=0.1, help="Part d'IPv6 parmi les IPs")
+    parser.add_argument("--malformed-rate", type=float, default=0.01, help="Part de lignes malformées")
+    parser.add_argument("--users", type=int, default=500, help="Utilisateurs distincts")
+    parser.add_argument("--seed", type=int, default=0)
+
+def generator_params(args):
+    return {
+        'ip_cardinality': args.ip_cardinality,
+        'ipv6_ratio': args.ipv6_ratio,
+        'malformed_rate': args.malformed_rate,
+        'users': args.users,
+        'seed': args.seed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="Fichier journal à écrire")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--mmdb", default=None, help="Écrire aussi la base GeoLite2 synthétique à ce chemin")
+    add_generator_arguments(parser)
+    args = parser.parse_args()
+
+    write_log(args.path, args.rows, **generator_params(args))
+    if args.mmdb:
+        write_geo_database(args.mmdb, args.seed)
+
+if __name__ == "__main__":
+    main()
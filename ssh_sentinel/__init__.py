@@ -0,0 +1,5 @@
+"""Traitements de SSH Sentinel Pro importables hors de l'interface Streamlit.
+
+Les fonctions exécutées par les processus de lecture parallèle doivent vivre
+dans un module importable: Streamlit exécute app.py comme un script.
+"""
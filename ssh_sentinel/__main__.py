@@ -0,0 +1,7 @@
+import sys
+
+from .cli import main
+
+# Garde indispensable: les processus "spawn" réimportent ce module
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Analyse de journaux SSH en ligne de commande, sans interface Streamlit.
+
+    python -m ssh_sentinel /var/log/auth.log -o rapport --format parquet
+
+Écrit dans le dossier de sortie les événements enrichis (events.*), les
+agrégats (categories, ips, users, locations, hourly, alerts, et networks avec la
+base ASN) et summary.json.
+Plusieurs fichiers ou dossiers sont fusionnés en un seul jeu daté, dont la
+colonne Source indique le fichier d'origine de chaque ligne.
+Les entrées passent par le même cache que l'application: une exécution
+périodique sur un journal qui s'allonge n'analyse que les nouvelles lignes.
+"""
+import argparse
+import json
+import os
+import sys
+
+OUTPUT_FORMATS = ['csv', 'parquet', 'json']
+SUMMARY_FILES = {
+    'EventCategory': 'categories',
+    'IP': 'ips',
+    'User': 'users',
+    'Location': 'locations',
+    'ASN': 'networks',
+    'Hour': 'hourly',
+    'Alerts': 'alerts',
+}
+
+def write_table(df, path, fmt):
+    if fmt == 'parquet':
+        # Nécessite pyarrow (ou fastparquet), importé par pandas à l'écriture
+        df.to_parquet(path, index=False)
+    elif fmt == 'json':
+        df.to_json(path, orient='records', date_format='iso', force_ascii=False)
+    else:
+        df.to_csv(path, index=False)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m ssh_sentinel", description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs='+', help="Fichiers journaux (CSV ';' ou syslog) ou dossiers")
+    parser.add_argument("-o", "--output", required=True, help="Dossier de sortie")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default='csv', help="Format des tables")
+    parser.add_argument("--no-geo", action='store_true', help="Sans géolocalisation")
+    parser.add_argument("--download-geoip", action='store_true', help="Télécharger les bases GeoLite2 (City, ASN) absentes")
+    parser.add_argument("--sample", type=int, default=None, help="Nombre de lignes échantillonnées par fichier")
+    parser.add_argument("--workers", type=int, default=None, help="Processus d'analyse (défaut: SSH_SENTINEL_WORKERS ou nombre de cœurs)")
+    parser.add_argument("--cache-mb", type=int, default=None, help="Budget disque du cache (Mo)")
+    parser.add_argument("--summary-only", action='store_true', help="Ne pas écrire les événements")
+    parser.add_argument("--metrics", default=None,
+                        help="Relevés par étape: JSON, ou texte Prometheus si le nom finit par .prom")
+    parser.add_argument("--trace-memory", action='store_true', help="Pic mémoire par étape dans --metrics (plus lent)")
+    parser.add_argument("-q", "--quiet", action='store_true', help="Sans messages de progression")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Import différé: l'aide et les erreurs d'arguments restent instantanées
+    from .export import EXPORT_FORMATS, export_rows
+    from .geo import fetch_databases
+    from .metrics import NULL_METRICS, Metrics
+    from .parallel import default_workers
+    from .pipeline import analyze_paths, expand_paths, quiet, summarize
+    from .store import CACHE_MAX_MB
+
+    def notify(level, message):
+        print(f"[{level}] {message}", file=sys.stderr)
+
+    notify = quiet if args.quiet else notify
+    if args.download_geoip and not args.no_geo:
+        for kind, error in fetch_databases()[1].items():
+            notify('warning', f"Téléchargement de la base {kind} impossible: {error}")
+
+    metrics = Metrics(args.trace_memory) if args.metrics else NULL_METRICS
+    store, _ = analyze_paths(
+        args.paths,
+        enable_geo=not args.no_geo,
+        sample_size=args.sample,
+        cache_max_mb=args.cache_mb or CACHE_MAX_MB,
+        workers=args.workers or default_workers(),
+        notify=notify,
+        metrics=metrics,
+    )
+    if store is None:
+        return 1
+
+    os.makedirs(args.output, exist_ok=True)
+    if not args.summary_only:
+        path = os.path.join(args.output, f"events.{args.format}")
+        if args.format in EXPORT_FORMATS:
+            # Écriture par blocs: mémoire bornée quel que soit le nombre d'événements
+            export_rows(store, path, args.format, metrics=metrics)
+        else:
+            write_table(store.frame(), path, args.format)
+
+    totals, tables = summarize([store])
+    for name, table in tables.items():
+        write_table(table, os.path.join(args.output, f"{SUMMARY_FILES[name]}.{args.format}"), args.format)
+    with open(os.path.join(args.output, "summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(dict(totals, files=expand_paths(args.paths)), f, ensure_ascii=False, indent=2)
+    if args.metrics:
+        with open(args.metrics, 'w', encoding='utf-8') as f:
+            f.write(metrics.to_prometheus() if args.metrics.endswith('.prom') else metrics.to_json())
+    notify('success', f"{totals['events']} événements, {totals['alerts']} alertes -> {args.output}")
+    return 0
@@ -0,0 +1,174 @@
+"""Détection d'attaques: force brute, bourrage d'identifiants, pulvérisation, compromission."""
+import numpy as np
+import pandas as pd
+
+FAILURE_EVENTS = ["Tentative Échouée", "Utilisateur Invalide"]
+SUCCESS_EVENT = "Connexion Réussie"
+IGNORED_IPS = ["IP Inconnue", "IP Invalide"]
+IGNORED_USERS = ["", "unknown"]
+
+BRUTE_FORCE_WINDOW = np.timedelta64(10, 'm')   # Fenêtre glissante par IP
+BRUTE_FORCE_THRESHOLD = 20                     # Échecs d'une IP dans la fenêtre
+STUFFING_WINDOW = np.timedelta64(10, 'm')      # Fenêtre glissante par compte
+STUFFING_THRESHOLD = 20                        # Échecs sur un compte, toutes IPs confondues
+SPRAYING_THRESHOLD = 10                        # Comptes distincts essayés par une IP
+COMPROMISE_LOOKBACK = np.timedelta64(1, 'h')   # Échecs pris en compte avant un succès
+COMPROMISE_THRESHOLD = 5                       # Échecs de la même IP avant une connexion réussie
+
+# Du plus grave au moins grave
+SEVERITIES = ["Critique", "Élevée", "Moyenne"]
+ALERT_COLUMNS = ['Sévérité', 'Type', 'IP', 'Utilisateur', 'Début', 'Fin', 'Événements', 'Détail']
+
+def group_keys(groups, seconds, span, origin):
+    # Clé (groupe, instant) sur un seul entier croissant, pour des événements
+    # déjà triés par date: tri stable par groupe, chaque groupe décalé de
+    # `span` secondes (plus que la durée totale)
+    order = np.argsort(groups, kind='stable')
+    return order, groups[order].astype(np.int64) * span + (seconds[order] - origin)
+
+def window_peaks(groups, seconds, span, origin, window):
+    # Pic d'événements par groupe dans une fenêtre glissante de `window`
+    # secondes: une passe triée, un résultat par groupe
+    order, keys = group_keys(groups, seconds, span, origin)
+    sorted_groups = groups[order]
+    first = np.searchsorted(keys, keys - window, side='right')
+    positions = np.arange(len(keys))
+    counts = positions - first + 1
+    if not len(keys):
+        return pd.DataFrame(columns=['group', 'peak', 'start', 'end', 'total'], dtype=np.int64), order, keys
+
+    # Premier pic de chaque groupe
+    starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+    sizes = np.diff(np.append(starts, len(keys)))
+    best = np.maximum.reduceat(counts, starts)
+    peaks = np.minimum.reduceat(np.where(counts == np.repeat(best, sizes), positions, len(keys)), starts)
+    sorted_seconds = seconds[order]
+    return pd.DataFrame({
+        'group': sorted_groups[starts],
+        'peak': best,
+        'start': sorted_seconds[first[peaks]],
+        'end': sorted_seconds[peaks],
+        'total': sizes,
+    }), order, keys
+
+def label_codes(values, labels):
+    # Codes des libellés présents dans le dictionnaire de `values`
+    codes = values.categories.get_indexer(labels)
+    return codes[codes >= 0]
+
+def as_time(seconds):
+    return pd.to_datetime(np.asarray(seconds, dtype=np.int64), unit='s')
+
+def severity(values, high):
+    return np.where(np.asarray(values) >= high, "Élevée", "Moyenne")
+
+def detect_attacks(timestamps, categories, ips, users):
+    # timestamps: dates triées (sans NaT); categories, ips, users: pd.Categorical
+    # alignés. Renvoie une alerte par IP ou par compte suspect, et une par
+    # (IP, compte) connecté après une série d'échecs, classées par sévérité
+    seconds = np.asarray(timestamps).astype('datetime64[s]').astype(np.int64)
+    ip_codes = np.asarray(ips.codes, dtype=np.int64)
+    user_codes = np.asarray(users.codes, dtype=np.int64)
+    category_codes = np.asarray(categories.codes)
+
+    failure = np.isin(category_codes, label_codes(categories, FAILURE_EVENTS))
+    success = np.isin(category_codes, label_codes(categories, [SUCCESS_EVENT]))
+    known_ip = ~np.isin(ip_codes, label_codes(ips, IGNORED_IPS)) & (ip_codes >= 0)
+    known_user = ~np.isin(user_codes, label_codes(users, IGNORED_USERS)) & (user_codes >= 0)
+    alerts = []
+
+    windows = [int(delta / np.timedelta64(1, 's')) for delta in (BRUTE_FORCE_WINDOW, STUFFING_WINDOW, COMPROMISE_LOOKBACK)]
+    origin = int(seconds[0]) if len(seconds) else 0
+    span = int(seconds[-1]) - origin + max(windows) + 1 if len(seconds) else 1
+    if max(len(ips.categories), len(users.categories)) >= np.iinfo(np.int64).max // span:
+        raise OverflowError("Période trop longue pour les clés (groupe, instant)")
+
+    # Force brute: pic d'échecs d'une IP dans la fenêtre
+    failures = np.flatnonzero(failure & known_ip)
+    peaks, failure_order, failure_keys = window_peaks(ip_codes[failures], seconds[failures], span, origin, windows[0])
+    peaks = peaks[peaks['peak'] >= BRUTE_FORCE_THRESHOLD]
+    alerts.append(pd.DataFrame({
+        'Sévérité': severity(peaks['peak'], BRUTE_FORCE_THRESHOLD * 5),
+        'Type': "Force brute",
+        'IP': ips.categories[peaks['group']],
+        'Utilisateur': "",
+        'Début': as_time(peaks['start']),
+        'Fin': as_time(peaks['end']),
+        'Événements': peaks['total'].to_numpy(),
+        'Détail': [f"{peak} échecs en {BRUTE_FORCE_WINDOW.astype(int)} min" for peak in peaks['peak']],
+    }))
+
+    # Pulvérisation: nombreux comptes distincts essayés par une même IP
+    rows = np.flatnonzero(failure & known_ip & known_user)
+    pairs = np.sort(ip_codes[rows] * (len(users.categories) + 1) + user_codes[rows])
+    pairs = pairs[np.r_[True, pairs[1:] != pairs[:-1]]] if len(pairs) else pairs
+    distinct_users = np.bincount(pairs // (len(users.categories) + 1), minlength=len(ips.categories))
+    sprayers = np.flatnonzero(distinct_users >= SPRAYING_THRESHOLD)
+    if len(sprayers):
+        sprayer_rows = rows[np.isin(ip_codes[rows], sprayers)]
+        bounds = pd.DataFrame({'ip': ip_codes[sprayer_rows], 's': seconds[sprayer_rows]}).groupby('ip')['s'].agg(['min', 'max', 'size'])
+        alerts.append(pd.DataFrame({
+            'Sévérité': severity(distinct_users[bounds.index], SPRAYING_THRESHOLD * 5),
+            'Type': "Pulvérisation de mots de passe",
+            'IP': ips.categories[bounds.index],
+            'Utilisateur': "",
+            'Début': as_time(bounds['min']),
+            'Fin': as_time(bounds['max']),
+            'Événements': bounds['size'].to_numpy(),
+            'Détail': [f"{count} comptes distincts essayés" for count in distinct_users[bounds.index]],
+        }))
+
+    # Bourrage d'identifiants: pic d'échecs sur un compte, toutes IPs confondues
+    rows = np.flatnonzero(failure & known_user)
+    peaks = window_peaks(user_codes[rows], seconds[rows], span, origin, windows[1])[0]
+    peaks = peaks[peaks['peak'] >= STUFFING_THRESHOLD]
+    alerts.append(pd.DataFrame({
+        'Sévérité': severity(peaks['peak'], STUFFING_THRESHOLD * 5),
+        'Type': "Bourrage d'identifiants",
+        'IP': "",
+        'Utilisateur': users.categories[peaks['group']],
+        'Début': as_time(peaks['start']),
+        'Fin': as_time(peaks['end']),
+        'Événements': peaks['total'].to_numpy(),
+        'Détail': [f"{peak} échecs sur le compte en {STUFFING_WINDOW.astype(int)} min" for peak in peaks['peak']],
+    }))
+
+    # Compromission possible: connexion réussie d'une IP après une série
+    # d'échecs de cette même IP dans la période précédente (échecs de la même
+    # seconde exclus), une alerte par (IP, compte)
+    # (clés des échecs par IP déjà calculées pour la force brute)
+    successes = np.flatnonzero(success & known_ip)
+    if len(failures) and len(successes):
+        success_order, success_keys = group_keys(ip_codes[successes], seconds[successes], span, origin)
+        first = np.searchsorted(failure_keys, success_keys - windows[2], side='left')
+        last = np.searchsorted(failure_keys, success_keys, side='left')
+        suspicious = (last - first) >= COMPROMISE_THRESHOLD
+        rows = successes[success_order[suspicious]]
+        first_failure = failures[failure_order[first[suspicious]]]
+        pairs = pd.DataFrame({
+            'ip': ip_codes[rows], 'user': user_codes[rows], 'start': seconds[first_failure],
+            'end': seconds[rows], 'failures': (last - first)[suspicious],
+        }).groupby(['ip', 'user']).agg(start=('start', 'min'), end=('end', 'max'),
+                                       successes=('end', 'size'), peak=('failures', 'max')).reset_index()
+        # Échecs de l'IP entre le premier échec retenu et la dernière connexion
+        ip_keys = pairs['ip'].to_numpy() * span - origin
+        failed = np.searchsorted(failure_keys, ip_keys + pairs['end'].to_numpy(), side='left') - \
+                 np.searchsorted(failure_keys, ip_keys + pairs['start'].to_numpy(), side='left')
+        alerts.append(pd.DataFrame({
+            'Sévérité': "Critique",
+            'Type': "Compromission possible",
+            'IP': ips.categories[pairs['ip']],
+            # Code -1 (utilisateur absent): dernière case, vide
+            'Utilisateur': np.append(np.asarray(users.categories, dtype=object), "")[pairs['user']],
+            'Début': as_time(pairs['start']),
+            'Fin': as_time(pairs['end']),
+            'Événements': pairs['successes'].to_numpy() + failed,
+            'Détail': [f"Connexion réussie après {peak} échecs" if count == 1
+                       else f"{count} connexions réussies, jusqu'à {peak} échecs avant chacune"
+                       for count, peak in zip(pairs['successes'], pairs['peak'])],
+        }))
+
+    result = pd.concat([alert for alert in alerts if len(alert)], ignore_index=True) \
+        if any(len(alert) for alert in alerts) else pd.DataFrame(columns=ALERT_COLUMNS)
+    result['Sévérité'] = pd.Categorical(result['Sévérité'], categories=SEVERITIES, ordered=True)
+    return result.sort_values(['Sévérité', 'Événements'], ascending=[True, False], kind='stable', ignore_index=True)
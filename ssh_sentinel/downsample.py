@@ -0,0 +1,79 @@
+"""Réduction des données envoyées au navigateur: carte sur grille, séries longues.
+
+Les graphiques reçoivent un nombre de points borné, quelle que soit la taille
+du jeu de données; les agrégats restent exacts (sommes par case de la grille).
+"""
+import numpy as np
+import pandas as pd
+
+MAX_MAP_POINTS = 2000       # Points de la carte au-delà desquels les lieux sont regroupés
+MAP_CELL_DEGREES = 0.25     # Première taille de case essayée (degrés), doublée jusqu'au plafond
+MAX_SERIES_POINTS = 1000    # Points d'une série temporelle au-delà desquels elle est réduite
+
+def bin_points(lat, lon, weights, labels, max_points=MAX_MAP_POINTS, cell=MAP_CELL_DEGREES):
+    # Lieux (lat, lon, poids, libellé) regroupés sur une grille assez
+    # grossière pour tenir en `max_points` cases. Chaque case est placée au
+    # barycentre de ses lieux et porte le libellé du plus actif, suivi du
+    # nombre d'autres lieux. Renvoie (DataFrame lat, lon, Count, Location, taille de case ou None)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    labels = np.asarray(labels, dtype=object)
+
+    # Lieux exacts d'abord: une entrée par coordonnées distinctes
+    _, first, points = np.unique(np.column_stack([lat, lon]), axis=0, return_index=True, return_inverse=True)
+    points = np.ravel(points)
+    size = None
+    while len(first) > max_points and (size is None or size < 180):
+        size = cell if size is None else size * 2
+        keys = np.column_stack([np.floor(lat / size), np.floor(lon / size)])
+        _, first, points = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+        points = np.ravel(points)
+
+    totals = np.bincount(points, weights=weights)
+    safe = np.where(totals > 0, totals, 1)
+    center_lat = np.bincount(points, weights=lat * weights) / safe
+    center_lon = np.bincount(points, weights=lon * weights) / safe
+
+    # Libellé dominant: lieux de même libellé cumulés, puis le plus lourd par case
+    label_codes, label_values = pd.factorize(labels)
+    pairs, pair_index = np.unique(np.column_stack([points, label_codes]), axis=0, return_inverse=True)
+    pair_weights = np.bincount(np.ravel(pair_index), weights=weights)
+    order = np.lexsort((-pair_weights, pairs[:, 0]))
+    starts = np.searchsorted(pairs[order, 0], np.arange(len(totals)))
+    dominant = label_values[pairs[order[starts], 1]]
+    others = np.bincount(pairs[:, 0], minlength=len(totals)) - 1
+    names = [name if extra == 0 else f"{name} (+{extra})" for name, extra in zip(dominant, others)]
+
+    return pd.DataFrame({
+        'lat': center_lat,
+        'lon': center_lon,
+        'Count': totals.astype(np.int64),
+        'Location': names,
+    }), size
+
+def lttb(x, y, threshold=MAX_SERIES_POINTS):
+    # Largest-Triangle-Three-Buckets (Steinarsson, 2013): positions des
+    # points conservés. Le premier et le dernier restent; dans chaque seau,
+    # le point qui forme le plus grand triangle avec le précédent retenu et
+    # la moyenne du seau suivant, ce qui préserve pics et creux
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
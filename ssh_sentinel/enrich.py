@@ -0,0 +1,223 @@
+"""Enrichissement des événements: catégories, adresses IP, géolocalisation."""
+import ipaddress
+
+import numpy as np
+import pandas as pd
+
+from .metrics import NULL_METRICS
+
+# Règles par ordre de priorité: la première sous-chaîne trouvée l'emporte
+EVENT_RULES = [
+    ("failed password", "Tentative Échouée"),
+    ("accepted password", "Connexion Réussie"),
+    ("invalid user", "Utilisateur Invalide"),
+    ("break-in", "Tentative d'Intrusion"),
+    ("intrusion", "Tentative d'Intrusion"),
+    ("disconnected", "Déconnexion"),
+    ("session opened", "Session Ouverte"),
+    ("session closed", "Session Fermée"),
+]
+DEFAULT_EVENT = "Autre Événement"
+EVENT_CATEGORIES = list(dict.fromkeys(label for _, label in EVENT_RULES)) + [DEFAULT_EVENT]
+
+def categorize_event(message):
+    msg = str(message).lower()
+    for needle, label in EVENT_RULES:
+        if needle in msg:
+            return label
+    return DEFAULT_EVENT
+
+def rule_labels(texts):
+    # Indice dans EVENT_CATEGORIES de chaque texte: une recherche pyarrow par
+    # règle, dans l'ordre de priorité, sur les seuls textes encore sans
+    # catégorie. Textes non ASCII (minuscules propres à str.lower) et absence
+    # de pyarrow: categorize_event, texte par texte
+    labels = np.full(len(texts), EVENT_CATEGORIES.index(DEFAULT_EVENT), dtype=np.int8)
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        other = np.arange(len(texts))
+    else:
+        array = pa.array(texts.array)
+        ascii_texts = np.asarray(pc.string_is_ascii(array), dtype=bool)
+        other = np.flatnonzero(~ascii_texts)
+        remaining = np.flatnonzero(ascii_texts)
+        lowered = pc.ascii_lower(array.filter(pa.array(ascii_texts)))
+        for needle, label in EVENT_RULES:
+            found = np.asarray(pc.match_substring(lowered, needle), dtype=bool)
+            labels[remaining[found]] = EVENT_CATEGORIES.index(label)
+            remaining, lowered = remaining[~found], lowered.filter(pa.array(~found))
+    for i in other:
+        labels[i] = EVENT_CATEGORIES.index(categorize_event(texts[i]))
+    return labels
+
+def categorize_events(messages):
+    # Classification vectorisée sur les messages distincts (catégories d'une
+    # colonne catégorielle, sinon valeurs factorisées)
+    if isinstance(messages.dtype, pd.CategoricalDtype):
+        codes, uniques = np.asarray(pd.Categorical(messages).codes), messages.dtype.categories
+    else:
+        codes, uniques = pd.factorize(messages)
+    if uniques.dtype != 'str':
+        uniques = pd.Index([str(value) for value in uniques], dtype='str')
+
+    unique_labels = np.empty(len(uniques) + 1, dtype=np.int8)
+    unique_labels[:-1] = rule_labels(pd.Index(uniques))
+    # Les valeurs manquantes (code -1) tombent sur la dernière case, "nan"
+    unique_labels[-1] = EVENT_CATEGORIES.index(categorize_event(np.nan))
+    return pd.Categorical.from_codes(unique_labels[codes], categories=EVENT_CATEGORIES)
+
+UNKNOWN_IP = "IP Inconnue"
+INVALID_IP = "IP Invalide"
+
+IPV4_PATTERN = r'((\d{1,3})\.(\d{1,3})\.(\d{1,3})\.(\d{1,3}))'
+IPV6_PATTERN = (
+    r'(?<![\w:.])('
+    r'(?:[0-9A-Fa-f]{1,4}:){7}[0-9A-Fa-f]{1,4}'
+    r'|(?:[0-9A-Fa-f]{1,4}:){0,7}[0-9A-Fa-f]{0,4}::(?:[0-9A-Fa-f]{1,4}:){0,7}[0-9A-Fa-f]{0,4}'
+    r')(?![\w:.])'
+)
+
+def extract_ips(texts):
+    # Première adresse de chaque texte: IPv4 validée par calcul sur les octets,
+    # IPv6 seulement en l'absence de motif IPv4
+    texts = pd.Series(texts, dtype=object).fillna('').astype(str)
+    result = np.full(len(texts), UNKNOWN_IP, dtype=object)
+
+    ipv4 = texts.str.extract(IPV4_PATTERN)
+    has_ipv4 = ipv4[0].notna().to_numpy()
+    if has_ipv4.any():
+        found = ipv4[has_ipv4]
+        octets = found[[1, 2, 3, 4]]
+        values = octets.astype(np.int64).to_numpy()
+        # Même règle que ipaddress: pas de zéro non significatif
+        leading_zero = np.column_stack([
+            (octets[col].str.len() > 1) & octets[col].str.startswith('0')
+            for col in octets.columns
+        ])
+        valid = (values <= 255).all(axis=1) & ~leading_zero.any(axis=1)
+        rows = np.flatnonzero(has_ipv4)
+        result[rows] = np.where(valid, found[0].to_numpy(dtype=object), INVALID_IP)
+
+    if (~has_ipv4).any():
+        ipv6 = texts[~has_ipv4].str.extract(IPV6_PATTERN)[0]
+        candidates = ipv6.dropna()
+        canonical = {}
+        for candidate in candidates.unique():
+            try:
+                canonical[candidate] = str(ipaddress.IPv6Address(candidate))
+            except ValueError:
+                canonical[candidate] = INVALID_IP
+        rows = np.flatnonzero(~has_ipv4)[ipv6.notna().to_numpy()]
+        result[rows] = candidates.map(canonical).to_numpy(dtype=object)
+
+    return result
+
+def normalize_ips(ips, messages):
+    # Traitement par valeur distincte, puis repli sur le message
+    # pour les lignes sans IP exploitable
+    codes, uniques = pd.factorize(ips)
+    labels = np.append(extract_ips(uniques), UNKNOWN_IP)[codes]
+
+    missing = (labels == UNKNOWN_IP) | (labels == INVALID_IP)
+    if missing.any():
+        msg_codes, msg_uniques = pd.factorize(messages[missing])
+        from_message = np.append(extract_ips(msg_uniques), UNKNOWN_IP)
+        from_message[from_message == INVALID_IP] = UNKNOWN_IP
+        labels[missing] = from_message[msg_codes]
+
+    return pd.Categorical(labels)
+
+def pack_ips(values):
+    # Adresses sur 16 octets (IPv4 mappées en ::ffff:a.b.c.d), triables
+    # octet par octet; zéro pour les libellés qui ne sont pas des IP
+    values = pd.Series(values, dtype=object).fillna('').astype(str)
+    packed = np.zeros((len(values), 16), dtype=np.uint8)
+
+    ipv4 = values.str.fullmatch(r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}').to_numpy(dtype=bool)
+    if ipv4.any():
+        octets = values[ipv4].str.split('.', expand=True).astype(np.uint8).to_numpy()
+        packed[ipv4, 10:12] = 0xFF
+        packed[ipv4, 12:] = octets
+
+    for row in np.flatnonzero(values.str.contains(':', regex=False).to_numpy(dtype=bool)):
+        packed[row] = np.frombuffer(ipaddress.IPv6Address(values.iat[row]).packed, dtype=np.uint8)
+
+    return packed.view('S16').ravel()
+
+def enrich_frame(df, metrics=NULL_METRICS):
+    # Enrichissement ligne à ligne, calculable bloc par bloc: IPs normalisées
+    # (colonne IP puis message). La catégorie d'événement est calculée avec
+    # le masquage des messages (voir ssh_sentinel.templates.split_messages)
+    with metrics.stage('normalize_ips', len(df)):
+        df['IP'] = normalize_ips(df['IP'], df['Message'])
+    return df
+
+UNKNOWN_LOCATION = "Localisation Inconnue"
+GEO_ERROR = "Erreur de Géolocalisation"
+
+def describe_location(match):
+    if not match:
+        return (UNKNOWN_LOCATION, None, None)
+
+    city = match.get('city', {}).get('names', {}).get('fr', '')
+    country = match.get('country', {}).get('names', {}).get('fr', match.get('country', {}).get('iso_code', ''))
+    latitude = match.get('location', {}).get('latitude')
+    longitude = match.get('location', {}).get('longitude')
+
+    location_text = ""
+    if city:
+        location_text += city
+    if country:
+        if location_text:
+            location_text += ", "
+        location_text += country
+
+    if not location_text:
+        location_text = UNKNOWN_LOCATION
+
+    return (location_text, latitude, longitude)
+
+UNKNOWN_ASN = "AS Inconnu"
+
+def describe_asn(match):
+    # Système autonome d'une base GeoLite2-ASN: "AS15169 Google LLC"
+    if not match or not match.get('autonomous_system_number'):
+        return (UNKNOWN_ASN,)
+    organization = match.get('autonomous_system_organization', '')
+    return (f"AS{match['autonomous_system_number']} {organization}".strip(),)
+
+# Description d'un réseau selon la base interrogée (voir ssh_sentinel.geo)
+NETWORK_DESCRIBERS = {'geoip': describe_location, 'asn': describe_asn}
+
+def network_bounds(packed, prefix_len, is_ipv4):
+    # Plage [début, fin] du réseau GeoLite contenant l'adresse
+    host_bits = 128 - max(prefix_len, 0) - (96 if is_ipv4 else 0)
+    value = int.from_bytes(packed.ljust(16, b'\x00'), 'big')
+    start = (value >> host_bits) << host_bits
+    end = start | ((1 << host_bits) - 1)
+    return start.to_bytes(16, 'big'), end.to_bytes(16, 'big')
+
+def resolve_networks(reader, ips, packed, describe=describe_location):
+    # Interrogation de la base pour des adresses triées: une adresse du
+    # réseau qui vient d'être résolu n'interroge pas la base à nouveau.
+    # Renvoie les réseaux trouvés (début -> fin, puis la description:
+    # localisation, lat, lon par défaut), les positions en erreur et le
+    # nombre de requêtes évitées
+    new_ranges = {}
+    errors = []
+    skipped = 0
+    last_end = None
+    for i, ip in enumerate(ips):
+        if last_end is not None and packed[i] <= last_end:
+            skipped += 1
+            continue
+        try:
+            match, prefix_len = reader.get_with_prefix_len(ip)
+        except Exception:
+            errors.append(i)
+            continue
+        start, last_end = network_bounds(packed[i], prefix_len, ':' not in ip)
+        new_ranges[start] = (last_end,) + describe(match)
+    return new_ranges, errors, skipped
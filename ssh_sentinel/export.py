@@ -0,0 +1,104 @@
+"""Export par blocs des lignes filtrées: CSV, CSV compressé (gzip) ou Parquet.
+
+Chaque bloc de lignes est matérialisé, écrit puis libéré avant le suivant: la
+mémoire dépend de la taille des blocs, pas du nombre de lignes exportées
+(export_rows). Seul export_bytes, pour les téléchargements, renvoie le
+fichier final en mémoire.
+"""
+import gzip
+import os
+import tempfile
+
+import numpy as np
+
+from .metrics import NULL_METRICS
+
+EXPORT_CHUNK_ROWS = 100_000     # Lignes matérialisées à la fois
+EXPORT_FORMATS = {              # Format -> (extension, type MIME)
+    'csv': ('.csv', 'text/csv'),
+    'csv.gz': ('.csv.gz', 'application/gzip'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+def row_chunks(store, rows=slice(None), chunk_rows=EXPORT_CHUNK_ROWS):
+    # Sélection de ColumnStore.select (tranche ou positions) en blocs
+    # consécutifs; au moins un bloc, éventuellement vide (en-tête seul)
+    if isinstance(rows, slice):
+        start, stop, _ = rows.indices(len(store))
+        for lo in range(start, max(stop, start + 1), chunk_rows):
+            yield slice(lo, min(lo + chunk_rows, stop))
+    else:
+        for lo in range(0, max(len(rows), 1), chunk_rows):
+            yield rows[lo:lo + chunk_rows]
+
+def frame_chunks(store, rows=slice(None), columns=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Heure et jour de la semaine sont flottants dès qu'une date invalide
+    # (NaN) figure dans la sélection: tous les blocs suivent le type qu'aurait
+    # un export d'un seul tenant. Les dates invalides sont en fin d'entrée
+    if isinstance(rows, slice):
+        start, stop, _ = rows.indices(len(store))
+        last = stop - 1 if stop > start else None
+    else:
+        last = int(rows[-1]) if len(rows) else None
+    floats = last is not None and last >= store.valid_rows().stop
+    for chunk in row_chunks(store, rows, chunk_rows):
+        df = store.frame(columns, rows=chunk)
+        if floats:
+            for name in df.columns.intersection(['Hour', 'DayOfWeek']):
+                df[name] = df[name].astype(np.float64)
+        yield df
+
+def write_parquet(chunks, path):
+    # Nécessite pyarrow, importé à l'écriture. Un groupe de lignes par bloc;
+    # les colonnes catégorielles sont écrites en texte (Parquet les encode
+    # par dictionnaire): le schéma ne dépend pas du dictionnaire de chaque bloc
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for df in chunks:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if writer is None:
+                schema = pa.schema([
+                    pa.field(field.name, field.type.value_type if pa.types.is_dictionary(field.type) else field.type)
+                    for field in table.schema
+                ])
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(table.cast(schema))
+    finally:
+        if writer is not None:
+            writer.close()
+
+def write_csv(chunks, path, compress=False):
+    opener = gzip.open if compress else open
+    with opener(path, 'wt', encoding='utf-8', newline='') as f:
+        for i, df in enumerate(chunks):
+            df.to_csv(f, header=i == 0, index=False)
+
+def export_rows(store, path, fmt='csv', rows=slice(None), columns=None,
+                chunk_rows=EXPORT_CHUNK_ROWS, metrics=NULL_METRICS):
+    # Lignes `rows` (toutes par défaut), colonnes `columns` (toutes par
+    # défaut) écrites dans `path` au format `fmt` (voir EXPORT_FORMATS)
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu: {fmt}")
+    start, stop, _ = rows.indices(len(store)) if isinstance(rows, slice) else (0, len(rows), 1)
+    with metrics.stage('export', max(stop - start, 0)):
+        chunks = frame_chunks(store, rows, columns, chunk_rows)
+        if fmt == 'parquet':
+            write_parquet(chunks, path)
+        else:
+            write_csv(chunks, path, compress=fmt == 'csv.gz')
+
+def export_bytes(store, fmt='csv', rows=slice(None), columns=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    # Contenu du fichier exporté, pour un téléchargement: écrit par blocs dans
+    # un fichier temporaire, relu puis supprimé. Le fichier final (compressé
+    # en csv.gz et Parquet) est entièrement en mémoire
+    fd, path = tempfile.mkstemp(prefix="ssh_export_", suffix=EXPORT_FORMATS.get(fmt, ('',))[0])
+    os.close(fd)
+    try:
+        export_rows(store, path, fmt, rows, columns, chunk_rows)
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.unlink(path)
@@ -0,0 +1,284 @@
+"""Géolocalisation des IPs: bases GeoLite2 locales et tables persistantes des plages résolues.
+
+Les bases (City, et ASN si présente) sont ouvertes une fois par processus,
+projetées en mémoire, et partagées par tous les chargements. Le
+téléchargement et la vérification des mises à jour se font en arrière-plan:
+le démarrage ne dépend jamais du réseau.
+"""
+import os
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.request
+from email.utils import formatdate
+
+import numpy as np
+
+from .enrich import (
+    GEO_ERROR, INVALID_IP, NETWORK_DESCRIBERS, UNKNOWN_ASN, UNKNOWN_IP, UNKNOWN_LOCATION, pack_ips,
+    resolve_networks
+)
+from .parallel import PARALLEL_MIN_LOOKUPS, parallel_resolve
+from .store import CACHE_DIR
+
+GEOIP_URL = "https://github.com/P3TERX/GeoLite.mmdb/raw/download/GeoLite2-City.mmdb"
+GEOIP_PATH = os.environ.get("SSH_SENTINEL_GEOIP_PATH", "GeoLite2-City.mmdb")
+ASN_URL = "https://github.com/P3TERX/GeoLite.mmdb/raw/download/GeoLite2-ASN.mmdb"
+ASN_PATH = os.environ.get("SSH_SENTINEL_ASN_PATH", "GeoLite2-ASN.mmdb")
+GEOIP_DATABASES = {'geoip': (GEOIP_PATH, GEOIP_URL), 'asn': (ASN_PATH, ASN_URL)}
+ASN_COLUMN = 'ASN'
+
+GEOIP_AUTO_UPDATE = os.environ.get("SSH_SENTINEL_GEOIP_UPDATE", "1") != "0"  # 0: hors ligne, bases gérées à la main
+GEOIP_UPDATE_SECONDS = 7 * 24 * 3600    # Âge d'une base au-delà duquel une version plus récente est cherchée
+GEOIP_RETRY_SECONDS = 15 * 60           # Nouvel essai après un échec (réseau absent...)
+GEOIP_TIMEOUT = 30                      # Délai réseau (s)
+
+# Colonnes décrivant une plage, par base (après 'start' et 'end')
+RANGE_FIELDS = {
+    'geoip': [('location', str), ('lat', np.float64), ('lon', np.float64)],
+    'asn': [('asn', str)],
+}
+NON_ROUTABLE_IPS = [UNKNOWN_IP, INVALID_IP, "localhost", "127.0.0.1", "::1"]
+
+def fetch_geoip(path=GEOIP_PATH, url=GEOIP_URL, update=False):
+    # Téléchargement de la base si elle est absente, ou avec `update` si le
+    # serveur en a une plus récente; renvoie True si la base a été
+    # (re)téléchargée. Lève l'erreur réseau
+    if os.path.exists(path) and not update:
+        return False
+    request = urllib.request.Request(url)
+    if os.path.exists(path):
+        request.add_header("If-Modified-Since", formatdate(os.path.getmtime(path), usegmt=True))
+    try:
+        response = urllib.request.urlopen(request, timeout=GEOIP_TIMEOUT)
+    except urllib.error.HTTPError as e:
+        if e.code != 304:
+            raise
+        # Base à jour: prochaine vérification dans GEOIP_UPDATE_SECONDS
+        os.utime(path)
+        return False
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with response, open(tmp_path, 'wb') as f:
+            shutil.copyfileobj(response, f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+def fetch_databases(update=False):
+    # Toutes les bases; l'échec de l'une n'empêche pas les autres.
+    # Renvoie (bases téléchargées, erreurs par base)
+    fetched, errors = [], {}
+    for kind, (path, url) in GEOIP_DATABASES.items():
+        stale = os.path.exists(path) and time.time() - os.path.getmtime(path) >= GEOIP_UPDATE_SECONDS
+        try:
+            if fetch_geoip(path, url, update=update and stale):
+                fetched.append(kind)
+        except Exception as e:
+            errors[kind] = str(e)
+    return fetched, errors
+
+# Téléchargements en arrière-plan: un fil à la fois par processus
+geoip_updates = {'thread': None, 'next': 0.0, 'fetched': [], 'errors': {}}
+_updates_lock = threading.Lock()
+
+def _run_updates():
+    fetched, errors = fetch_databases(update=True)
+    with _updates_lock:
+        geoip_updates['fetched'].extend(fetched)
+        geoip_updates['errors'] = errors
+        geoip_updates['next'] = time.time() + (GEOIP_RETRY_SECONDS if errors else GEOIP_UPDATE_SECONDS)
+
+def start_geoip_updates():
+    # Bases absentes téléchargées et bases anciennes vérifiées dans un fil
+    # séparé, au plus une fois par GEOIP_UPDATE_SECONDS; rend la main
+    # immédiatement. Une base remplacée est rouverte au chargement suivant
+    if not GEOIP_AUTO_UPDATE:
+        return None
+    with _updates_lock:
+        thread = geoip_updates['thread']
+        if (thread is not None and thread.is_alive()) or time.time() < geoip_updates['next']:
+            return thread
+        thread = threading.Thread(target=_run_updates, name="geoip-updates", daemon=True)
+        geoip_updates['thread'] = thread
+        thread.start()
+    return thread
+
+def geoip_updating():
+    thread = geoip_updates['thread']
+    return thread is not None and thread.is_alive()
+
+# Lecteurs par base, partagés par les chargements (et les sessions
+# Streamlit) du processus; rouverts quand le fichier a été remplacé
+_readers = {}
+_readers_lock = threading.Lock()
+
+def open_reader(path, notify=None):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _readers_lock:
+        cached = _readers.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        from maxminddb import MODE_MMAP, open_database
+        try:
+            reader = open_database(path, MODE_MMAP)
+        except Exception as e:
+            if notify is not None:
+                notify('error', f"Erreur d'initialisation GeoLite2 ({os.path.basename(path)}): {e}")
+            return None
+        # L'ancien lecteur n'est pas fermé: un chargement en cours peut s'en servir
+        _readers[path] = (signature, reader)
+        return reader
+
+def init_geo_reader(notify=None):
+    return open_reader(GEOIP_PATH, notify)
+
+def database_version(path):
+    # Date de construction de la base (build_epoch), None si absente ou illisible
+    reader = open_reader(path)
+    return reader.metadata().build_epoch if reader is not None else None
+
+def database_paths(kinds=GEOIP_DATABASES):
+    # Chemins des bases présentes, pour les processus d'analyse parallèle
+    return {kind: GEOIP_DATABASES[kind][0] for kind in kinds if os.path.exists(GEOIP_DATABASES[kind][0])}
+
+# Tables des plages résolues par base: (chemin du fichier, table)
+range_tables = {}
+
+def empty_ranges(kind='geoip'):
+    ranges = {'start': np.array([], dtype='S16'), 'end': np.array([], dtype='S16')}
+    for name, dtype in RANGE_FIELDS[kind]:
+        ranges[name] = np.array([], dtype=dtype)
+    return ranges
+
+def geo_cache_path(reader, kind='geoip'):
+    # Une table par version de la base: une nouvelle base invalide le cache
+    return os.path.join(CACHE_DIR, f"{kind}_{reader.metadata().build_epoch}.npz")
+
+def load_ranges(reader, kind='geoip'):
+    path = geo_cache_path(reader, kind)
+    cached = range_tables.get(kind)
+    if cached is not None and cached[0] == path:
+        return cached[1]
+    ranges = empty_ranges(kind)
+    if os.path.exists(path):
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                ranges = {key: data[key] for key in data.files}
+        except Exception:
+            ranges = empty_ranges(kind)
+    range_tables[kind] = (path, ranges)
+    return ranges
+
+def save_ranges(reader, ranges, kind='geoip'):
+    path = geo_cache_path(reader, kind)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Les tables des versions précédentes de la base ne servent plus
+    for f in os.listdir(CACHE_DIR):
+        if f.startswith(f"{kind}_") and f.endswith(".npz") and os.path.join(CACHE_DIR, f) != path:
+            os.remove(os.path.join(CACHE_DIR, f))
+
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}.npz"
+    np.savez(tmp_path, **ranges)
+    os.replace(tmp_path, path)
+    range_tables[kind] = (path, ranges)
+
+def lookup_geo_ranges(ranges, packed):
+    # Recherche dichotomique vectorisée dans les plages triées
+    index = np.searchsorted(ranges['start'], packed, side='right') - 1
+    found = index >= 0
+    found[found] &= packed[found] <= ranges['end'][index[found]]
+    return index, found
+
+def resolve_ranges(reader, ips, kind='geoip', pool=None, workers=1, packed=None):
+    # Plages de la base `kind` couvrant les adresses `ips` (routables): table
+    # persistante, la base n'est interrogée que pour les adresses hors des
+    # plages connues (par les processus de `pool` quand elles sont nombreuses).
+    # Renvoie (table, position de la plage de chaque adresse, adresse
+    # couverte, statistiques, positions en erreur). `packed`: adresses déjà
+    # empaquetées (pack_ips), dans l'ordre de `ips`
+    packed = pack_ips(ips) if packed is None else packed
+    ranges = load_ranges(reader, kind)
+    index, found = lookup_geo_ranges(ranges, packed)
+    stats = {'hits': int(found.sum()), 'misses': 0, 'errors': 0}
+    errors = np.empty(0, dtype=np.int64)
+
+    # Parcours trié: les adresses d'un réseau déjà résolu n'interrogent pas la base
+    missing = np.flatnonzero(~found)
+    missing = missing[np.argsort(packed[missing], kind='stable')]
+    if len(missing):
+        missing_ips = ips[missing]
+        if pool is not None and len(missing) >= PARALLEL_MIN_LOOKUPS:
+            new_ranges, failed, skipped = parallel_resolve(pool, missing_ips, packed[missing], workers, kind)
+        else:
+            new_ranges, failed, skipped = resolve_networks(reader, list(missing_ips), packed[missing],
+                                                           NETWORK_DESCRIBERS[kind])
+        errors = missing[np.asarray(failed, dtype=np.int64)]
+        stats['hits'] += skipped
+        stats['errors'] = len(errors)
+        stats['misses'] = len(missing) - skipped - len(errors)
+
+        if new_ranges:
+            starts = list(new_ranges)
+            merged = {
+                'start': np.concatenate([ranges['start'], np.array(starts, dtype='S16')]),
+                'end': np.concatenate([ranges['end'], np.array([new_ranges[k][0] for k in starts], dtype='S16')]),
+            }
+            for i, (name, dtype) in enumerate(RANGE_FIELDS[kind], start=1):
+                merged[name] = np.concatenate([ranges[name], np.array([new_ranges[k][i] for k in starts], dtype=dtype)])
+            order = np.argsort(merged['start'], kind='stable')
+            ranges = {key: value[order] for key, value in merged.items()}
+            save_ranges(reader, ranges, kind)
+            index, found = lookup_geo_ranges(ranges, packed)
+    return ranges, index, found, stats, errors
+
+def locate_ips(ips, pool=None, workers=1, notify=None, packed=None):
+    # Géolocalisation groupée des IPs distinctes: (localisations, lat, lon,
+    # statistiques). `packed`: formes empaquetées de `ips`, si déjà calculées
+    ips = np.asarray(ips, dtype=object)
+    locations = np.full(len(ips), UNKNOWN_LOCATION, dtype=object)
+    lats = np.full(len(ips), np.nan)
+    lons = np.full(len(ips), np.nan)
+    stats = {'hits': 0, 'misses': 0, 'errors': 0}
+
+    routable = ~np.isin(ips, NON_ROUTABLE_IPS)
+    if not routable.any():
+        return locations, lats, lons, stats
+
+    reader = init_geo_reader(notify)
+    if reader is None:
+        locations[routable] = "Base GeoLite absente"
+        return locations, lats, lons, stats
+
+    rows = np.flatnonzero(routable)
+    ranges, index, found, stats, errors = resolve_ranges(reader, ips[rows], 'geoip', pool, workers,
+                                                          None if packed is None else packed[rows])
+    locations[rows[errors]] = GEO_ERROR
+    located = rows[found]
+    locations[located] = ranges['location'][index[found]]
+    lats[located] = ranges['lat'][index[found]]
+    lons[located] = ranges['lon'][index[found]]
+    return locations, lats, lons, stats
+
+def locate_networks(ips, pool=None, workers=1, notify=None, packed=None):
+    # Système autonome (base GeoLite2-ASN) des IPs distinctes: (libellés,
+    # statistiques), ou (None, None) sans base ASN. `packed`: voir locate_ips
+    reader = open_reader(ASN_PATH, notify)
+    if reader is None:
+        return None, None
+    ips = np.asarray(ips, dtype=object)
+    networks = np.full(len(ips), UNKNOWN_ASN, dtype=object)
+    stats = {'hits': 0, 'misses': 0, 'errors': 0}
+    rows = np.flatnonzero(~np.isin(ips, NON_ROUTABLE_IPS))
+    if len(rows):
+        ranges, index, found, stats, _ = resolve_ranges(reader, ips[rows], 'asn', pool, workers,
+                                                     None if packed is None else packed[rows])
+        networks[rows[found]] = ranges['asn'][index[found]]
+    return networks, stats
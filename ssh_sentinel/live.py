@@ -0,0 +1,142 @@
+"""Surveillance en direct d'un journal local: lignes ajoutées, fenêtre glissante.
+
+Seules les lignes écrites depuis le dernier passage sont lues; les agrégats
+vivent dans un anneau de compartiments horaires de taille fixe.
+"""
+import os
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from .enrich import categorize_events, normalize_ips
+from .parsing import LOG_COLUMNS, USER_PATTERN, detect_encoding, infer_years, normalize_row, parse_timestamps, syslog_row
+
+LIVE_WINDOW_HOURS = 24             # Profondeur de la fenêtre glissante
+LIVE_MAX_KEYS = 5000               # Clés conservées par compteur et par heure
+LIVE_READ_BYTES = 4 * 1024 * 1024  # Lecture maximale par rafraîchissement
+
+def parse_live_lines(lines, now=None):
+    # Lignes CSV (8 champs séparés par ';') ou syslog, enrichies comme au chargement
+    rows = []
+    for line in lines:
+        if line.count(';') >= 7:
+            rows.append(normalize_row(line.split(';')))
+            continue
+        row = syslog_row(line)
+        if row is not None:
+            rows.append(row)
+
+    # Horodatage BSD sans année: les lignes lues sont récentes, la dernière
+    # date de l'année en cours (ou de la précédente, passage au 1er janvier)
+    df = pd.DataFrame(rows, columns=LOG_COLUMNS)
+    timestamps, yearless = parse_timestamps(df['Timestamp'])
+    df['Timestamp'] = infer_years(timestamps, yearless, now)
+
+    missing_user = df['User'] == ''
+    if missing_user.any():
+        df.loc[missing_user, 'User'] = df.loc[missing_user, 'Message'].str.extract(USER_PATTERN, expand=False).fillna('')
+
+    df['IP'] = normalize_ips(df['IP'], df['Message'])
+    df['EventCategory'] = categorize_events(df['Message'])
+    return df.dropna(subset=['Timestamp'])
+
+class LogTailer:
+    # Lecture des seules lignes ajoutées à un fichier; une rotation ou une
+    # troncature fait repartir du début du nouveau fichier
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.from_start = from_start
+        self.inode = None
+        self.offset = 0
+        self.encoding = None
+
+    def poll(self, max_bytes=LIVE_READ_BYTES):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return []
+
+        if self.inode != stat.st_ino or stat.st_size < self.offset:
+            first_poll = self.inode is None
+            self.inode = stat.st_ino
+            self.offset = stat.st_size if first_poll and not self.from_start else 0
+        if stat.st_size <= self.offset:
+            return []
+
+        with open(self.path, 'rb') as f:
+            if self.encoding is None:
+                self.encoding = detect_encoding(f)
+            f.seek(self.offset)
+            data = f.read(max_bytes)
+
+        # Ligne en cours d'écriture: elle sera lue au prochain passage
+        end = data.rfind(b'\n')
+        if end < 0:
+            if len(data) == max_bytes:
+                self.offset += len(data)
+            return []
+        self.offset += end + 1
+        return data[:end + 1].decode(self.encoding, errors='replace').splitlines()
+
+class LiveWindow:
+    # Agrégats glissants dans un anneau de compartiments horaires: la mémoire
+    # dépend de la fenêtre et du nombre de clés retenues, pas du volume lu
+    def __init__(self, hours=LIVE_WINDOW_HOURS, max_keys=LIVE_MAX_KEYS):
+        self.hours = hours
+        self.max_keys = max_keys
+        self.slots = [None] * hours
+        self.latest_hour = None
+
+    def _slot(self, hour):
+        index = hour % self.hours
+        slot = self.slots[index]
+        if slot is None or slot['hour'] != hour:
+            slot = {'hour': hour, 'events': 0, 'failures': 0, 'ips': Counter(), 'users': Counter()}
+            self.slots[index] = slot
+        return slot
+
+    def _prune(self, counter):
+        # Comptage approché des plus gros émetteurs au-delà de max_keys
+        if len(counter) > self.max_keys:
+            kept = counter.most_common(self.max_keys // 2)
+            counter.clear()
+            counter.update(dict(kept))
+
+    def add(self, df):
+        if df.empty:
+            return
+        hours = df['Timestamp'].to_numpy().astype('datetime64[h]').astype(np.int64)
+        self.latest_hour = max(int(hours.max()), self.latest_hour or 0)
+        recent = hours > self.latest_hour - self.hours
+
+        failed = (df['EventCategory'] == "Tentative Échouée").to_numpy()
+        for hour in np.unique(hours[recent]):
+            in_hour = hours == hour
+            slot = self._slot(int(hour))
+            slot['events'] += int(in_hour.sum())
+            slot['failures'] += int((in_hour & failed).sum())
+            slot['ips'].update(df.loc[in_hour, 'IP'].astype(str).value_counts().to_dict())
+            slot['users'].update(df.loc[in_hour & failed, 'User'].astype(str).value_counts().to_dict())
+            self._prune(slot['ips'])
+            self._prune(slot['users'])
+
+    def active_slots(self):
+        if self.latest_hour is None:
+            return []
+        return [slot for slot in self.slots
+                if slot is not None and slot['hour'] > self.latest_hour - self.hours]
+
+    def hourly(self):
+        slots = sorted(self.active_slots(), key=lambda slot: slot['hour'])
+        return pd.DataFrame({
+            'Heure': pd.to_datetime([slot['hour'] for slot in slots], unit='h'),
+            'Événements': [slot['events'] for slot in slots],
+            'Échecs': [slot['failures'] for slot in slots],
+        })
+
+    def top(self, key, n=10):
+        total = Counter()
+        for slot in self.active_slots():
+            total.update(slot[key])
+        return total.most_common(n)
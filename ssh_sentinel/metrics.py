@@ -0,0 +1,129 @@
+"""Instrumentation du chargement: durée, débit et pic mémoire par étape, compteurs.
+
+Désactivée par défaut (NULL_METRICS): chaque étape ne coûte alors qu'un appel
+de méthode, sans horloge ni tracemalloc.
+"""
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+PROMETHEUS_PREFIX = "ssh_sentinel"
+
+# Ratios exportés: (nom, compteur des succès, compteur des échecs)
+RATIOS = [
+    ('cache_hit_ratio', 'cache_hits', 'cache_misses'),
+    ('geo_cache_hit_ratio', 'geo_hits', 'geo_misses'),
+]
+
+class Metrics:
+    # Étapes cumulées par nom (un bloc de lignes après l'autre) et compteurs.
+    # Avec trace_memory, pic d'allocation de chaque étape via tracemalloc
+    # (mémoire allouée par Python et numpy, pas les fichiers projetés)
+    enabled = True
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.counters = {}
+        self._stack = []
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        record = self.stages.setdefault(name, {'seconds': 0.0, 'rows': 0, 'calls': 0, 'peak_bytes': None})
+        tracing = self.trace_memory
+        if tracing:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # Le pic de l'étape englobante est relevé avant la remise à zéro
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self._stack.append([current, current])
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] += time.perf_counter() - start
+            record['calls'] += 1
+            if rows is not None:
+                record['rows'] += rows
+            if tracing:
+                base, peak = self._stack.pop()
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                record['peak_bytes'] = max(record['peak_bytes'] or 0, peak - base)
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+                elif self._started_tracing:
+                    tracemalloc.stop()
+                    self._started_tracing = False
+
+    def add_rows(self, name, rows):
+        # Lignes connues seulement après l'étape (lecture d'un bloc)
+        self.stages[name]['rows'] += rows
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self):
+        stages = {}
+        for name, record in self.stages.items():
+            stages[name] = dict(record, rows_per_second=(
+                record['rows'] / record['seconds'] if record['rows'] and record['seconds'] else None))
+        ratios = {}
+        for name, hits, misses in RATIOS:
+            total = self.counters.get(hits, 0) + self.counters.get(misses, 0)
+            if total:
+                ratios[name] = self.counters.get(hits, 0) / total
+        return {'stages': stages, 'counters': dict(self.counters), 'ratios': ratios}
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        # Format texte d'exposition Prometheus (fichier pour node_exporter, pushgateway...)
+        data = self.to_dict()
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            samples = [(labels, value) for labels, value in samples if value is not None]
+            if not samples:
+                return
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{prefix}_{name}{{{label_text}}} {value:g}" if label_text else f"{prefix}_{name} {value:g}")
+
+        stages = data['stages'].items()
+        family('stage_seconds', 'gauge', "Durée cumulée de l'étape (s)",
+               [({'stage': name}, record['seconds']) for name, record in stages])
+        family('stage_rows', 'gauge', "Lignes traitées par l'étape",
+               [({'stage': name}, record['rows'] or None) for name, record in stages])
+        family('stage_rows_per_second', 'gauge', "Débit de l'étape (lignes/s)",
+               [({'stage': name}, record['rows_per_second']) for name, record in stages])
+        family('stage_peak_bytes', 'gauge', "Pic d'allocation de l'étape (octets)",
+               [({'stage': name}, record['peak_bytes']) for name, record in stages])
+        for name, value in sorted(data['counters'].items()):
+            family(f"{name}_total", 'counter', f"Compteur {name}", [({}, value)])
+        for name, value in sorted(data['ratios'].items()):
+            family(name, 'gauge', f"Ratio {name}", [({}, value)])
+        return "\n".join(lines) + "\n"
+
+class NullMetrics:
+    # Instrumentation désactivée: mêmes méthodes, aucun relevé
+    enabled = False
+
+    def stage(self, name, rows=None):
+        return nullcontext()
+
+    def add_rows(self, name, rows):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+NULL_METRICS = NullMetrics()
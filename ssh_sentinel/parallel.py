@@ -0,0 +1,102 @@
+"""Lecture et enrichissement parallèles: blocs de lignes répartis sur des processus."""
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .enrich import NETWORK_DESCRIBERS, enrich_frame, resolve_networks
+from .parsing import concat_chunks, finish_timestamps, iter_log_chunks
+from .templates import split_messages
+
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024   # En dessous, la lecture série est plus rapide
+PARALLEL_CHUNK_BYTES = 8 * 1024 * 1024  # Taille minimale d'un bloc confié à un processus
+PARALLEL_MIN_LOOKUPS = 20_000           # Adresses à résoudre avant de répartir la géolocalisation
+
+# Lecteurs GeoLite2 propres à chaque processus (par base), ouverts une seule fois
+_readers = {}
+
+def default_workers():
+    return int(os.environ.get("SSH_SENTINEL_WORKERS", os.cpu_count() or 1))
+
+def supports_parallel(encoding):
+    # Découpage sur l'octet '\n': impossible en UTF-16/UTF-32
+    return '\n'.encode(encoding) == b'\n'
+
+def _init_worker(databases):
+    # Bases projetées en mémoire: les pages sont partagées entre processus
+    from maxminddb import MODE_MMAP, open_database
+    for kind, path in (databases or {}).items():
+        if os.path.exists(path):
+            _readers[kind] = open_database(path, MODE_MMAP)
+
+def create_pool(workers, databases=None):
+    # `databases`: chemin de chaque base ouverte par les processus
+    # ({'geoip': ..., 'asn': ...}). "spawn": pas de fork d'un serveur Streamlit multi-thread
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+        initargs=(databases,),
+    )
+
+def line_ranges(stream, start, end, parts):
+    # Bornes [début, fin) de blocs qui commencent tous en début de ligne
+    size = max(PARALLEL_CHUNK_BYTES, -(-(end - start) // parts))
+    bounds = [start]
+    position = stream.tell()
+    while bounds[-1] + size < end:
+        stream.seek(bounds[-1] + size)
+        stream.readline()
+        if stream.tell() >= end:
+            break
+        bounds.append(stream.tell())
+    stream.seek(position)
+    return list(zip(bounds, bounds[1:] + [end]))
+
+def _parse_range(source, start, end, encoding):
+    # Chemin d'un fichier local (lu par le processus) ou octets du bloc
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+    else:
+        data = source
+    # Messages masqués bloc par bloc, comme en lecture série
+    chunks = iter_log_chunks(io.BytesIO(data), encoding)
+    return concat_chunks([split_messages(enrich_frame(chunk)) for chunk in chunks])
+
+def parallel_read(pool, stream, encoding, workers, path=None, reference=None):
+    # Lecture à partir de la position courante jusqu'à la fin du flux; les
+    # blocs sont réassemblés dans l'ordre du fichier avant les étapes qui
+    # dépendent du fichier entier (années syslog)
+    start = stream.tell()
+    end = stream.seek(0, os.SEEK_END)
+    stream.seek(start)
+    futures = []
+    for chunk_start, chunk_end in line_ranges(stream, start, end, workers * 4):
+        if path is not None:
+            source = path
+        else:
+            stream.seek(chunk_start)
+            source = stream.read(chunk_end - chunk_start)
+        futures.append(pool.submit(_parse_range, source, chunk_start, chunk_end, encoding))
+    stream.seek(end)
+    return finish_timestamps(concat_chunks([future.result() for future in futures]), reference)
+
+def _resolve_part(ips, packed, kind):
+    return resolve_networks(_readers[kind], ips, packed, NETWORK_DESCRIBERS[kind])
+
+def parallel_resolve(pool, ips, packed, workers, kind='geoip'):
+    # Adresses triées, réparties en tranches contiguës: le saut des adresses
+    # d'un réseau déjà résolu reste efficace dans chaque tranche
+    parts = [part for part in np.array_split(np.arange(len(ips)), workers * 4) if len(part)]
+    futures = [pool.submit(_resolve_part, list(ips[part]), packed[part], kind) for part in parts]
+    new_ranges, errors, skipped = {}, [], 0
+    for part, future in zip(parts, futures):
+        part_ranges, part_errors, part_skipped = future.result()
+        new_ranges.update(part_ranges)
+        errors.extend(part[part_errors])
+        skipped += part_skipped
+    return new_ranges, errors, skipped
@@ -0,0 +1,296 @@
+"""Lecture en flux des journaux SSH: CSV (séparateur ';') ou syslog (/var/log/auth.log)."""
+import codecs
+import csv
+import io
+import itertools
+import os
+import re
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .metrics import NULL_METRICS
+
+LOG_COLUMNS = ['Timestamp', 'Lab', 'Service', 'PID', 'IP', 'User', 'EventCode', 'Message']
+ENCODING_SAMPLE_SIZE = 64 * 1024  # Octets analysés par chardet
+CHUNK_ROWS = 100_000              # Lignes par bloc de lecture
+
+# Formats d'horodatage reconnus d'un seul tenant; deux formats ne peuvent pas
+# reconnaître la même chaîne, le résultat ne dépend donc pas de leur ordre
+SYSLOG_FORMAT = '%b %d %H:%M:%S'
+TIMESTAMP_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d %H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y/%m/%d %H:%M:%S',
+    SYSLOG_FORMAT,
+]
+TIMESTAMP_SAMPLE_SIZE = 1000       # Valeurs distinctes servant à ordonner les formats
+TIMESTAMP_DTYPE = 'datetime64[us]'
+TZ_SUFFIX = r'(?<=\d)(?:Z|[+-]\d{2}:?\d{2})$'  # Décalage ISO 8601, ignoré
+YEARLESS_PREFIX = "2000 "          # Année bissextile provisoire (29 février valide)
+YEARLESS_COLUMN = '_yearless'      # Colonne interne, retirée par finish_timestamps
+FORMAT_SAMPLE_LINES = 20           # Premières lignes examinées pour reconnaître le format
+
+# Format syslog de /var/log/auth.log (horodatage BSD ou RFC 3339)
+SYSLOG_PATTERN = re.compile(
+    r'^(?P<Timestamp>[A-Z][a-z]{2}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}|\d{4}-\d{2}-\d{2}T\S+)\s+'
+    r'(?P<Lab>\S+)\s+(?P<Service>[^\s\[:]+)(?:\[(?P<PID>\d+)\])?:\s*(?P<Message>.*)$'
+)
+USER_PATTERN = r'(?i)(?:for invalid user|invalid user|authenticating user|for user|for)\s+([^\s(]+)'
+USER_REGEX = re.compile(USER_PATTERN)
+
+def detect_encoding(stream):
+    # Détection sur un préfixe uniquement, sans lire tout le fichier
+    position = stream.tell()
+    sample = stream.read(ENCODING_SAMPLE_SIZE)
+    stream.seek(position)
+
+    import chardet
+    encoding = chardet.detect(sample)['encoding'] or 'utf-8'
+    try:
+        encoding = codecs.lookup(encoding).name
+    except LookupError:
+        encoding = 'utf-8'
+    # Un préfixe ASCII n'exclut pas des caractères accentués plus loin
+    if encoding == 'ascii':
+        encoding = 'utf-8'
+    return encoding
+
+def normalize_row(row):
+    # Ajouter des colonnes manquantes si nécessaire
+    if len(row) < 8:
+        row += [''] * (8 - len(row))
+    # Fusionner les colonnes supplémentaires dans le message
+    elif len(row) > 8:
+        row[7] = ';'.join(row[7:])
+        row = row[:8]
+    return row
+
+def syslog_row(line):
+    # Champs d'une ligne syslog dans l'ordre de LOG_COLUMNS (None si la ligne
+    # ne suit pas le format); l'utilisateur est tiré du message, l'IP l'est
+    # par normalize_ips
+    match = SYSLOG_PATTERN.match(line.rstrip('\r\n'))
+    if match is None:
+        return None
+    user = USER_REGEX.search(match['Message'])
+    return [match['Timestamp'], match['Lab'], match['Service'], match['PID'] or '',
+            '', user[1] if user else '', '', match['Message']]
+
+def is_syslog(lines):
+    # Format d'un journal d'après ses premières lignes: syslog si elles sont
+    # plus nombreuses à suivre le motif syslog qu'à porter 8 champs CSV
+    csv_lines = sum(line.count(';') >= 7 for line in lines)
+    syslog_lines = sum(line.count(';') < 7 and SYSLOG_PATTERN.match(line) is not None for line in lines)
+    return syslog_lines > csv_lines
+
+def syslog_rows(lines):
+    # Lignes vides ignorées; une ligne non reconnue est conservée avec son
+    # seul message (horodatage invalide), comme une ligne CSV incomplète
+    for line in lines:
+        if line.strip():
+            yield syslog_row(line) or [''] * (len(LOG_COLUMNS) - 1) + [line.rstrip('\r\n')]
+
+def order_formats(sample):
+    # Formats classés selon le nombre de valeurs de l'échantillon qu'ils
+    # reconnaissent; l'ordre ne change que la vitesse, pas le résultat
+    def hits(fmt):
+        if fmt == SYSLOG_FORMAT:
+            return pd.to_datetime(YEARLESS_PREFIX + sample, format=f"%Y {fmt}", errors='coerce').notna().sum()
+        return pd.to_datetime(sample, format=fmt, errors='coerce').notna().sum()
+    return sorted(TIMESTAMP_FORMATS, key=hits, reverse=True)
+
+def parse_timestamp_value(value):
+    # Repli ligne à ligne (dateutil) pour les formats non reconnus;
+    # un décalage horaire est ignoré: heure locale telle qu'écrite
+    try:
+        timestamp = pd.Timestamp(value)
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+    if timestamp is pd.NaT:
+        return pd.NaT
+    return timestamp.tz_localize(None) if timestamp.tzinfo is not None else timestamp
+
+def apply_formats(text, rows, formats, parsed, yearless):
+    # Essai des formats fixes sur les lignes `rows` de `text`; renvoie
+    # les lignes qu'aucun format n'a reconnues
+    for fmt in formats:
+        if not len(rows):
+            break
+        if fmt == SYSLOG_FORMAT:
+            result = pd.to_datetime(YEARLESS_PREFIX + text.iloc[rows], format=f"%Y {fmt}", errors='coerce')
+        else:
+            result = pd.to_datetime(text.iloc[rows], format=fmt, errors='coerce')
+        found = result.notna().to_numpy()
+        parsed[rows[found]] = result[found].to_numpy().astype(TIMESTAMP_DTYPE)
+        yearless[rows[found]] = fmt == SYSLOG_FORMAT
+        rows = rows[~found]
+    return rows
+
+def parse_timestamps(values):
+    # Analyse de chaque valeur distincte avec des formats fixes (le format
+    # dominant d'abord), nouvel essai sans espaces ni décalage horaire pour
+    # les valeurs restantes, puis repli ligne à ligne. Renvoie les dates et
+    # le masque des horodatages syslog sans année, datés provisoirement de
+    # l'an 2000 (voir infer_years)
+    codes, uniques = pd.factorize(pd.Series(values))
+    text = pd.Series(uniques)
+
+    parsed = np.full(len(text), np.datetime64('NaT'), dtype=TIMESTAMP_DTYPE)
+    yearless = np.zeros(len(text), dtype=bool)
+    formats = order_formats(text[:TIMESTAMP_SAMPLE_SIZE])
+    pending = apply_formats(text, np.arange(len(text)), formats, parsed, yearless)
+
+    if len(pending):
+        text = text.astype(object).astype(str)
+        text.iloc[pending] = text.iloc[pending].str.strip().str.replace(TZ_SUFFIX, '', regex=True)
+        pending = apply_formats(text, pending, formats, parsed, yearless)
+
+    for row in pending:
+        timestamp = parse_timestamp_value(text.iat[row])
+        if timestamp is not pd.NaT:
+            parsed[row] = np.datetime64(timestamp.to_datetime64(), 'us')
+
+    # Les valeurs manquantes (code -1) tombent sur la dernière case, NaT
+    parsed = np.append(parsed, np.datetime64('NaT'))
+    yearless = np.append(yearless, False)
+    return parsed[codes], yearless[codes]
+
+def infer_years(timestamps, yearless, reference=None):
+    # Année des horodatages syslog, en supposant le journal chronologique:
+    # un recul de plus de six mois marque un passage à l'année suivante, et
+    # la dernière ligne date de l'année de `reference` (ou de la précédente
+    # si elle tomberait dans le futur). Un 29 février impossible devient NaT
+    timestamps = np.array(timestamps, dtype=TIMESTAMP_DTYPE)
+    rows = np.flatnonzero(yearless & ~np.isnat(timestamps))
+    if not len(rows):
+        return timestamps
+
+    reference = pd.Timestamp.now() if reference is None else pd.Timestamp(reference)
+    values = pd.DatetimeIndex(timestamps[rows])
+    backwards = np.diff(timestamps[rows]) < -np.timedelta64(183, 'D')
+    years_from_last = np.concatenate([[0], np.cumsum(backwards)])
+    years_from_last = years_from_last[-1] - years_from_last
+
+    last_year = reference.year
+    if values[-1] > reference.replace(year=2000) + pd.Timedelta(days=1):
+        last_year -= 1
+    dated = pd.to_datetime(pd.DataFrame({
+        'year': last_year - years_from_last,
+        'month': values.month, 'day': values.day,
+        'hour': values.hour, 'minute': values.minute,
+        'second': values.second, 'microsecond': values.microsecond,
+    }), errors='coerce')
+    timestamps[rows] = dated.to_numpy().astype(TIMESTAMP_DTYPE)
+    return timestamps
+
+def finish_timestamps(df, reference=None):
+    # Étape globale, après réassemblage des blocs: années syslog et
+    # signalement des horodatages invalides (conservés, sans date)
+    yearless = df.pop(YEARLESS_COLUMN).to_numpy(dtype=bool)
+    df['Timestamp'] = infer_years(df['Timestamp'].to_numpy(), yearless, reference)
+    df.insert(df.columns.get_loc('Timestamp') + 1, 'InvalidTimestamp', df['Timestamp'].isna().to_numpy())
+    return df
+
+def compact_chunk(rows, metrics=NULL_METRICS):
+    # Colonnes typées: horodatage en datetime64, textes en catégories
+    chunk = pd.DataFrame(rows, columns=LOG_COLUMNS)
+    with metrics.stage('timestamps', len(chunk)):
+        timestamps, yearless = parse_timestamps(chunk['Timestamp'])
+    chunk['Timestamp'] = timestamps
+    with metrics.stage('encode_columns', len(chunk)):
+        for col in LOG_COLUMNS[1:]:
+            chunk[col] = chunk[col].astype('category')
+    chunk[YEARLESS_COLUMN] = yearless
+    return chunk
+
+def iter_row_blocks(reader, chunk_rows):
+    rows = []
+    for row in reader:
+        rows.append(normalize_row(row))
+        if len(rows) >= chunk_rows:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+def iter_log_chunks(stream, encoding, chunk_rows=CHUNK_ROWS, metrics=NULL_METRICS):
+    # Décodage incrémental: seul le bloc courant est présent en mémoire.
+    # Format (CSV ou syslog) reconnu sur les premières lignes du flux
+    text = io.TextIOWrapper(stream, encoding=encoding, errors='replace', newline='')
+    try:
+        head = list(itertools.islice(text, FORMAT_SAMPLE_LINES))
+        lines = itertools.chain(head, text)
+        if is_syslog(head):
+            reader = syslog_rows(lines)
+        else:
+            reader = csv.reader(lines, delimiter=';', quoting=csv.QUOTE_NONE)
+        blocks = iter_row_blocks(reader, chunk_rows)
+        while True:
+            # Décodage et découpage CSV d'un bloc
+            with metrics.stage('csv'):
+                rows = next(blocks, None)
+            if rows is None:
+                break
+            metrics.add_rows('csv', len(rows))
+            yield compact_chunk(rows, metrics)
+    finally:
+        # Ne pas fermer le flux de l'appelant
+        text.detach()
+
+def concat_chunks(chunks):
+    if not chunks:
+        return compact_chunk([])
+    if len(chunks) == 1:
+        return chunks[0]
+
+    # Dictionnaires triés: le résultat ne dépend pas du découpage en blocs
+    # (lecture en un seul bloc, par blocs de lignes ou en parallèle)
+    columns = {}
+    for col in chunks[0].columns:
+        parts = [chunk[col] for chunk in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            categories = parts[0].cat.categories
+            if all(part.cat.categories.equals(categories) for part in parts[1:]):
+                codes = np.concatenate([part.cat.codes.to_numpy() for part in parts])
+                columns[col] = pd.Series(pd.Categorical.from_codes(codes, categories=categories))
+            else:
+                columns[col] = pd.Series(union_categoricals(parts, sort_categories=True))
+        else:
+            columns[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+def read_log_stream(stream, chunk_rows=CHUNK_ROWS, encoding=None, reference=None, metrics=NULL_METRICS,
+                    transform=None):
+    # Sans encodage imposé: lecture depuis le début avec détection;
+    # sinon lecture depuis la position courante (suite d'un fichier).
+    # `reference`: date d'écriture du fichier, pour l'année des dates syslog.
+    # `transform`: appliquée à chaque bloc avant réassemblage
+    if encoding is None:
+        stream.seek(0)
+        with metrics.stage('detect_encoding'):
+            encoding = detect_encoding(stream)
+    chunks = [chunk if transform is None else transform(chunk)
+              for chunk in iter_log_chunks(stream, encoding, chunk_rows, metrics)]
+    if not chunks and transform is not None:
+        # Flux vide: un bloc sans ligne, aux mêmes colonnes
+        chunks.append(transform(compact_chunk([])))
+    with metrics.stage('concat_chunks', sum(len(chunk) for chunk in chunks)):
+        df = concat_chunks(chunks)
+    with metrics.stage('infer_years', len(df)):
+        return finish_timestamps(df, reference)
+
+def ends_with_newline(stream):
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    if stream.tell() == 0:
+        stream.seek(position)
+        return True
+    stream.seek(-1, os.SEEK_END)
+    last = stream.read(1)
+    stream.seek(position)
+    return last == b'\n'
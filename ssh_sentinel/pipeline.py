@@ -0,0 +1,360 @@
+"""Chargement complet d'un journal: lecture, enrichissement, géolocalisation, cache.
+
+Sans dépendance à l'interface: l'application Streamlit et la ligne de commande
+passent leur propre fonction `notify(niveau, message)` pour suivre l'analyse.
+Plusieurs journaux (un par bastion) sont analysés séparément puis fusionnés
+en une seule entrée datée, avec la colonne Source.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from .enrich import enrich_frame, pack_ips
+from .geo import (
+    ASN_COLUMN, ASN_PATH, GEOIP_DATABASES, GEOIP_PATH, database_paths, database_version, locate_ips,
+    locate_networks
+)
+from .metrics import NULL_METRICS
+from .parallel import PARALLEL_MIN_BYTES, create_pool, parallel_read, supports_parallel
+from .parsing import detect_encoding, ends_with_newline, read_log_stream
+from .store import (
+    CACHE_FORMAT, CACHE_MAX_MB, INDEXED_COLUMNS, SOURCE_COLUMN, ColumnStore, add_time_columns,
+    append_candidates, cached_entry, cube_counts, find_append_base, hash_upload, save_merged,
+    save_to_cache
+)
+from .templates import TEMPLATE_COLUMN, extract_templates, split_messages
+
+SUMMARY_DIMENSIONS = ['EventCategory', 'IP', 'User', 'Location']
+SKIPPED_EXTENSIONS = ('.gz', '.bz2', '.xz', '.zip')  # Archives ignorées dans les dossiers
+
+def quiet(level, message):
+    pass
+
+def local_path(file):
+    # Chemin d'un fichier local ouvert par l'application (pas d'un envoi)
+    name = getattr(file, 'name', None)
+    if not getattr(file, 'file_id', None) and isinstance(name, str) and os.path.exists(name):
+        return name
+    return None
+
+def source_id(file):
+    # Identité stable d'une source entre deux réexécutions
+    if getattr(file, 'file_id', None):
+        return file.file_id
+    path = local_path(file)
+    if path is not None:
+        stat = os.stat(path)
+        return (path, stat.st_size, stat.st_mtime_ns)
+    return None
+
+def leased_paths(registry):
+    # Entrées affichées par une session (registre partagé), relevées juste
+    # avant l'écriture d'une entrée
+    return registry.leased() if registry is not None else ()
+
+def cache_params(enable_geo, sample_size):
+    # Paramètres qui changent le contenu d'une entrée du cache, dont la
+    # version des bases GeoLite2: une base téléchargée ou mise à jour en
+    # arrière-plan donne de nouvelles entrées
+    return {
+        'enable_geo': enable_geo,
+        'sample_size': sample_size,
+        'geoip': database_version(GEOIP_PATH) if enable_geo else None,
+        'asn': database_version(ASN_PATH) if enable_geo else None,
+    }
+
+def analyze_file(file, enable_geo=True, sample_size=None, cache_max_mb=CACHE_MAX_MB, workers=1,
+                 notify=quiet, lookup=cached_entry, open_store=ColumnStore, metrics=NULL_METRICS, registry=None,
+                 keep=()):
+    # Entrée du cache pour le contenu de `file` (flux binaire), analysée si
+    # besoin; renvoie (entrée, clé) ou (None, clé) si la lecture échoue.
+    # Avec workers > 1, les gros fichiers sont lus, enrichis et géolocalisés
+    # par un groupe de processus; le résultat est identique à la lecture série.
+    # `metrics` relève la durée de chaque étape (voir ssh_sentinel.metrics).
+    # Avec `registry` (ssh_sentinel.registry), un même contenu demandé par
+    # plusieurs sessions à la fois n'est analysé qu'une fois. Les entrées de
+    # `keep` (chemins, celles déjà prêtes d'une même fusion) échappent à
+    # l'éviction qui suit l'écriture
+    params = cache_params(enable_geo, sample_size)
+
+    # Mode incrémental: la même passe de hachage vérifie si un fichier
+    # déjà analysé est un préfixe de celui-ci (pas avec l'échantillonnage)
+    candidates = append_candidates(params) if not sample_size else {}
+    with metrics.stage('hash'):
+        cache_key, source, prefixes = hash_upload(file, params, candidates)
+
+    with metrics.stage('cache_lookup'):
+        cached_data = lookup(cache_key)
+    metrics.count('cache_hits' if cached_data is not None else 'cache_misses')
+    if cached_data is not None:
+        return cached_data, cache_key
+
+    def build():
+        return build_entry(file, cache_key, source, prefixes, candidates, params, cache_max_mb, workers,
+                           notify, open_store, metrics, registry, keep)
+
+    if registry is None:
+        return build(), cache_key
+    return registry.load(cache_key, build, on_wait=lambda: notify(
+        'info', "⏳ Même contenu en cours d'analyse dans une autre session: attente de son résultat")), cache_key
+
+def build_entry(file, cache_key, source, prefixes, candidates, params, cache_max_mb=CACHE_MAX_MB, workers=1,
+                notify=quiet, open_store=ColumnStore, metrics=NULL_METRICS, registry=None, keep=()):
+    # Analyse d'un contenu absent du cache (voir analyze_file): entrée
+    # écrite puis ouverte, ou None si la lecture échoue. Les jeux tenus dans
+    # `registry` et les entrées de `keep` échappent à l'éviction qui suit
+    # l'écriture
+    sample_size = params['sample_size']
+    base = find_append_base(candidates, prefixes)
+    if base is not None and base[1]['size'] >= source['size']:
+        base = None
+
+    # Bases utilisées: celles dont la version figure dans la clé
+    databases = [kind for kind in GEOIP_DATABASES if params[kind] is not None]
+    geo = 'geoip' in databases
+    pool = None
+    try:
+        # Lecture CSV robuste, par blocs
+        try:
+            if base is not None:
+                base_path, base_source = base
+                notify('info', f"➕ Suite d'un fichier déjà analysé: lecture à partir de l'octet {base_source['size']}")
+                encoding = base_source['encoding']
+                file.seek(base_source['size'])
+            else:
+                file.seek(0)
+                with metrics.stage('detect_encoding'):
+                    encoding = detect_encoding(file)
+
+            # Année des dates syslog: celle de la dernière écriture du fichier
+            path = local_path(file)
+            reference = datetime.fromtimestamp(os.path.getmtime(path)) if path else None
+            if workers > 1 and supports_parallel(encoding) and \
+                    source['size'] - file.tell() >= PARALLEL_MIN_BYTES:
+                notify('info', f"⚡ Analyse parallèle sur {workers} processus")
+                with metrics.stage('parallel_read'):
+                    pool = create_pool(workers, database_paths(databases))
+                    df = parallel_read(pool, file, encoding, workers, path=path, reference=reference)
+                metrics.add_rows('parallel_read', len(df))
+            else:
+                df = read_log_stream(file, encoding=encoding, reference=reference, metrics=metrics,
+                                     transform=lambda chunk: split_messages(enrich_frame(chunk, metrics), metrics))
+        except Exception as e:
+            notify('error', f"Erreur de lecture CSV: {e}")
+            return None
+
+        source.update(
+            params=str(params),
+            encoding=encoding,
+            complete_lines=ends_with_newline(file)
+        )
+
+        notify('info', f"📥 {len(df)} lignes chargées après lecture")
+
+        # Timestamps invalides: lignes conservées, sans date, et signalées
+        invalid_ts = int(df['InvalidTimestamp'].sum())
+        if invalid_ts > 0:
+            notify('warning', f"⚠️ {invalid_ts} timestamps invalides - lignes conservées (colonne InvalidTimestamp)")
+
+        # Messages masqués à la lecture regroupés en modèles; les modèles
+        # d'une entrée prolongée sont proposés en premier à ses nouvelles lignes
+        base_store = open_store(base[0]) if base is not None else None
+        known = base_store.categories(TEMPLATE_COLUMN) if base_store is not None else ()
+        df = extract_templates(df, known, metrics)
+        notify('info', f"🧩 {len(df[TEMPLATE_COLUMN].cat.categories)} modèles de messages")
+
+        add_time_columns(df)
+
+        # Échantillonnage optionnel
+        if sample_size and len(df) > sample_size:
+            original_count = len(df)
+            df = df.sample(sample_size)
+            notify('warning', f"⚠️ Échantillonnage: {sample_size}/{original_count} lignes")
+        else:
+            notify('info', f"📊 {len(df)} lignes conservées")
+
+        # IPs distinctes empaquetées une seule fois pour les deux bases
+        if databases:
+            df['IP'] = df['IP'].cat.remove_unused_categories()
+            unique_ips = df['IP'].cat.categories
+            packed = pack_ips(unique_ips)
+
+        # Géolocalisation
+        if geo:
+            notify('info', "🌍 Début de la géolocalisation...")
+
+            # Une seule résolution groupée des IPs distinctes
+            with metrics.stage('geolocation', len(unique_ips)):
+                locations, lats, lons, geo_stats = locate_ips(unique_ips, pool, workers, notify, packed)
+            for name in ['hits', 'misses', 'errors']:
+                metrics.count(f"geo_{name}", geo_stats[name])
+
+            # Application des localisations via les codes de catégorie
+            codes = df['IP'].cat.codes.to_numpy()
+            df['Location'] = pd.Categorical(locations)[codes]
+            df['lat'] = lats[codes]
+            df['lon'] = lons[codes]
+
+            if geo_stats['errors']:
+                notify('warning', f"⚠️ Erreur de géolocalisation pour {geo_stats['errors']} IPs")
+            notify('success',
+                f"✅ Géolocalisation de {len(unique_ips)} IPs terminée "
+                f"({geo_stats['hits']} depuis le cache, {geo_stats['misses']} via GeoLite2)"
+            )
+        else:
+            df['Location'] = "Géolocalisation désactivée"
+            df['lat'] = np.nan
+            df['lon'] = np.nan
+
+        # Système autonome de chaque IP (base GeoLite2-ASN facultative)
+        if 'asn' in databases:
+            with metrics.stage('asn', len(unique_ips)):
+                networks, asn_stats = locate_networks(unique_ips, pool, workers, notify, packed)
+            if networks is not None:
+                df[ASN_COLUMN] = pd.Categorical(networks)[df['IP'].cat.codes.to_numpy()]
+                notify('info', f"🏢 {len(df[ASN_COLUMN].cat.categories)} systèmes autonomes")
+
+        # Sauvegarde dans le cache, puis lecture via le stockage en colonnes
+        with metrics.stage('cache_write', len(df)):
+            cache_path = save_to_cache(cache_key, df, cache_max_mb * 1024 * 1024, base_store, source,
+                                       keep={*keep, *leased_paths(registry)})
+        store = open_store(cache_path)
+        with metrics.stage('cube', len(store)):
+            store.cube()
+        with metrics.stage('postings', len(store)):
+            for name in INDEXED_COLUMNS:
+                store.postings(name)
+        if base_store is not None:
+            notify('success', f"✅ {len(df)} nouvelles lignes ajoutées aux {len(base_store)} déjà analysées")
+        notify('success', f"✅ Chargement final: {len(store)} lignes")
+        return store
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+def analyze_path(path, **options):
+    # analyze_file sur un fichier local (année syslog d'après sa date de modification)
+    with open(path, 'rb') as f:
+        return analyze_file(f, **options)
+
+def expand_paths(paths):
+    # Fichiers à analyser: ceux des dossiers donnés (sans sous-dossiers,
+    # fichiers cachés ni archives), par nom, et les fichiers tels quels
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                entry.path for entry in os.scandir(path)
+                if entry.is_file() and not entry.name.startswith('.') and not entry.name.endswith(SKIPPED_EXTENSIONS)
+            ))
+        else:
+            files.append(path)
+    return files
+
+def source_labels(names):
+    # Étiquette de chaque source: nom du fichier, chemin complet pour des
+    # homonymes de dossiers différents, puis numéro si besoin
+    bases = [os.path.basename(name) for name in names]
+    labels = [base if bases.count(base) == 1 else name for base, name in zip(bases, names)]
+    return [label if labels.count(label) == 1 else f"{label} ({i + 1})" for i, label in enumerate(labels)]
+
+def merge_key(stores, labels):
+    # Les clés des entrées identifient déjà leur contenu et leurs paramètres
+    entries = [[os.path.basename(store.path), label] for store, label in zip(stores, labels)]
+    return hashlib.sha256(json.dumps(['merge', CACHE_FORMAT, entries]).encode('utf-8')).hexdigest()
+
+def merge_stores(stores, labels, cache_max_mb=CACHE_MAX_MB, notify=quiet, lookup=cached_entry,
+                 open_store=ColumnStore, metrics=NULL_METRICS, registry=None):
+    # Entrée fusionnée de plusieurs entrées (une par fichier), en cache comme
+    # les autres: recalculée seulement si l'un des fichiers change. Les
+    # entrées fusionnées échappent à l'éviction qui suit l'écriture
+    cache_key = merge_key(stores, labels)
+    with metrics.stage('cache_lookup'):
+        cached_data = lookup(cache_key)
+    metrics.count('cache_hits' if cached_data is not None else 'cache_misses')
+    if cached_data is not None:
+        return cached_data, cache_key
+
+    def build():
+        with metrics.stage('merge', sum(len(store) for store in stores)):
+            cache_path = save_merged(cache_key, stores, labels, cache_max_mb * 1024 * 1024,
+                                     keep={*(store.path for store in stores), *leased_paths(registry)})
+        store = open_store(cache_path)
+        with metrics.stage('cube', len(store)):
+            store.cube()
+        with metrics.stage('postings', len(store)):
+            for name in INDEXED_COLUMNS + [SOURCE_COLUMN]:
+                store.postings(name)
+            store.packed_ips()
+        notify('success', f"✅ {len(stores)} fichiers fusionnés: {len(store)} lignes")
+        return store
+
+    if registry is None:
+        return build(), cache_key
+    return registry.load(cache_key, build, on_wait=lambda: notify(
+        'info', "⏳ Même fusion en cours dans une autre session: attente de son résultat")), cache_key
+
+def analyze_paths(paths, cache_max_mb=CACHE_MAX_MB, notify=quiet, metrics=NULL_METRICS, **options):
+    # analyze_path sur chaque fichier (dossiers développés), puis fusion s'il
+    # y en a plusieurs; renvoie (entrée, clé), ou (None, None) si l'un échoue.
+    # Les entrées déjà prêtes ne sont pas évincées par les suivantes avant la
+    # fusion, même au-delà du budget du cache
+    files = expand_paths(paths)
+    if not files:
+        notify('error', "Aucun fichier à analyser")
+        return None, None
+    stores = []
+    for path in files:
+        notify('info', f"Analyse de {path}")
+        store, cache_key = analyze_path(path, cache_max_mb=cache_max_mb, notify=notify, metrics=metrics,
+                                        keep=[store.path for store in stores], **options)
+        if store is None:
+            return None, None
+        stores.append(store)
+    if len(stores) == 1:
+        return store, cache_key
+    return merge_stores(stores, source_labels(files), cache_max_mb, notify, metrics=metrics)
+
+def combine_counts(parts, name):
+    # Comptes par valeur de plusieurs entrées réunis, par ordre décroissant
+    counts = pd.concat(parts)
+    counts[name] = counts[name].astype(object)
+    counts = counts.groupby(name, sort=False)['Count'].sum()
+    return counts.sort_values(ascending=False, kind='stable').reset_index()
+
+def summarize(stores):
+    # Agrégats de plusieurs entrées, calculés sur leurs cubes: comptes par
+    # dimension et par heure, alertes, et totaux
+    tables = {}
+    for name in SUMMARY_DIMENSIONS:
+        tables[name] = combine_counts([cube_counts(store, name, slice(None), sort=False) for store in stores], name)
+    if stores and all(ASN_COLUMN in store.specs for store in stores):
+        # Par système autonome (base ASN), sur la colonne: hors du cube
+        tables[ASN_COLUMN] = combine_counts([store.counts(ASN_COLUMN, sort=False) for store in stores], ASN_COLUMN)
+
+    hours = np.concatenate([np.asarray(store.cube()['Hour']) for store in stores])
+    weights = np.concatenate([np.asarray(store.cube()['Count']) for store in stores])
+    hourly = pd.Series(weights).groupby(hours).sum()
+    tables['Hour'] = pd.DataFrame({
+        'Hour': pd.to_datetime(hourly.index.to_numpy(dtype=np.int64), unit='h'),
+        'Count': hourly.to_numpy(),
+    })
+    tables['Alerts'] = pd.concat([store.alerts() for store in stores], ignore_index=True)
+
+    dated = [store.values('Timestamp')[store.valid_rows()] for store in stores]
+    dated = [timestamps for timestamps in dated if len(timestamps)]
+    failures = tables['EventCategory'].set_index('EventCategory')['Count'].get("Tentative Échouée", 0)
+    totals = {
+        'events': sum(len(store) for store in stores),
+        'invalid_timestamps': sum(len(store) - store.valid_rows().stop for store in stores),
+        'unique_ips': len(tables['IP']),
+        'failures': int(failures),
+        'alerts': len(tables['Alerts']),
+        'first': str(min(timestamps[0] for timestamps in dated)) if dated else None,
+        'last': str(max(timestamps[-1] for timestamps in dated)) if dated else None,
+    }
+    return totals, tables
@@ -0,0 +1,157 @@
+"""Registre des jeux de données du processus, partagé par toutes les sessions.
+
+Un descripteur par entrée du cache. Les demandes simultanées d'une même clé
+rejoignent le chargement en cours au lieu d'en lancer un autre. Les jeux
+affichés par une session y sont comptés (bail libéré avec la session); au-delà
+du budget mémoire, les jeux que plus aucune session n'affiche sont oubliés,
+du moins récemment utilisé au plus récent.
+"""
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .store import ColumnStore
+
+REGISTRY_MAX_MB = int(os.environ.get("SSH_SENTINEL_REGISTRY_MB", 2048))  # Budget mémoire des jeux ouverts
+
+def entry_size(path):
+    # Taille de l'entrée sur disque: approximation de sa mémoire une fois
+    # les colonnes projetées et le cube chargés
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(path))
+    except OSError:
+        return 0
+
+class LoadInterrupted(Exception):
+    # Chargement abandonné par la session qui le menait (arrêt du script)
+    pass
+
+class DatasetLease:
+    # Référence d'une session à un jeu; rendue à la libération du bail
+    # (remplacé par un autre jeu, ou session terminée)
+    def __init__(self, registry, path):
+        self.path = path
+        self._finalizer = weakref.finalize(self, registry.release, path)
+
+    def release(self):
+        self._finalizer()
+
+class DatasetRegistry:
+    def __init__(self, max_bytes=REGISTRY_MAX_MB * 1024 * 1024, open_store=ColumnStore):
+        self.max_bytes = max_bytes
+        self.open_store = open_store
+        self._lock = threading.Lock()
+        self._stores = OrderedDict()  # chemin -> [descripteur, références, taille], du plus ancien au plus récent
+        self._loading = {}            # clé -> Future du chargement en cours
+        self.joined = 0               # Chargements évités en rejoignant un chargement en cours
+
+    def open(self, path):
+        # Descripteur partagé de l'entrée `path` (ouvert au premier appel)
+        with self._lock:
+            record = self._stores.get(path)
+            if record is None:
+                record = self._stores[path] = [self.open_store(path), 0, entry_size(path)]
+            self._stores.move_to_end(path)
+            self._evict()
+            return record[0]
+
+    def load(self, key, build, on_wait=None):
+        # Résultat de build() pour `key`, calculé une seule fois quand
+        # plusieurs sessions le demandent en même temps: les suivantes
+        # attendent le chargement en cours (`on_wait` les prévient) et en
+        # reçoivent le résultat ou l'erreur
+        while True:
+            with self._lock:
+                future = self._loading.get(key)
+                owner = future is None
+                if owner:
+                    future = self._loading[key] = Future()
+                else:
+                    self.joined += 1
+            if owner:
+                break
+            if on_wait is not None:
+                on_wait()
+            try:
+                return future.result()
+            except LoadInterrupted:
+                # Session d'origine fermée ou réexécutée: celle-ci reprend le chargement
+                continue
+        try:
+            result = build()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.set_exception(LoadInterrupted())
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._loading[key]
+
+    def acquire(self, store):
+        # Bail d'une session sur `store`: le jeu n'est pas oublié tant qu'il
+        # est tenu. À conserver dans l'état de la session
+        with self._lock:
+            record = self._stores.get(store.path)
+            if record is None:
+                record = self._stores[store.path] = [store, 0, 0]
+            # Taille relevée à nouveau: cube et index écrits depuis l'ouverture
+            record[1] += 1
+            record[2] = entry_size(store.path)
+            self._stores.move_to_end(store.path)
+        return DatasetLease(self, store.path)
+
+    def leased(self):
+        # Chemins des jeux tenus par au moins une session: à épargner lors
+        # de l'éviction du cache disque (voir store.enforce_cache_budget)
+        with self._lock:
+            return {path for path, record in self._stores.items() if record[1]}
+
+    def release(self, path):
+        with self._lock:
+            record = self._stores.get(path)
+            if record is not None:
+                record[1] = max(record[1] - 1, 0)
+            self._evict()
+
+    def forget(self, path):
+        # Entrée supprimée du disque (format précédent, cache vidé)
+        with self._lock:
+            self._stores.pop(path, None)
+
+    def clear(self):
+        # Cache vidé: seuls les jeux tenus par une session restent (leurs
+        # entrées sont épargnées, voir store.clear_cache)
+        with self._lock:
+            for path in [path for path, record in self._stores.items() if not record[1]]:
+                del self._stores[path]
+
+    def _evict(self):
+        # Jeux non tenus oubliés, du plus ancien au plus récent, jusqu'au budget;
+        # le descripteur reste valable pour qui l'utilise encore
+        total = sum(record[2] for record in self._stores.values())
+        for path in list(self._stores):
+            if total <= self.max_bytes:
+                break
+            record = self._stores[path]
+            if record[1] == 0:
+                del self._stores[path]
+                total -= record[2]
+
+    def stats(self):
+        with self._lock:
+            records = list(self._stores.values())
+            return {
+                'datasets': len(records),
+                'leased': sum(1 for record in records if record[1]),
+                'sessions': sum(record[1] for record in records),
+                'bytes': sum(record[2] for record in records),
+                'loading': len(self._loading),
+                'joined': self.joined,
+            }
@@ -0,0 +1,647 @@
+"""Cache en colonnes: entrées projetées en mémoire, index, cube d'agrégats."""
+import hashlib
+import ipaddress
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .detection import detect_attacks
+from .enrich import pack_ips
+from .templates import PARAM_COLUMNS, TEMPLATE_COLUMN, render_messages
+
+# Dossier du cache, créé à la première écriture
+CACHE_DIR = os.environ.get("SSH_SENTINEL_CACHE_DIR", "cache")
+
+# Budget disque du cache (Mo), modifiable depuis la barre latérale ou la ligne de commande
+CACHE_MAX_MB = int(os.environ.get("SSH_SENTINEL_CACHE_MB", 1024))
+HASH_BLOCK_SIZE = 1024 * 1024
+DERIVED_COLUMNS = ['Hour', 'DayOfWeek', 'Date']
+FLOAT32_COLUMNS = ['lat', 'lon']
+INDEXED_COLUMNS = ['EventCategory', 'IP', 'User']  # Colonnes des filtres latéraux
+SOURCE_COLUMN = 'Source'  # Fichier d'origine des lignes d'une entrée fusionnée
+CACHE_FORMAT = 5  # Version du format des entrées (5: catégories d'après les messages d'origine)
+TMP_MARKER = ".tmp-"  # Fichiers et dossiers en cours d'écriture
+
+def tmp_suffix():
+    # Propre au processus et au fil: les sessions Streamlit sont des fils
+    # d'un même processus et peuvent écrire la même entrée en même temps
+    return f"{TMP_MARKER}{os.getpid()}-{threading.get_ident()}"
+
+def hash_upload(stream, params, prefix_sizes=()):
+    # Empreinte du contenu en une seule passe, par blocs; l'empreinte des
+    # préfixes demandés est relevée au passage pour le mode incrémental
+    hash_obj = hashlib.sha256()
+    pending = sorted(set(prefix_sizes))
+    prefixes = {}
+    stream.seek(0)
+    size = 0
+    for block in iter(lambda: stream.read(HASH_BLOCK_SIZE), b''):
+        while pending and pending[0] <= size + len(block):
+            cut = pending.pop(0) - size
+            hash_obj.update(block[:cut])
+            size += cut
+            block = block[cut:]
+            prefixes[size] = hash_obj.hexdigest()
+        hash_obj.update(block)
+        size += len(block)
+    stream.seek(0)
+    content_digest = hash_obj.hexdigest()
+    hash_obj.update(str(dict(params, file_size=size)).encode('utf-8'))
+    return hash_obj.hexdigest(), {'size': size, 'sha256': content_digest}, prefixes
+
+def get_cache_key(stream, params):
+    return hash_upload(stream, params)[0]
+
+def cache_entries():
+    # Entrées du cache avec leur taille et leur dernier accès, hors entrées
+    # en cours d'écriture (meta.json y figure déjà avant le renommage)
+    entries = []
+    if not os.path.isdir(CACHE_DIR):
+        return entries
+    for name in os.listdir(CACHE_DIR):
+        if TMP_MARKER in name:
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.isdir(path) and os.path.exists(meta_path):
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            entries.append((os.path.getmtime(meta_path), size, path))
+    return sorted(entries)
+
+def enforce_cache_budget(max_bytes, keep=()):
+    # Éviction LRU: suppression des entrées les moins récemment utilisées,
+    # sauf celles de `keep` (chemins), quitte à dépasser le budget
+    entries = cache_entries()
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+    return total
+
+def encode_strings(values):
+    # Chaînes UTF-8 concaténées + décalages, sans largeur fixe
+    encoded = [str(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def decode_strings(data, offsets):
+    raw = data.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+def code_dtype(size):
+    for dtype in (np.int8, np.int16, np.int32):
+        if size < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+def write_columns(path, df, base=None, source=None):
+    # Un fichier .npy par colonne; textes encodés par dictionnaire.
+    # Avec `base`, les lignes de df sont ajoutées à la suite d'une entrée
+    # existante: ses dictionnaires sont prolongés, ses codes restent valides
+    # Les lignes sont rangées par date: un ajout plus ancien que la fin de
+    # l'entrée existante entraîne un nouveau tri de l'ensemble
+    os.makedirs(path)
+    order = list(df.columns) if base is None else base.meta['order']
+    rows = len(df) + (len(base) if base is not None else 0)
+    meta = {'format': CACHE_FORMAT, 'rows': rows, 'order': order, 'columns': [], 'source': source}
+    timestamps = df['Timestamp'].to_numpy()
+    if base is not None:
+        timestamps = np.concatenate([base.values('Timestamp'), timestamps.astype(base.specs['Timestamp']['kind'])])
+    permutation = None
+    if len(timestamps) and not (timestamps[1:] >= timestamps[:-1]).all():
+        permutation = np.argsort(timestamps, kind='stable')
+
+    def save(file, values):
+        np.save(file, values if permutation is None else values[permutation])
+
+    for i, col in enumerate(order):
+        if col in DERIVED_COLUMNS:
+            continue
+        series = df[col]
+        prefix = os.path.join(path, f"c{i}")
+        if isinstance(series.dtype, pd.CategoricalDtype) or not (
+                pd.api.types.is_numeric_dtype(series) or pd.api.types.is_datetime64_any_dtype(series)):
+            categorical = pd.Categorical(series)
+            categories = pd.Index(categorical.categories, dtype=object)
+            codes = np.asarray(categorical.codes)
+            if base is not None:
+                previous = base.categories(col)
+                added = categories[previous.get_indexer(categories) < 0]
+                # Le dernier élément de la table sert aux codes -1
+                mapping = np.append(previous.append(added).get_indexer(categories), -1)
+                codes = np.concatenate([base.values(col), mapping[codes]])
+                categories = previous.append(added)
+            if col == 'IP':
+                # Adresses empaquetées du dictionnaire (voir ColumnStore.packed_ips)
+                packed = pack_ips(categories) if base is None else np.concatenate([base.packed_ips(), pack_ips(added)])
+                np.save(os.path.join(path, "ip_packed.npy"), packed)
+            data, offsets = encode_strings(categories)
+            save(f"{prefix}.codes.npy", codes.astype(code_dtype(len(categories))))
+            np.save(f"{prefix}.data.npy", data)
+            np.save(f"{prefix}.offsets.npy", offsets)
+            kind = 'category'
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            values = series.to_numpy()
+            kind = f"datetime64[{np.datetime_data(values.dtype)[0]}]"
+            if base is not None:
+                kind = base.specs[col]['kind']
+                values = np.concatenate([base.values(col), values.astype(kind)])
+            save(f"{prefix}.npy", values.view(np.int64))
+        else:
+            values = series.to_numpy()
+            # Coordonnées en simple précision: largement suffisant pour la carte
+            if col in FLOAT32_COLUMNS:
+                values = values.astype(np.float32)
+            if base is not None:
+                values = np.concatenate([base.values(col), values.astype(base.values(col).dtype)])
+            save(f"{prefix}.npy", values)
+            kind = 'numeric'
+        meta['columns'].append({'name': col, 'file': f"c{i}", 'kind': kind})
+
+    with open(os.path.join(path, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+def merge_columns(path, stores, labels):
+    # Entrée fusionnée de plusieurs entrées, sans repasser par des DataFrames:
+    # dictionnaires réunis (les codes de chaque entrée sont renumérotés),
+    # lignes interclassées par date et colonne Source (étiquette de l'entrée)
+    os.makedirs(path)
+    order = [col for col in stores[0].meta['order'] if all(col in store.specs or col in DERIVED_COLUMNS for store in stores)]
+    order.insert(order.index('Lab') if 'Lab' in order else len(order), SOURCE_COLUMN)
+    rows = sum(len(store) for store in stores)
+    meta = {'format': CACHE_FORMAT, 'rows': rows, 'order': order, 'columns': [], 'source': None,
+            'merged': [{'entry': os.path.basename(store.path), 'label': label} for store, label in zip(stores, labels)]}
+
+    def concat(name):
+        kinds = {store.specs[name]['kind'] for store in stores}
+        if all(kind.startswith('datetime64') for kind in kinds):
+            # Unité la plus fine des entrées
+            kind = str(np.result_type(*[np.dtype(kind) for kind in kinds]))
+            return kind, np.concatenate([np.asarray(store.values(name)).astype(kind) for store in stores])
+        return 'numeric', np.concatenate([np.asarray(store.values(name)) for store in stores])
+
+    # Tri stable: à date égale, l'ordre des entrées puis des lignes est conservé
+    kind, timestamps = concat('Timestamp')
+    permutation = np.argsort(timestamps, kind='stable')
+
+    for i, col in enumerate(order):
+        if col in DERIVED_COLUMNS:
+            continue
+        prefix = os.path.join(path, f"c{i}")
+        if col == SOURCE_COLUMN or stores[0].specs[col]['kind'] == 'category':
+            if col == SOURCE_COLUMN:
+                categories = pd.Index(labels, dtype=object)
+                codes = np.repeat(np.arange(len(stores)), [len(store) for store in stores])
+            else:
+                categories = stores[0].categories(col)
+                for store in stores[1:]:
+                    other = store.categories(col)
+                    categories = categories.append(other[categories.get_indexer(other) < 0])
+                parts = []
+                for store in stores:
+                    # Le dernier élément de la table sert aux codes -1
+                    mapping = np.append(categories.get_indexer(store.categories(col)), -1)
+                    parts.append(mapping[np.asarray(store.values(col))])
+                codes = np.concatenate(parts)
+            data, offsets = encode_strings(categories)
+            np.save(f"{prefix}.codes.npy", codes[permutation].astype(code_dtype(len(categories))))
+            np.save(f"{prefix}.data.npy", data)
+            np.save(f"{prefix}.offsets.npy", offsets)
+            kind = 'category'
+        else:
+            kind, values = concat(col)
+            values = values[permutation]
+            np.save(f"{prefix}.npy", values.view(np.int64) if kind.startswith('datetime64') else values)
+        meta['columns'].append({'name': col, 'file': f"c{i}", 'kind': kind})
+
+    with open(os.path.join(path, "meta.json"), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+def append_candidates(params):
+    # Entrées du cache dont le fichier source peut avoir été prolongé:
+    # mêmes paramètres et dernière ligne complète
+    candidates = {}
+    for _, _, path in cache_entries():
+        try:
+            with open(os.path.join(path, "meta.json"), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        source = meta.get('source')
+        if meta.get('format') == CACHE_FORMAT and source and source['params'] == str(params) and source['complete_lines']:
+            candidates.setdefault(source['size'], []).append((path, source))
+    return candidates
+
+def find_append_base(candidates, prefixes):
+    # Plus long fichier déjà analysé dont le contenu est un préfixe de l'envoi
+    for size in sorted(prefixes, reverse=True):
+        for path, source in candidates.get(size, []):
+            if source['sha256'] == prefixes[size]:
+                return path, source
+    return None
+
+class ColumnStore:
+    # Jeu de données en colonnes projetées en mémoire (mmap): une colonne
+    # n'est lue que lorsqu'elle est demandée, et seulement pour les lignes voulues
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.specs = {column['name']: column for column in self.meta['columns']}
+        self._values = {}
+        self._categories = {}
+        self._postings = {}
+        self._packed_ips = None
+
+    def __len__(self):
+        return self.meta['rows']
+
+    @property
+    def columns(self):
+        # Message à la place de ses parties stockées (modèle et paramètres)
+        return ['Message' if name == TEMPLATE_COLUMN else name
+                for name in self.meta['order'] if name not in PARAM_COLUMNS]
+
+    def values(self, name):
+        # Tableau brut: codes pour les textes, datetime64 ou nombres sinon
+        if name not in self._values:
+            spec = self.specs[name]
+            prefix = os.path.join(self.path, spec['file'])
+            if spec['kind'] == 'category':
+                values = np.load(f"{prefix}.codes.npy", mmap_mode='r')
+            elif spec['kind'].startswith('datetime64'):
+                values = np.load(f"{prefix}.npy", mmap_mode='r').view(spec['kind'])
+            else:
+                values = np.load(f"{prefix}.npy", mmap_mode='r')
+            self._values[name] = values
+        return self._values[name]
+
+    def categories(self, name):
+        # Dictionnaire d'une colonne texte
+        if name not in self._categories:
+            prefix = os.path.join(self.path, self.specs[name]['file'])
+            self._categories[name] = pd.Index(
+                decode_strings(np.load(f"{prefix}.data.npy"), np.load(f"{prefix}.offsets.npy")),
+                dtype=object
+            )
+        return self._categories[name]
+
+    def column(self, name, rows=None):
+        if name in DERIVED_COLUMNS:
+            timestamps = self.column('Timestamp', rows)
+            return add_time_columns(pd.DataFrame({'Timestamp': timestamps}))[name]
+        if name == 'Message' and name not in self.specs:
+            parts = [np.asarray(self.values(part)[:] if rows is None else self.values(part)[rows])
+                     for part in [TEMPLATE_COLUMN] + PARAM_COLUMNS]
+            return pd.Series(render_messages(
+                self.categories(TEMPLATE_COLUMN), parts[0],
+                [(self.categories(part), codes) for part, codes in zip(PARAM_COLUMNS, parts[1:])]
+            ), name=name)
+
+        values = self.values(name)
+        values = values[:] if rows is None else values[rows]
+        if self.specs[name]['kind'] == 'category':
+            return pd.Series(pd.Categorical.from_codes(values, categories=self.categories(name)), name=name)
+        return pd.Series(np.asarray(values), name=name)
+
+    def frame(self, columns=None, rows=None):
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({name: self.column(name, rows) for name in columns})
+
+    def counts(self, name, rows=None, sort=True, top=None):
+        # Comptage par valeur sur les codes, sans matérialiser les textes.
+        # Avec `top`, seules les `top` valeurs les plus fréquentes
+        codes = self.values(name)
+        codes = codes[:] if rows is None else codes[rows]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self.categories(name)))
+        order = top_order(counts, top) if sort else np.arange(len(counts))
+        order = order[counts[order] > 0]
+        return pd.DataFrame({name: self.categories(name)[order], 'Count': counts[order]})
+
+    def codes_for(self, name, labels):
+        return self.categories(name).get_indexer(labels)
+
+    def valid_rows(self):
+        # Lignes datées: les horodatages invalides (NaT) sont triés en dernier
+        timestamps = self.values('Timestamp')
+        return slice(0, int(np.searchsorted(timestamps, np.datetime64('NaT'), side='left')))
+
+    def postings(self, name):
+        # Index inversé d'une colonne texte: numéros de lignes regroupés par
+        # code (croissants dans chaque groupe) et bornes de chaque groupe
+        if name not in self._postings:
+            prefix = os.path.join(self.path, f"index.{name}")
+            if not os.path.exists(f"{prefix}.offsets.npy"):
+                codes = self.values(name)
+                order = np.argsort(codes, kind='stable')
+                order = order[np.count_nonzero(codes < 0):]
+                offsets = np.zeros(len(self.categories(name)) + 1, dtype=np.int64)
+                np.cumsum(np.bincount(codes[codes >= 0], minlength=len(offsets) - 1), out=offsets[1:])
+                for suffix, values in [('rows', order.astype(code_dtype(len(self)))), ('offsets', offsets)]:
+                    tmp_path = f"{prefix}.{suffix}{tmp_suffix()}.npy"
+                    np.save(tmp_path, values)
+                    os.replace(tmp_path, f"{prefix}.{suffix}.npy")
+            self._postings[name] = (np.load(f"{prefix}.rows.npy", mmap_mode='r'),
+                                    np.load(f"{prefix}.offsets.npy"))
+        return self._postings[name]
+
+    def select(self, start=None, end=None, filters=None):
+        # Lignes dont la date est dans [start, end) et dont chaque colonne de
+        # `filters` vaut l'une des valeurs données. Renvoie une tranche (vue,
+        # sans copie) quand seule la plage de dates s'applique, sinon un
+        # tableau trié de numéros de lignes
+        timestamps = self.values('Timestamp')
+        lo = 0 if start is None else int(np.searchsorted(timestamps, start, side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(timestamps, end, side='left'))
+        elif start is not None:
+            # Début seul: les lignes sans date (NaT, rangées en dernier) restent exclues
+            hi = self.valid_rows().stop
+        else:
+            hi = len(self)
+
+        active = []
+        for name, labels in (filters or {}).items():
+            if not labels:
+                continue
+            codes = self.codes_for(name, labels)
+            codes = np.unique(codes[codes >= 0])
+            offsets = self.postings(name)[1]
+            size = int((offsets[codes + 1] - offsets[codes]).sum())
+            if size < len(self):
+                active.append((size, name, codes))
+        if not active:
+            return slice(lo, hi)
+
+        # Le filtre le plus sélectif fournit les candidats...
+        active.sort(key=lambda item: item[0])
+        size, name, codes = active[0]
+        if size < hi - lo:
+            rows, offsets = self.postings(name)
+            parts = []
+            for code in codes:
+                group = rows[offsets[code]:offsets[code + 1]]
+                parts.append(group[np.searchsorted(group, lo):np.searchsorted(group, hi)])
+            candidates = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+        else:
+            candidates = lo + np.flatnonzero(self.membership(name, codes)[self.values(name)[lo:hi]])
+
+        # ...que les autres filtres vérifient par leur bitmap de codes
+        for size, name, codes in active[1:]:
+            candidates = candidates[self.membership(name, codes)[self.values(name)[candidates]]]
+        return candidates
+
+    def packed_ips(self):
+        # Adresses du dictionnaire IP sur 16 octets (voir enrich.pack_ips),
+        # rangées par code: écrites avec la colonne (write_columns), sinon à
+        # la première demande (entrées fusionnées)
+        if self._packed_ips is None:
+            path = os.path.join(self.path, "ip_packed.npy")
+            if not os.path.exists(path):
+                tmp_path = os.path.join(self.path, f"ip_packed{tmp_suffix()}.npy")
+                np.save(tmp_path, pack_ips(self.categories('IP')))
+                os.replace(tmp_path, path)
+            self._packed_ips = np.load(path)
+        return self._packed_ips
+
+    def ips_in_network(self, network):
+        # Adresses du dictionnaire IP comprises dans le réseau `network`
+        # (CIDR, IPv4 ou IPv6): comparaison des formes empaquetées, sans
+        # analyser les textes; les IPv4 y sont vues comme ::ffff:a.b.c.d.
+        # ValueError si le réseau est invalide
+        network = ipaddress.ip_network(network.strip(), strict=False)
+        first, last = pack_ips([str(network.network_address), str(network.broadcast_address)])
+        packed = self.packed_ips()
+        # Zéro: libellés qui ne sont pas des adresses (IP Inconnue, IP Invalide)
+        inside = (packed >= first) & (packed <= last) & (packed != b'')
+        return self.categories('IP')[inside].tolist()
+
+    def membership(self, name, codes):
+        # Bitmap sur le dictionnaire; le dernier élément sert aux codes -1
+        bitmap = np.zeros(len(self.categories(name)) + 1, dtype=bool)
+        bitmap[codes] = True
+        return bitmap
+
+    def cube(self):
+        # Cube d'agrégats de l'entrée, calculé une fois puis projeté en mémoire
+        if not hasattr(self, '_cube'):
+            if not os.path.exists(os.path.join(self.path, "cube.Count.npy")):
+                save_cube(self.path, build_cube(self))
+            self._cube = {
+                name: np.load(os.path.join(self.path, f"cube.{name}.npy"), mmap_mode='r')
+                for name in cube_dimensions(self) + ['Count', 'ip_lat', 'ip_lon']
+            }
+        return self._cube
+
+    def alerts(self):
+        # Alertes de l'entrée, détectées une fois sur les lignes datées (triées)
+        if not hasattr(self, '_alerts'):
+            valid = self.valid_rows()
+            self._alerts = detect_attacks(
+                self.values('Timestamp')[valid],
+                *(pd.Categorical.from_codes(self.values(name)[valid], categories=self.categories(name))
+                  for name in ['EventCategory', 'IP', 'User'])
+            )
+        return self._alerts
+
+def row_count(rows):
+    # Taille d'une sélection renvoyée par ColumnStore.select
+    return rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+def top_order(counts, top=None):
+    # Positions par compte décroissant (à égalité, par code), comme un tri
+    # stable complet; avec `top`, sélection partielle (argpartition) puis tri
+    # des seules `top` premières: la taille du dictionnaire n'est plus triée
+    if top is None or top >= len(counts):
+        return np.argsort(-counts, kind='stable')
+    if top <= 0:
+        return np.empty(0, dtype=np.int64)
+    threshold = counts[np.argpartition(-counts, top - 1)[top - 1]]
+    above = np.flatnonzero(counts > threshold)
+    ties = np.flatnonzero(counts == threshold)[:top - len(above)]
+    chosen = np.concatenate([above, ties])
+    return chosen[np.argsort(-counts[chosen], kind='stable')]
+
+def last_rows(rows, n):
+    # Lignes triées par date: les n dernières de la sélection sont les plus récentes
+    if isinstance(rows, slice):
+        return np.arange(max(rows.start, rows.stop - n), rows.stop)[::-1]
+    return rows[-n:][::-1]
+
+# Cube d'agrégats: nombre d'événements par (heure, catégorie, IP, utilisateur, localisation):
+# les graphiques se calculent sur le cube, dont la taille dépend du nombre
+# de combinaisons distinctes et non du nombre d'événements
+CUBE_DIMENSIONS = ['Hour', 'EventCategory', 'IP', 'User', 'Location']
+
+def cube_dimensions(store):
+    # Les entrées fusionnées ont en plus la dimension Source
+    return CUBE_DIMENSIONS + ([SOURCE_COLUMN] if SOURCE_COLUMN in store.specs else [])
+
+def build_cube(store):
+    # Heures depuis l'époque: la date et l'heure dans une seule clé.
+    # Les lignes sans horodatage valide (en fin d'entrée) n'y figurent pas
+    valid = store.valid_rows()
+    names = cube_dimensions(store)
+    hours = store.values('Timestamp')[valid].astype('datetime64[h]').astype(np.int64)
+    dims = [hours] + [np.asarray(store.values(name)[valid]) for name in names[1:]]
+
+    # Clé mixte sur un seul entier quand les cardinalités le permettent,
+    # tri lexicographique sinon
+    radices = [int(hours.max() - hours.min()) + 1 if len(hours) else 1] + \
+              [len(store.categories(name)) + 1 for name in names[1:]]
+    if np.prod([float(r) for r in radices]) < 2 ** 62:
+        key = np.zeros(len(hours), dtype=np.int64)
+        offsets = [hours.min() if len(hours) else 0] + [-1] * (len(dims) - 1)
+        for dim, radix, offset in zip(dims, radices, offsets):
+            key = key * radix + (dim.astype(np.int64) - offset)
+        order = np.argsort(key, kind='stable')
+        sorted_key = key[order]
+        change = np.empty(len(key), dtype=bool)
+        change[:1] = True
+        change[1:] = sorted_key[1:] != sorted_key[:-1]
+    else:
+        order = np.lexsort(dims[::-1])
+        change = np.zeros(len(hours), dtype=bool)
+        change[:1] = True
+        for dim in dims:
+            sorted_dim = dim[order]
+            change[1:] |= sorted_dim[1:] != sorted_dim[:-1]
+
+    starts = np.flatnonzero(change)
+    cube = {name: dim[order[starts]] for name, dim in zip(names, dims)}
+    cube['Count'] = np.diff(np.append(starts, len(hours)))
+
+    # Coordonnées par IP (identiques pour toutes les lignes d'une IP)
+    ip_codes = np.asarray(store.values('IP'))
+    codes, first = np.unique(ip_codes, return_index=True)
+    for name in ['lat', 'lon']:
+        values = np.full(len(store.categories('IP')), np.nan, dtype=np.float32)
+        if name in store.specs:
+            valid = codes >= 0
+            values[codes[valid]] = store.values(name)[first[valid]]
+        cube[f"ip_{name}"] = values
+    return cube
+
+def save_cube(path, cube):
+    # Count en dernier: sa présence signale un cube complet
+    for name in sorted(cube, key=lambda name: name == 'Count'):
+        tmp_path = os.path.join(path, f"cube.{name}{tmp_suffix()}.npy")
+        np.save(tmp_path, cube[name])
+        os.replace(tmp_path, os.path.join(path, f"cube.{name}.npy"))
+
+def cube_counts(store, name, mask, sort=True, top=None):
+    # Agrégation du cube sur une dimension, au format de ColumnStore.counts
+    cube = store.cube()
+    codes = cube[name][mask]
+    counts = np.bincount(codes[codes >= 0], weights=cube['Count'][mask][codes >= 0],
+                         minlength=len(store.categories(name))).astype(np.int64)
+    order = top_order(counts, top) if sort else np.arange(len(counts))
+    order = order[counts[order] > 0]
+    return pd.DataFrame({name: store.categories(name)[order], 'Count': counts[order]})
+
+def cube_mask(store, name, labels, mask):
+    codes = store.cube()[name]
+    return mask & np.isin(codes, store.codes_for(name, labels))
+
+def spread(store, name, across, rows=slice(None), min_distinct=2, top=None):
+    # Valeurs de `name` vues avec au moins `min_distinct` valeurs de `across`
+    # (une IP sur plusieurs serveurs): paires distinctes de codes, sans textes
+    codes = np.asarray(store.values(name)[rows]).astype(np.int64)
+    other = np.asarray(store.values(across)[rows]).astype(np.int64)
+    known = (codes >= 0) & (other >= 0)
+    radix = max(len(store.categories(across)), 1)
+    pairs = np.unique(codes[known] * radix + other[known])
+    size = len(store.categories(name))
+    distinct = np.bincount(pairs // radix, minlength=size)
+    events = np.bincount(codes[codes >= 0], minlength=size)
+    selected = np.flatnonzero(distinct >= min_distinct)
+    if top is not None and top < len(selected):
+        # Les `top` premières (serveurs, puis événements) sans tout trier:
+        # clé unique, puis même sélection partielle que les comptages
+        rank = distinct[selected].astype(np.int64) * (int(events.max()) + 1) + events[selected]
+        selected = selected[top_order(rank, top)]
+    else:
+        selected = selected[np.lexsort((-events[selected], -distinct[selected]))]
+    # Paires triées par valeur de `name`: valeurs de `across` de chacune
+    bounds = np.searchsorted(pairs // radix, np.stack([selected, selected + 1]))
+    labels = store.categories(across)
+    return pd.DataFrame({
+        name: store.categories(name)[selected],
+        'Distinct': distinct[selected],
+        'Count': events[selected],
+        across: [", ".join(labels[pairs[lo:hi] % radix]) for lo, hi in bounds.T],
+    })
+
+
+def add_time_columns(df):
+    # Colonnes temporelles
+    df['Hour'] = df['Timestamp'].dt.hour
+    df['DayOfWeek'] = df['Timestamp'].dt.dayofweek
+    df['Date'] = df['Timestamp'].dt.date
+    return df
+
+def cached_entry(cache_key, open_store=None, on_discard=None):
+    # Entrée du cache prête à l'emploi, ou None (absente ou d'un format
+    # précédent, alors supprimée). `open_store` permet de partager les
+    # descripteurs; `on_discard` d'oublier celui d'une entrée supprimée
+    cache_path = os.path.join(CACHE_DIR, cache_key)
+    if not os.path.exists(os.path.join(cache_path, "meta.json")):
+        return None
+
+    store = (open_store or ColumnStore)(cache_path)
+    if store.meta.get('format') != CACHE_FORMAT:
+        # Entrée d'une version précédente: à reconstruire
+        if on_discard is not None:
+            on_discard()
+        shutil.rmtree(cache_path, ignore_errors=True)
+        return None
+    # Dernier accès pour l'éviction LRU
+    os.utime(os.path.join(cache_path, "meta.json"))
+    return store
+
+def save_to_cache(cache_key, data, max_bytes, base=None, source=None, keep=()):
+    return publish_entry(cache_key, lambda path: write_columns(path, data, base, source), max_bytes, keep)
+
+def save_merged(cache_key, stores, labels, max_bytes, keep=()):
+    return publish_entry(cache_key, lambda path: merge_columns(path, stores, labels), max_bytes, keep)
+
+def publish_entry(cache_key, write, max_bytes, keep=()):
+    # Écriture dans un dossier temporaire, puis renommage atomique. Les
+    # entrées de `keep` (jeux affichés par une session) échappent à l'éviction
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = os.path.join(CACHE_DIR, cache_key)
+    tmp_path = f"{cache_path}{tmp_suffix()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    write(tmp_path)
+    try:
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Entrée déjà écrite par une autre session
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    enforce_cache_budget(max_bytes, keep={cache_path, *keep})
+    return cache_path
+
+def clear_cache(keep=()):
+    # Entrées supprimées, sauf celles de `keep` (jeux affichés par une
+    # session); renvoie le nombre d'entrées conservées
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+    kept = 0
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        if path in keep:
+            kept += 1
+        elif os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif name.endswith(".joblib"):
+            os.remove(path)
+    return kept
@@ -0,0 +1,275 @@
+"""Modèles de messages: chaque message devient un modèle et ses paramètres.
+
+Regroupement à la manière de Drain (He et al., 2017): à la lecture, bloc par
+bloc, les jetons qui contiennent un chiffre (IP, port, PID...) sont remplacés
+par un joker et mis de côté; les messages complets ne sont jamais réunis pour
+tout le fichier. Sur le jeu réassemblé, les messages masqués de même longueur,
+même premier jeton et même catégorie rejoignent le modèle dont assez de jetons
+fixes coïncident; les jetons qui diffèrent (nom d'utilisateur...) deviennent
+variables à leur tour. Les jetons sont séparés par une espace simple: modèle
+et paramètres reconstituent exactement le message d'origine.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from .enrich import EVENT_CATEGORIES, categorize_event, categorize_events
+from .metrics import NULL_METRICS
+
+WILDCARD = "<*>"
+SIMILARITY_THRESHOLD = 0.5  # Part des jetons identiques pour rejoindre un modèle
+MESSAGE_SLOTS = 4           # Paramètres stockés; le dernier porte aussi les suivants
+TEMPLATE_COLUMN = 'Template'
+PARAM_COLUMNS = [f"Param{i + 1}" for i in range(MESSAGE_SLOTS)]
+
+# Colonnes internes de split_messages (message masqué, jetons variables),
+# retirées par extract_templates
+MASKED_COLUMN = '_masked'
+VARIABLE_COLUMNS = [f"_variable{i + 1}" for i in range(MESSAGE_SLOTS)]
+
+# Jeton contenant un chiffre (sauf un mot suivi d'un numéro de version:
+# ssh2, sha256), ou joker littéral
+VARIABLE_TOKEN = re.compile(r'(?![A-Za-z]{2,}\d{1,3}$)(?:.*\d.*|<\*>)', re.S)
+
+def mask_messages(messages):
+    # Messages masqués (jetons variables remplacés par le joker) et jetons
+    # variables de chacun, dans l'ordre; chaque jeton distinct n'est testé
+    # qu'une fois (adresses, ports et comptes reviennent d'un message à l'autre),
+    # et la position des jokers une fois par message masqué
+    seen = {}
+    get = seen.get
+    positions = {}
+
+    def mask(token):
+        return WILDCARD if VARIABLE_TOKEN.fullmatch(token) else token
+
+    masked, variables = [], []
+    for message in messages:
+        tokens = message.split(' ')
+        text = ' '.join([get(token) or seen.setdefault(token, mask(token)) for token in tokens])
+        masked.append(text)
+        wildcards = positions.get(text)
+        if wildcards is None:
+            wildcards = positions[text] = [i for i, token in enumerate(text.split(' ')) if token == WILDCARD]
+        variables.append([tokens[i] for i in wildcards])
+    return masked, variables
+
+def fill_slots(params):
+    # Paramètres répartis sur MESSAGE_SLOTS tableaux de textes (None si
+    # absent): un par emplacement, le dernier porte aussi les suivants
+    slots = [np.full(len(params), None, dtype=object) for _ in range(MESSAGE_SLOTS)]
+    for row, values in enumerate(params):
+        for i, value in enumerate(values[:MESSAGE_SLOTS - 1]):
+            slots[i][row] = value
+        if len(values) >= MESSAGE_SLOTS:
+            slots[-1][row] = ' '.join(values[MESSAGE_SLOTS - 1:])
+    return slots
+
+def encode(values, codes):
+    # Textes par valeur distincte étendus aux lignes (-1: valeur absente),
+    # en catégories triées comme les autres colonnes des blocs (compact_chunk)
+    value_codes, uniques = pd.factorize(np.asarray(values, dtype=object), sort=True)
+    return pd.Categorical.from_codes(np.append(value_codes, -1)[codes], categories=pd.Index(uniques, dtype='str'))
+
+def split_messages(df, metrics=NULL_METRICS):
+    # Étape par bloc, à la lecture: catégorie d'événement d'après le message
+    # d'origine (mêmes règles que categorize_event), puis Message remplacé
+    # par le message masqué et ses jetons variables (colonnes internes)
+    with metrics.stage('split_messages', len(df)):
+        messages = df['Message'].astype('category')
+        codes = messages.cat.codes.to_numpy()
+        masked, variables = mask_messages(messages.cat.categories.astype(str).tolist())
+
+        position = df.columns.get_loc('Message')
+        df.insert(position, MASKED_COLUMN, encode(masked, codes))
+        for i, (name, values) in enumerate(zip(VARIABLE_COLUMNS, fill_slots(variables))):
+            df.insert(position + 1 + i, name, encode(values, codes))
+        df['EventCategory'] = categorize_events(messages)
+        df.drop(columns='Message', inplace=True)
+    return df
+
+class TemplateMiner:
+    # Modèles (listes de jetons) regroupés par (longueur, premier jeton,
+    # catégorie): un message n'est comparé qu'aux modèles de son groupe
+    def __init__(self, threshold=SIMILARITY_THRESHOLD):
+        self.threshold = threshold
+        self.groups = {}
+        self.templates = []
+        self.labels = []
+
+    def add(self, tokens, label):
+        # Numéro du modèle du message, créé ou généralisé au besoin
+        group = self.groups.setdefault((len(tokens), tokens[0], label), [])
+        best, best_score = None, -1.0
+        for index in group:
+            template = self.templates[index]
+            score = sum(a == b for a, b in zip(template, tokens) if a != WILDCARD) / len(tokens)
+            if score > best_score:
+                best, best_score = index, score
+        if best is None or best_score < self.threshold:
+            self.templates.append(list(tokens))
+            self.labels.append(label)
+            group.append(len(self.templates) - 1)
+            return len(self.templates) - 1
+        template = self.templates[best]
+        self.templates[best] = [a if a == b else WILDCARD for a, b in zip(template, tokens)]
+        return best
+
+def mine_templates(messages, known=()):
+    # (message masqué, catégorie) distincts -> (textes des modèles, modèle de
+    # chaque message, origine de ses paramètres). Paramètre d'un message:
+    # ('fixed', jeton) pour un jeton fixe du message masqué devenu joker du
+    # modèle, ('variable', k) pour son k-ième jeton variable. Les modèles
+    # `known` (entrée prolongée) sont proposés en premier
+    miner = TemplateMiner()
+    for text in known:
+        miner.add(text.split(' '), categorize_event(text))
+
+    # Dans l'ordre trié: le résultat ne dépend pas de l'ordre des lignes
+    order = sorted(range(len(messages)), key=messages.__getitem__)
+    assigned = np.zeros(len(messages), dtype=np.int64)
+    for i in order:
+        text, label = messages[i]
+        assigned[i] = miner.add(text.split(' '), label)
+
+    sources = []
+    for (text, _), index in zip(messages, assigned):
+        params, variable = [], 0
+        for token, model in zip(text.split(' '), miner.templates[index]):
+            if token == WILDCARD:
+                params.append(('variable', variable))
+                variable += 1
+            elif model == WILDCARD:
+                params.append(('fixed', token))
+        sources.append(params)
+    return [' '.join(template) for template in miner.templates], assigned, sources
+
+class SlotBuilder:
+    # Codes d'un emplacement de paramètre et son dictionnaire, construits
+    # groupe de lignes par groupe de lignes
+    def __init__(self, rows):
+        self.codes = np.full(rows, -1, dtype=np.int32)
+        self.values = {}
+        self.remaps = {}
+
+    def code(self, value):
+        return self.values.setdefault(value, len(self.values))
+
+    def remap(self, index, values):
+        # Codes de l'emplacement pour chaque valeur de la colonne interne `index`
+        if index not in self.remaps:
+            self.remaps[index] = np.append(np.array([self.code(value) for value in values], dtype=np.int32), -1)
+        return self.remaps[index]
+
+    def categorical(self):
+        return pd.Categorical.from_codes(self.codes, categories=list(self.values)).remove_unused_categories()
+
+def slot_parts(params, slot):
+    # Paramètres qui remplissent l'emplacement `slot`
+    return params[slot:slot + 1] if slot < MESSAGE_SLOTS - 1 else params[MESSAGE_SLOTS - 1:]
+
+def fill_slot(builder, rows, parts, variables, count):
+    # Emplacement des lignes `rows` (même message masqué, `count` jetons
+    # variables): jeton fixe, colonne interne reprise telle quelle, ou
+    # texte composé par combinaison distincte des colonnes utilisées.
+    # `variables`: (valeurs, codes) de chaque colonne interne
+    last = MESSAGE_SLOTS - 1
+    kinds = [kind for kind, _ in parts]
+    indexes = [value for kind, value in parts if kind == 'variable']
+    if 'variable' not in kinds:
+        builder.codes[rows] = builder.code(' '.join(value for _, value in parts))
+    elif (kinds == ['variable'] and indexes[0] < last) or ('fixed' not in kinds and indexes == list(range(last, count))):
+        # Un seul jeton variable, ou tous ceux que porte le dernier emplacement
+        column = min(indexes[0], last)
+        values, codes = variables[column]
+        builder.codes[rows] = builder.remap(column, values)[codes[rows]]
+    else:
+        columns = sorted({min(index, last) for index in indexes})
+        combos, inverse = np.unique(np.column_stack([variables[column][1][rows] for column in columns]),
+                                    axis=0, return_inverse=True)
+        codes = []
+        for combo in combos.tolist():
+            values = {column: variables[column][0][code] for column, code in zip(columns, combo)}
+            tokens = [value if kind == 'fixed' else values[value] if value < last else
+                      values[last].split(' ')[value - last] for kind, value in parts]
+            codes.append(builder.code(' '.join(tokens)))
+        builder.codes[rows] = np.asarray(codes, dtype=np.int32)[np.ravel(inverse)]
+
+def extract_templates(df, known=(), metrics=NULL_METRICS):
+    # Colonnes internes de split_messages remplacées par Template et
+    # Param1..4 (textes par dictionnaire). Sur le jeu complet, après
+    # réassemblage des blocs: résultat identique en lecture série ou parallèle
+    with metrics.stage('templates', len(df)):
+        masked = df[MASKED_COLUMN]
+        variables = [(list(df[name].cat.categories), df[name].cat.codes.to_numpy()) for name in VARIABLE_COLUMNS]
+
+        # Un couple (message masqué, catégorie) par groupe de lignes
+        masked_codes = masked.cat.codes.to_numpy().astype(np.int64)
+        key = masked_codes * len(EVENT_CATEGORIES) + df['EventCategory'].cat.codes.to_numpy()
+        key[masked_codes < 0] = -1
+        keys, row_pairs = np.unique(key, return_inverse=True)
+        row_pairs = np.ravel(row_pairs)
+        if len(keys) and keys[0] < 0:
+            keys, row_pairs = keys[1:], row_pairs - 1
+        texts = masked.cat.categories
+        messages = [(texts[k // len(EVENT_CATEGORIES)], EVENT_CATEGORIES[k % len(EVENT_CATEGORIES)])
+                    for k in keys.tolist()]
+        templates, assigned, sources = mine_templates(messages, known)
+
+        # Paramètres couple par couple: mêmes origines pour toutes ses lignes
+        order = np.argsort(row_pairs, kind='stable')
+        bounds = np.searchsorted(row_pairs[order], np.arange(len(messages) + 1))
+        builders = [SlotBuilder(len(df)) for _ in range(MESSAGE_SLOTS)]
+        for pair, ((text, _), params) in enumerate(zip(messages, sources)):
+            rows = order[bounds[pair]:bounds[pair + 1]]
+            count = text.split(' ').count(WILDCARD)
+            for slot, builder in enumerate(builders):
+                parts = slot_parts(params, slot)
+                if parts and len(rows):
+                    fill_slot(builder, rows, parts, variables, count)
+
+        text_codes, template_texts = pd.factorize(pd.Series(templates, dtype=object))
+        pair_templates = np.append(text_codes[assigned], -1)
+
+        position = df.columns.get_loc(MASKED_COLUMN)
+        df.insert(position, TEMPLATE_COLUMN,
+                  pd.Categorical.from_codes(pair_templates[row_pairs], categories=template_texts))
+        for i, (name, builder) in enumerate(zip(PARAM_COLUMNS, builders)):
+            df.insert(position + 1 + i, name, builder.categorical())
+        df.drop(columns=[MASKED_COLUMN] + VARIABLE_COLUMNS, inplace=True)
+    return df
+
+def render_messages(templates, template_codes, slots):
+    # Messages de lignes à partir des codes: un rendu par combinaison
+    # distincte (modèle, paramètres). `slots`: (dictionnaire, codes) par
+    # emplacement. Sans paramètre, un joker reste tel quel (texte littéral)
+    columns = [np.asarray(template_codes, dtype=np.int64)] + [np.asarray(codes, dtype=np.int64) for _, codes in slots]
+    radices = [len(templates) + 1] + [len(categories) + 1 for categories, _ in slots]
+    if np.prod([float(r) for r in radices]) < 2 ** 62:
+        # Combinaison sur un seul entier quand les cardinalités le permettent
+        key = np.zeros(len(columns[0]), dtype=np.int64)
+        for column, radix in zip(columns, radices):
+            key = key * radix + (column + 1)
+        _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+        combos = np.column_stack(columns)[first]
+    else:
+        combos, inverse = np.unique(np.column_stack(columns), axis=0, return_inverse=True)
+
+    parsed = [template.split(' ') for template in templates]
+    wildcards = [[i for i, token in enumerate(tokens) if token == WILDCARD] for tokens in parsed]
+    values = [list(categories) for categories, _ in slots]
+    rendered = []
+    for combo in combos.tolist():
+        if combo[0] < 0:
+            rendered.append(None)
+            continue
+        params = [values[i][code] for i, code in enumerate(combo[1:-1]) if code >= 0]
+        if combo[-1] >= 0:
+            params.extend(values[-1][combo[-1]].split(' '))
+        tokens = list(parsed[combo[0]])
+        for i, param in zip(wildcards[combo[0]], params):
+            tokens[i] = param
+        rendered.append(' '.join(tokens))
+    message_codes, messages = pd.factorize(pd.Series(rendered, dtype=object))
+    return pd.Categorical.from_codes(message_codes[np.ravel(inverse)], categories=messages)
@@ -0,0 +1,52 @@
+import os
+import random
+import sys
+
+import pytest
+
+# Paquet importé depuis le dépôt, sans installation (comme benchmarks/run.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ssh_sentinel import geo, store
+
+MESSAGES = [
+    "Failed password for {user} from {ip} port {port} ssh2",
+    "Accepted password for {user} from {ip} port {port} ssh2",
+    "Invalid user {user} from {ip} port {port}",
+    "Disconnected from authenticating user {user} {ip} port {port} [preauth]",
+    "pam_unix(sshd:session): session opened for user {user}(uid=0) by (uid=0)",
+]
+
+def make_lines(rows, seed=0, start=0):
+    # Lignes CSV ';' déterministes, une par seconde à partir de `start`
+    rng = random.Random(seed)
+    lines = []
+    for i in range(start, start + rows):
+        ip = f"10.{seed}.{rng.randint(0, 3)}.{rng.randint(1, 20)}"
+        user = rng.choice(["root", "admin", "git", f"user{rng.randint(0, 9)}"])
+        message = rng.choice(MESSAGES).format(user=user, ip=ip, port=rng.randint(1024, 65535))
+        stamp = f"2024-01-{1 + i // 86400:02d} {i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}"
+        lines.append(f"{stamp};lab{seed};sshd;{1000 + i};{ip};{user};E;{message}\n")
+    return lines
+
+@pytest.fixture
+def log_lines():
+    return make_lines
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    # Cache propre au test (entrées et tables des plages GeoLite2)
+    path = str(tmp_path / "cache")
+    monkeypatch.setattr(store, 'CACHE_DIR', path)
+    monkeypatch.setattr(geo, 'CACHE_DIR', path)
+    return path
+
+@pytest.fixture
+def write_log(tmp_path):
+    # Journal `name` écrit (ou complété) dans le dossier du test
+    def write(name, lines, mode='w'):
+        path = str(tmp_path / name)
+        with open(path, mode, encoding='utf-8', newline='') as f:
+            f.writelines(lines)
+        return path
+    return write
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+
+from ssh_sentinel.detection import detect_attacks
+
+START = np.datetime64('2024-01-01T00:00:00', 's')
+
+def detect(events):
+    # events: (seconde, catégorie, IP, utilisateur), dans n'importe quel ordre
+    events = sorted(events, key=lambda event: event[0])
+    seconds, categories, ips, users = zip(*events)
+    alerts = detect_attacks(START + np.array(seconds, dtype='timedelta64[s]'),
+                            *(pd.Categorical(values) for values in (categories, ips, users)))
+    return alerts.set_index('Type')
+
+def failures(seconds, ip="10.0.0.1", user="root"):
+    return [(second, "Tentative Échouée", ip, user) for second in seconds]
+
+def test_brute_force_window():
+    # 20 échecs en moins de 10 minutes; à 10 minutes pile, le premier sort de la fenêtre
+    alerts = detect(failures(list(range(19)) + [599]))
+    assert alerts.loc["Force brute", 'Détail'] == "20 échecs en 10 min"
+    assert alerts.loc["Force brute", 'Début'] == pd.Timestamp(START)
+    assert "Force brute" not in detect(failures(list(range(19)) + [600])).index
+    # Adresses inconnues: ignorées
+    assert "Force brute" not in detect(failures(range(30), ip="IP Inconnue")).index
+
+def test_password_spraying_distinct_users():
+    events = [(i, "Utilisateur Invalide", "10.0.0.2", f"user{i}") for i in range(10)]
+    alert = detect(events).loc["Pulvérisation de mots de passe"]
+    assert (alert['IP'], alert['Événements'], alert['Détail']) == ("10.0.0.2", 10, "10 comptes distincts essayés")
+    # Le même compte répété ou un compte vide ne comptent qu'une fois, ou pas du tout
+    events = events[:9] + [(20, "Utilisateur Invalide", "10.0.0.2", "user0"), (21, "Tentative Échouée", "10.0.0.2", "")]
+    assert "Pulvérisation de mots de passe" not in detect(events).index
+
+def test_credential_stuffing_window():
+    # Un même compte attaqué depuis 20 adresses, adresses inconnues comprises
+    events = [(second, "Tentative Échouée", f"10.1.0.{second % 20}" if second else "IP Inconnue", "admin")
+              for second in list(range(19)) + [599]]
+    alert = detect(events).loc["Bourrage d'identifiants"]
+    assert (alert['Utilisateur'], alert['Événements']) == ("admin", 20)
+    events[-1] = (600, *events[-1][1:])
+    assert "Bourrage d'identifiants" not in detect(events).index
+
+def test_compromise_lookback():
+    success = [(4000, "Connexion Réussie", "10.0.0.1", "root")]
+    # Cinq échecs dans l'heure précédente, le premier à une heure pile
+    alerts = detect(failures([400, 3900, 3950, 3980, 3990]) + success)
+    alert = alerts.loc["Compromission possible"]
+    assert (alert['Sévérité'], alert['Utilisateur'], alert['Événements']) == ("Critique", "root", 6)
+    assert (alert['Début'], alert['Fin']) == (pd.Timestamp(START + 400), pd.Timestamp(START + 4000))
+    assert alert['Détail'] == "Connexion réussie après 5 échecs"
+
+    # Échec trop ancien, ou de la même seconde que la connexion: non compté
+    assert "Compromission possible" not in detect(failures([399, 3900, 3950, 3980, 3990]) + success).index
+    assert "Compromission possible" not in detect(failures([3900, 3950, 3980, 3990, 4000]) + success).index
+    # Échecs d'une autre IP: sans rapport
+    assert "Compromission possible" not in detect(failures([3900, 3950, 3980, 3990, 3995], ip="10.0.0.9") + success).index
+
+def test_compromise_grouped_by_ip_and_user():
+    events = failures([100, 110, 120, 130, 140, 150]) + [
+        (200, "Connexion Réussie", "10.0.0.1", "root"),
+        (300, "Connexion Réussie", "10.0.0.1", "root"),
+        (400, "Connexion Réussie", "10.0.0.1", "deploy"),
+    ]
+    alerts = detect(events).loc[["Compromission possible"]].set_index('Utilisateur')
+    assert sorted(alerts.index) == ["deploy", "root"]
+    root = alerts.loc["root"]
+    assert (root['Début'], root['Fin']) == (pd.Timestamp(START + 100), pd.Timestamp(START + 300))
+    # Deux connexions et les six échecs de la période, comptés une fois
+    assert root['Événements'] == 8
+    assert root['Détail'] == "2 connexions réussies, jusqu'à 6 échecs avant chacune"
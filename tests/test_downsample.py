@@ -0,0 +1,43 @@
+import numpy as np
+
+from ssh_sentinel.downsample import bin_points, lttb
+
+def test_bin_points_exact_locations():
+    # Sous le plafond: une case par coordonnées distinctes, poids cumulés
+    points, size = bin_points([48.85, 48.85, 45.76], [2.35, 2.35, 4.83], [2, 3, 4], ["Paris", "Paris", "Lyon"])
+    assert size is None
+    assert sorted(zip(points['Location'], points['Count'])) == [("Lyon", 4), ("Paris", 5)]
+
+def test_bin_points_grouped_cell():
+    # Trois lieux dans une case: barycentre pondéré, libellé le plus lourd (poids cumulés par libellé)
+    lat, lon = [48.80, 48.90, 48.95, 10.0], [2.30, 2.40, 2.45, 10.0]
+    points, size = bin_points(lat, lon, [5, 3, 6, 1], ["Paris", "Paris", "Saint-Denis", "Ailleurs"], max_points=2)
+    assert size == 0.25
+    cell = points[points['Count'] == 14].iloc[0]
+    assert cell['Location'] == "Paris (+1)"
+    assert np.isclose(cell['lat'], (48.80 * 5 + 48.90 * 3 + 48.95 * 6) / 14)
+    assert np.isclose(cell['lon'], (2.30 * 5 + 2.40 * 3 + 2.45 * 6) / 14)
+
+def test_bin_points_bounded():
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(-60, 70, 20_000), rng.uniform(-180, 180, 20_000)
+    weights = rng.integers(1, 50, 20_000)
+    labels = [f"lieu{i % 3000}" for i in range(20_000)]
+    points, size = bin_points(lat, lon, weights, labels, max_points=500)
+    assert len(points) <= 500 and size is not None
+    assert points['Count'].sum() == weights.sum()
+    assert points['lat'].between(-60, 70).all() and points['lon'].between(-180, 180).all()
+
+def test_lttb_short_series():
+    assert np.array_equal(lttb(np.arange(10), np.zeros(10), threshold=10), np.arange(10))
+    assert np.array_equal(lttb(np.arange(10), np.zeros(10), threshold=2), np.arange(10))
+
+def test_lttb_keeps_ends_and_peaks():
+    x = np.arange(10_000)
+    y = np.sin(x / 500.0)
+    y[4321], y[7000] = 50.0, -50.0
+    selected = lttb(x, y, threshold=300)
+    assert len(selected) == 300
+    assert selected[0] == 0 and selected[-1] == len(x) - 1
+    assert (np.diff(selected) > 0).all()
+    assert 4321 in selected and 7000 in selected
@@ -0,0 +1,35 @@
+import random
+
+import numpy as np
+import pandas as pd
+
+from ssh_sentinel.enrich import EVENT_CATEGORIES, EVENT_RULES, categorize_event, categorize_events
+
+def corpus(count=20_000, seed=0):
+    # Sous-chaînes des règles, seules ou combinées (priorité), en casse
+    # variable, collées à d'autres mots, et valeurs non textuelles
+    rng = random.Random(seed)
+    needles = [needle for needle, _ in EVENT_RULES]
+    words = ["from", "root", "port", "22", "ssh2", "user", "password", "session", "invalid", "é", "İ", "\u212a", ""]
+    messages = []
+    for _ in range(count):
+        parts = [rng.choice(needles + words) for _ in range(rng.randint(0, 6))]
+        text = rng.choice([' ', '', '-', ';']).join(parts)
+        messages.append(''.join(c.upper() if rng.random() < 0.2 else c for c in text))
+    return messages + ["İnvalid user x", "brea\u212a-in", np.nan, None, 42, "FAILED PASSWORD",
+                       "accepted password failed password", "nan"]
+
+def test_same_labels_as_categorize_event():
+    messages = pd.Series(corpus(), dtype=object)
+    expected = messages.apply(categorize_event)
+    result = categorize_events(messages)
+    assert list(result) == list(expected)
+
+def test_categorical_with_fixed_categories():
+    result = categorize_events(pd.Series(["failed password for root", "hello"]))
+    assert isinstance(result, pd.Categorical)
+    assert list(result.categories) == EVENT_CATEGORIES
+
+def test_categorical_input():
+    messages = pd.Series(corpus(2000, seed=1)[:-6], dtype=object).astype('category')
+    assert list(categorize_events(messages)) == [categorize_event(message) for message in messages]
@@ -0,0 +1,83 @@
+import os
+
+from ssh_sentinel.live import LiveWindow, LogTailer, parse_live_lines
+
+def csv_line(stamp, ip, message="Failed password for root from {ip} port 22 ssh2"):
+    return f"{stamp};bastion;sshd;1;{ip};root;E;{message.format(ip=ip)}\n"
+
+def test_tailer_reads_appended_lines(write_log, log_lines):
+    path = write_log("auth.log", log_lines(5))
+    tailer = LogTailer(path)
+    # Premier passage: le contenu déjà présent n'est pas relu
+    assert tailer.poll() == []
+
+    lines = log_lines(3, start=5)
+    write_log("auth.log", lines[:2] + [lines[2][:20]], mode='a')
+    assert tailer.poll() == [line.rstrip('\n') for line in lines[:2]]
+    # Ligne en cours d'écriture: rendue une fois terminée
+    assert tailer.poll() == []
+    write_log("auth.log", [lines[2][20:]], mode='a')
+    assert tailer.poll() == [lines[2].rstrip('\n')]
+    assert tailer.offset == os.path.getsize(path)
+
+def test_tailer_restarts_after_truncation_and_rotation(write_log, log_lines):
+    path = write_log("auth.log", log_lines(10))
+    tailer = LogTailer(path, from_start=True)
+    assert len(tailer.poll()) == 10
+
+    # Troncature: fichier plus court que la position de lecture
+    truncated = log_lines(2, start=100)
+    write_log("auth.log", truncated)
+    assert tailer.poll() == [line.rstrip('\n') for line in truncated]
+
+    # Rotation: nouveau fichier (autre inode) sous le même nom
+    rotated = log_lines(4, start=200)
+    os.replace(write_log("auth.log.new", rotated), path)
+    assert tailer.poll() == [line.rstrip('\n') for line in rotated]
+    assert tailer.poll() == []
+
+def test_tailer_reads_in_bounded_chunks(write_log, log_lines):
+    lines = log_lines(4)
+    path = write_log("auth.log", lines)
+    tailer = LogTailer(path, from_start=True)
+    # Lecture bornée: seules les lignes complètes sont rendues
+    assert tailer.poll(max_bytes=len(lines[0]) + 5) == [lines[0].rstrip('\n')]
+    assert tailer.poll() == [line.rstrip('\n') for line in lines[1:]]
+
+def test_parse_live_lines():
+    df = parse_live_lines([
+        csv_line("2024-01-01 10:00:00", "10.0.0.1"),
+        "Jan  1 10:00:05 bastion sshd[42]: Invalid user oracle from 2001:db8::1 port 22",
+        "ligne illisible",
+    ])
+    assert df['IP'].tolist() == ["10.0.0.1", "2001:db8::1"]
+    assert df['User'].tolist() == ["root", "oracle"]
+    assert df['EventCategory'].tolist() == ["Tentative Échouée", "Utilisateur Invalide"]
+
+def test_window_evicts_old_hours():
+    window = LiveWindow(hours=3)
+    window.add(parse_live_lines([csv_line(f"2024-01-01 {hour:02d}:30:00", "10.0.0.1") for hour in range(3)]))
+    assert window.hourly()['Événements'].tolist() == [1, 1, 1]
+
+    # Deux heures plus tard: seules les trois dernières heures restent
+    window.add(parse_live_lines([
+        csv_line("2024-01-01 04:10:00", "10.0.0.2"),
+        csv_line("2024-01-01 04:20:00", "10.0.0.2", "Accepted password for root from {ip} port 22 ssh2"),
+    ]))
+    hourly = window.hourly()
+    assert hourly['Heure'].dt.hour.tolist() == [2, 4]
+    assert hourly['Événements'].tolist() == [1, 2]
+    assert hourly['Échecs'].tolist() == [1, 1]
+    assert window.top('ips') == [("10.0.0.2", 2), ("10.0.0.1", 1)]
+
+    # Lignes en retard, hors de la fenêtre: ignorées
+    window.add(parse_live_lines([csv_line("2024-01-01 01:00:00", "10.0.0.3")]))
+    assert window.hourly()['Événements'].tolist() == [1, 2]
+    assert window.top('users') == [("root", 2)]
+
+def test_window_bounds_keys():
+    window = LiveWindow(hours=2, max_keys=4)
+    window.add(parse_live_lines([csv_line("2024-01-01 00:00:00", f"10.0.0.{i}") for i in range(10)]
+                                + [csv_line("2024-01-01 00:00:01", "10.0.0.9")]))
+    top = window.top('ips', None)
+    assert len(top) <= 4 and top[0] == ("10.0.0.9", 2)
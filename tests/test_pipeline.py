@@ -0,0 +1,41 @@
+import os
+
+import pandas as pd
+
+from ssh_sentinel import store
+from ssh_sentinel.pipeline import analyze_path, analyze_paths
+from ssh_sentinel.store import SOURCE_COLUMN, cache_entries
+
+def test_merge_with_budget_below_entries(cache_dir, write_log, log_lines):
+    # Budget bien inférieur à une seule entrée: les entrées des fichiers
+    # déjà lus restent disponibles jusqu'à la fusion
+    paths = [write_log(f"bastion{i}.csv", log_lines(300, seed=i)) for i in range(3)]
+    store, _ = analyze_paths(paths, cache_max_mb=0.001, enable_geo=False)
+    assert len(store) == 900
+    assert sorted(store.categories(SOURCE_COLUMN)) == [os.path.basename(path) for path in paths]
+    assert store.frame(['User'])['User'].notna().all()
+
+    # Une analyse suivante évince les entrées qui ne servent plus
+    analyze_paths([write_log("autre.csv", log_lines(50, seed=7))], cache_max_mb=0.001, enable_geo=False)
+    assert len(cache_entries()) == 1
+
+def test_append_matches_full_parse(cache_dir, write_log, log_lines, monkeypatch, tmp_path):
+    # Lecture de la seule suite d'un fichier prolongé: même entrée qu'une
+    # analyse complète, y compris pour des lignes plus anciennes que la fin
+    lines = log_lines(600)
+    path = write_log("auth.csv", lines)
+    first, _ = analyze_path(path, enable_geo=False)
+    added = log_lines(300, seed=1, start=600) + log_lines(100, seed=2, start=100) + ["pas une date;lab0;sshd;1;10.0.0.1;root;E;x\n"]
+    write_log("auth.csv", added, mode='a')
+    messages = []
+    appended, _ = analyze_path(path, enable_geo=False, notify=lambda level, message: messages.append(message))
+    assert any(message.startswith("➕") for message in messages)
+    assert appended.path != first.path and len(appended) == 1001
+
+    # Analyse complète du même fichier dans un cache vide
+    monkeypatch.setattr(store, 'CACHE_DIR', str(tmp_path / "full"))
+    full, _ = analyze_path(path, enable_geo=False)
+    # Dictionnaires prolongés: mêmes valeurs, ordre des catégories différent
+    pd.testing.assert_frame_equal(appended.frame(), full.frame(), check_categorical=False)
+    pd.testing.assert_frame_equal(appended.alerts(), full.alerts())
+    assert int(appended.cube()['Count'].sum()) == int(full.cube()['Count'].sum()) == 1000
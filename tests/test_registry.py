@@ -0,0 +1,43 @@
+import os
+from types import SimpleNamespace
+
+from ssh_sentinel import store
+from ssh_sentinel.registry import DatasetRegistry
+
+def write_entry(path, size):
+    os.makedirs(path)
+    with open(os.path.join(path, "data.bin"), 'wb') as f:
+        f.write(b'\0' * size)
+    with open(os.path.join(path, "meta.json"), 'w') as f:
+        f.write('{}')
+
+def test_leased_entry_survives_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'CACHE_DIR', str(tmp_path))
+    registry = DatasetRegistry(open_store=lambda path: SimpleNamespace(path=path))
+    first = store.publish_entry('first', lambda path: write_entry(path, 1000), 10_000)
+    second = store.publish_entry('second', lambda path: write_entry(path, 1000), 10_000)
+    lease = registry.acquire(registry.open(first))
+    assert registry.leased() == {first}
+
+    # Budget dépassé: l'entrée la plus ancienne non tenue est supprimée
+    third = store.publish_entry('third', lambda path: write_entry(path, 1000), 1500, keep=registry.leased())
+    assert os.path.isdir(first) and not os.path.isdir(second) and os.path.isdir(third)
+
+    lease.release()
+    assert registry.leased() == set()
+    store.publish_entry('fourth', lambda path: write_entry(path, 1000), 1500, keep=registry.leased())
+    assert not os.path.isdir(first)
+
+def test_clear_cache_keeps_leased_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, 'CACHE_DIR', str(tmp_path))
+    registry = DatasetRegistry(open_store=lambda path: SimpleNamespace(path=path))
+    shown = store.publish_entry('shown', lambda path: write_entry(path, 10), 10_000)
+    other = store.publish_entry('other', lambda path: write_entry(path, 10), 10_000)
+    lease = registry.acquire(registry.open(shown))
+    registry.open(other)
+
+    assert store.clear_cache(keep=registry.leased()) == 1
+    registry.clear()
+    assert os.path.isdir(shown) and not os.path.isdir(other)
+    assert registry.stats()['datasets'] == 1 and registry.leased() == {shown}
+    lease.release()
@@ -0,0 +1,140 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ssh_sentinel import store
+from ssh_sentinel.pipeline import analyze_path
+
+def write_entry(path, payload, barrier=None):
+    os.makedirs(path)
+    with open(os.path.join(path, "meta.json"), 'w') as f:
+        f.write('{}')
+    if barrier is not None:
+        # Les deux écritures sont en cours en même temps
+        barrier.wait()
+    with open(os.path.join(path, "data.bin"), 'w') as f:
+        f.write(payload)
+
+def test_same_entry_published_by_two_threads(cache_dir):
+    barrier = threading.Barrier(2)
+    paths, errors = [], []
+
+    def publish(payload):
+        try:
+            paths.append(store.publish_entry('key', lambda path: write_entry(path, payload, barrier), 10_000))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=publish, args=(payload,)) for payload in ["a" * 100, "b" * 100]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert paths[0] == paths[1]
+    with open(os.path.join(paths[0], "data.bin")) as f:
+        assert f.read() in ("a" * 100, "b" * 100)
+    assert os.listdir(cache_dir) == ['key']
+
+def test_entries_being_written_are_ignored(cache_dir):
+    store.publish_entry('done', lambda path: write_entry(path, "x"), 10_000)
+    write_entry(os.path.join(cache_dir, f"pending{store.tmp_suffix()}"), "y" * 1000)
+    assert [os.path.basename(path) for _, _, path in store.cache_entries()] == ['done']
+    store.enforce_cache_budget(0, keep={os.path.join(cache_dir, 'done')})
+    assert len(os.listdir(cache_dir)) == 2
+
+def test_ips_in_network(cache_dir, write_log, log_lines):
+    # Adresses comparées sous forme empaquetée, IPv4 et IPv6; le dictionnaire
+    # prolongé par un ajout garde ses formes empaquetées rangées par code
+    path = write_log("auth.csv", log_lines(200, seed=1))
+    first, _ = analyze_path(path, enable_geo=False)
+    extra = [f"2024-01-01 01:00:0{i};lab1;sshd;1;{ip};root;E;Failed password for root from {ip} port 22 ssh2\n"
+             for i, ip in enumerate(["2001:db8::7", "2001:db9::1", "10.2.0.1", "bad"])]
+    entry, _ = analyze_path(write_log("auth.csv", extra, mode='a'), enable_geo=False)
+    assert entry.path != first.path and len(entry) == 204
+
+    ips = pd.Series(entry.categories('IP'))
+    assert np.array_equal(entry.packed_ips(), np.load(os.path.join(entry.path, "ip_packed.npy")))
+    assert sorted(entry.ips_in_network("10.1.0.0/16")) == sorted(ips[ips.str.startswith("10.1.")])
+    assert sorted(entry.ips_in_network("10.0.0.0/8")) == sorted(ips[ips.str.startswith("10.")])
+    assert entry.ips_in_network(" 2001:db8::/32 ") == ["2001:db8::7"]
+    assert entry.ips_in_network("2000::/3") == ["2001:db8::7", "2001:db9::1"]
+    assert "10.2.0.1" in entry.ips_in_network("::ffff:10.2.0.0/112")
+    assert entry.ips_in_network("192.168.0.0/16") == []
+    with pytest.raises(ValueError):
+        entry.ips_in_network("10.0.0.0/33")
+
+def dated_entry(write_log, log_lines):
+    # Deux journées d'activité et des lignes sans date valide (NaT, en fin d'entrée)
+    lines = log_lines(3000, seed=2) + log_lines(3000, seed=2, start=2 * 86400)
+    for i in range(0, len(lines), 250):
+        lines[i] = "pas une date" + lines[i][lines[i].index(';'):]
+    entry, _ = analyze_path(write_log("auth.csv", lines), enable_geo=False)
+    return entry, entry.frame(['Timestamp', 'EventCategory', 'IP', 'User'])
+
+def test_select_matches_pandas(cache_dir, write_log, log_lines):
+    entry, df = dated_entry(write_log, log_lines)
+    assert df['Timestamp'].isna().sum() == 24 and df['Timestamp'].iloc[-24:].isna().all()
+
+    start, end = np.datetime64('2024-01-01T00:30:00'), np.datetime64('2024-01-03T00:20:00')
+    ips = df['IP'].value_counts().index[:3].tolist()
+    cases = [
+        (None, None, {}),
+        (start, None, {}),
+        (None, end, {}),
+        (start, end, {'User': ["root"]}),
+        (start, None, {'IP': ips, 'EventCategory': ["Tentative Échouée", "Connexion Réussie"]}),
+        (None, None, {'IP': ips + ["absente"], 'User': ["admin", "git"]}),
+        (None, None, {'User': ["absent"]}),
+    ]
+    for low, high, filters in cases:
+        # Référence pandas: NaT ne vérifie aucune comparaison de date
+        mask = np.ones(len(df), dtype=bool)
+        if low is not None:
+            mask &= (df['Timestamp'] >= low).to_numpy()
+        if high is not None:
+            mask &= (df['Timestamp'] < high).to_numpy()
+        for name, labels in filters.items():
+            mask &= df[name].isin(labels).to_numpy()
+        rows = entry.select(low, high, filters)
+        assert np.array_equal(np.arange(len(entry))[rows], np.flatnonzero(mask)), (low, high, filters)
+
+def test_cube_selection_matches_rows(cache_dir, write_log, log_lines):
+    # Bornes à l'heure près: le cube et la sélection de lignes comptent les mêmes événements
+    entry, df = dated_entry(write_log, log_lines)
+    cube = entry.cube()
+    start, end = np.datetime64('2024-01-01T00:00:00'), np.datetime64('2024-01-03T01:00:00')
+    selection = (cube['Hour'] >= start.astype('datetime64[h]').astype(np.int64)) & \
+                (cube['Hour'] < end.astype('datetime64[h]').astype(np.int64))
+    filters = {'User': ["root", "git"], 'EventCategory': ["Tentative Échouée"]}
+    for name, labels in filters.items():
+        selection = store.cube_mask(entry, name, labels, selection)
+    rows = entry.select(start, end, filters)
+    expected = df['Timestamp'].notna() & df['User'].isin(filters['User']) & df['EventCategory'].isin(filters['EventCategory'])
+    assert int(cube['Count'][selection].sum()) == store.row_count(rows) == int(expected.sum())
+
+def test_cube_matches_groupby(cache_dir, write_log, log_lines):
+    # Comptes du cube (lignes datées) identiques à un groupby pandas
+    entry, df = dated_entry(write_log, log_lines)
+    dated = df[df['Timestamp'].notna()]
+    cube = entry.cube()
+    everything = np.ones(len(cube['Count']), dtype=bool)
+    assert int(cube['Count'].sum()) == len(dated) == entry.valid_rows().stop
+
+    for name in ['EventCategory', 'IP', 'User']:
+        counts = store.cube_counts(entry, name, everything).set_index(name)['Count']
+        expected = dated.groupby(name, observed=True).size()
+        assert counts.sort_index().to_dict() == expected.sort_index().to_dict(), name
+
+    hours = pd.Series(cube['Count'], index=pd.to_datetime(np.asarray(cube['Hour']), unit='h'))
+    expected = dated.groupby(dated['Timestamp'].dt.floor('h')).size()
+    assert hours.groupby(level=0).sum().to_dict() == expected.to_dict()
+
+    # Sous-ensemble du cube: mêmes comptes que le groupby des lignes filtrées
+    selection = store.cube_mask(entry, 'User', ["root"], everything)
+    counts = store.cube_counts(entry, 'IP', selection).set_index('IP')['Count']
+    expected = dated[dated['User'] == "root"].groupby('IP', observed=True).size()
+    assert counts.sort_index().to_dict() == expected.sort_index().to_dict()
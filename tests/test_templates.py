@@ -0,0 +1,50 @@
+import io
+import random
+
+import numpy as np
+
+from ssh_sentinel.enrich import categorize_event, enrich_frame
+from ssh_sentinel.parsing import read_log_stream
+from ssh_sentinel.templates import PARAM_COLUMNS, TEMPLATE_COLUMN, extract_templates, render_messages, split_messages
+
+# Jetons qui éprouvent le masquage: chiffres collés aux mots des règles,
+# joker littéral, jetons vides (espaces doubles), numéros de version
+WORDS = [
+    "Failed", "password", "for", "root", "user1failed", "x2-intrusion", "detected", "from", "10.0.0.1",
+    "port", "22", "ssh2", "<*>", "", "invalid", "user", "Accepted", "session", "opened", "closed",
+    "BREAK-IN", "Disconnected", "a1", "b2", "c3", "d4", "e5", "é",
+]
+
+def corpus(count=5000, seed=0):
+    rng = random.Random(seed)
+    messages = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 12))) for _ in range(count)]
+    return messages + [
+        "user1failed password for root",
+        "x2-intrusion detected",
+        "a 1 2 3 4 5 6 7",
+        "a 1 2 3 x 5 6 7",
+    ]
+
+def load(messages, chunk_rows):
+    lines = ''.join(f"2024-01-01 00:00:{i % 60:02d};lab;sshd;1;;u;E;{message}\n" for i, message in enumerate(messages))
+    df = read_log_stream(io.BytesIO(lines.encode('utf-8')), chunk_rows=chunk_rows, encoding='utf-8',
+                         transform=lambda chunk: split_messages(enrich_frame(chunk)))
+    return extract_templates(df)
+
+def test_messages_rebuilt_exactly():
+    messages = corpus()
+    df = load(messages, 1000)
+    slots = [(df[name].cat.categories, df[name].cat.codes.to_numpy()) for name in PARAM_COLUMNS]
+    rendered = render_messages(list(df[TEMPLATE_COLUMN].cat.categories), df[TEMPLATE_COLUMN].cat.codes.to_numpy(), slots)
+    assert list(np.asarray(rendered, dtype=object)) == messages
+
+def test_categories_match_original_messages():
+    messages = corpus()
+    df = load(messages, 1000)
+    assert list(df['EventCategory'].astype(str)) == [categorize_event(message) for message in messages]
+    assert df['EventCategory'].iloc[-4] == "Tentative Échouée"
+    assert df['EventCategory'].iloc[-3] == "Tentative d'Intrusion"
+
+def test_result_independent_of_chunks():
+    messages = corpus()
+    assert load(messages, 100_000).equals(load(messages, 777))
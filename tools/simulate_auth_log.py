@@ -0,0 +1,60 @@
+"""Ajoute des lignes sshd à un fichier, à la manière d'un /var/log/auth.log actif.
+
+Permet de tester le mode "Surveillance en direct" de l'application:
+
+    python tools/simulate_auth_log.py /tmp/auth.log --rate 50
+    SSH_SENTINEL_WATCH_PATHS=/tmp/auth.log streamlit run app.py
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+# Modèles et comptes partagés avec le générateur des benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from synthetic import COMMON_USERS, TEMPLATES
+
+def random_ip(rng, attackers):
+    # Quelques IPs très actives, comme un balayage de botnet
+    if rng.random() < 0.6:
+        return rng.choice(attackers)
+    return f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+def make_line(rng, attackers, host, fmt):
+    weights = [weight for weight, _ in TEMPLATES]
+    template = rng.choices([text for _, text in TEMPLATES], weights=weights)[0]
+    user = rng.choice(COMMON_USERS)
+    ip = random_ip(rng, attackers)
+    message = template.format(user=user, ip=ip, port=rng.randint(1024, 65535))
+    pid = rng.randint(1000, 65000)
+    now = datetime.now()
+
+    if fmt == "csv":
+        return f"{now:%Y-%m-%d %H:%M:%S};{host};sshd;{pid};{ip};{user};SSH;{message}\n"
+    return f"{now:%b} {now.day:>2} {now:%H:%M:%S} {host} sshd[{pid}]: {message}\n"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="Fichier journal à alimenter")
+    parser.add_argument("--rate", type=float, default=20, help="Lignes par seconde")
+    parser.add_argument("--count", type=int, default=0, help="Nombre total de lignes (0: sans fin)")
+    parser.add_argument("--format", choices=["syslog", "csv"], default="syslog")
+    parser.add_argument("--host", default="bastion01")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    attackers = [f"185.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}" for _ in range(20)]
+    written = 0
+    with open(args.path, "a", encoding="utf-8") as f:
+        while not args.count or written < args.count:
+            f.write(make_line(rng, attackers, args.host, args.format))
+            f.flush()
+            written += 1
+            time.sleep(1 / args.rate)
+
+if __name__ == "__main__":
+    main()